@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+Öntözési szabályok visszamérése (backtest)
+Replays the decision rules of get_irrigation_recommendation day by day over
+stored daily weather, without any API call. Every season of every site is
+one run; the runs are stepped together as NumPy arrays (one step per day,
+all runs at once) and split across a process pool.
+
+The stored weather is a CSV file per site (weather_history/<site>.csv) with
+the fields of a parsed day_summary, or the day_summary disk cache itself.
+Weather of the following days stands in for the forecast, and the rule for
+"raining right now" never fires: daily records have no current observation.
+
+    python3 backtest.py [site.csv ...] [--model fao56] [--params tuned.json] [--workers 4] [--json]
+"""
+
+import argparse
+import csv
+import glob
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import numpy as np
+
+import et_fao56
+import rule_params
+import rules
+import weather_cache
+import zones
+from irrigation_advisor import (ELEVATION, ET_MODEL, PARAMS, calculate_evapotranspiration_array,
+                                lat, lon, parse_day_summary, units)
+
+# Addon data directory
+DATA_DIR = "/data" if os.path.exists("/data") else "."
+WEATHER_HISTORY_DIR = os.path.join(DATA_DIR, "weather_history")
+
+WEATHER_FIELDS = ('temp_max', 'temp_min', 'humidity', 'wind_speed', 'cloud_cover', 'precipitation')
+
+# Irrigation season simulated each year (first and last month)
+SEASON_MONTHS = (4, 10)
+
+# Deficit above which the lawn counts as stressed (the high deficit rule)
+STRESS_DEFICIT_MM = 15
+
+DECISIONS = ('yes', 'light', 'wait', 'no')
+
+# Days of weather used as the forecast (same as the 3-day window of the advisor)
+FORECAST_DAYS = 3
+
+
+# === ADATOK ===
+
+def load_site_csv(path):
+    """
+    Daily weather rows of one site, sorted by date.
+    Columns: date + WEATHER_FIELDS, and an optional latitude column.
+    Returns (rows, latitude or None)
+    """
+    rows = []
+    latitude = None
+    with open(path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            if row.get('latitude'):
+                latitude = float(row['latitude'])
+            rows.append({'date': row['date'], **{field: float(row[field]) for field in WEATHER_FIELDS}})
+    return sorted(rows, key=lambda row: row['date']), latitude
+
+
+def load_cached_days(latitude=lat, longitude=lon, units=units):
+    """Daily weather rows from the day_summary disk cache (days the advisor downloaded)"""
+    pattern = os.path.join(weather_cache.DAY_SUMMARY_DIR, f"{float(latitude):.4f}_{float(longitude):.4f}_{units}_*.json")
+    rows = []
+    for path in glob.glob(pattern):
+        date = os.path.basename(path)[:-len(".json")].rsplit('_', 1)[1]
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                rows.append(parse_day_summary(date, json.load(f)))
+        except (OSError, ValueError):
+            continue
+    return sorted(rows, key=lambda row: row['date'])
+
+
+def split_seasons(site, rows, latitude=None):
+    """One run per year with the SEASON_MONTHS days of that year (missing days are skipped)"""
+    seasons = {}
+    for row in rows:
+        if SEASON_MONTHS[0] <= int(row['date'][5:7]) <= SEASON_MONTHS[1]:
+            seasons.setdefault(row['date'][:4], []).append(row)
+    return [{'site': site, 'season': year, 'latitude': float(lat) if latitude is None else latitude, 'days': days}
+            for year, days in sorted(seasons.items())]
+
+
+# === SZIMULÁCIÓ ===
+
+def forward_sum(values, days):
+    """Sum of the next `days` columns for every column (the forecast window)"""
+    padded = np.concatenate([np.zeros((values.shape[0], 1)), np.cumsum(values, axis=1)], axis=1)
+    end = np.minimum(np.arange(values.shape[1]) + days, values.shape[1])
+    return padded[:, end] - padded[:, :values.shape[1]]
+
+
+def daily_et(weather, doy, latitudes, model):
+    """ET of every run and day; FAO-56 needs the radiation table of each site"""
+    if model != "fao56":
+        return calculate_evapotranspiration_array(weather['temp_max'], weather['humidity'],
+                                                  weather['wind_speed'], weather['cloud_cover'],
+                                                  model=model)
+    et = np.empty_like(weather['temp_max'])
+    for latitude in set(latitudes):
+        rows = np.array([run_lat == latitude for run_lat in latitudes])
+        et[rows] = et_fao56.reference_et(weather['temp_max'][rows], weather['humidity'][rows],
+                                         weather['wind_speed'][rows], weather['cloud_cover'][rows],
+                                         doy[rows], latitude, ELEVATION, weather['temp_min'][rows])
+    return et
+
+
+def simulate(runs, model=None, zone=None, params=None):
+    """
+    Step all runs through their seasons together.
+    zone: optional zone settings (crop coefficient, soil capacity, ...), default lawn otherwise
+    params: rule thresholds, the advisor's (possibly tuned) PARAMS by default
+    Returns one result dict per run.
+    """
+    if not runs:
+        return []
+    model = model or ET_MODEL
+    params = params or PARAMS
+    count = len(runs)
+    length = max(len(run['days']) for run in runs)
+
+    # Runs x days matrices, padded days are inactive
+    weather = {field: np.zeros((count, length)) for field in WEATHER_FIELDS}
+    weather['humidity'][:] = 50
+    doy = np.ones((count, length), dtype=int)
+    month = np.ones((count, length), dtype=int)
+    active = np.zeros((count, length), dtype=bool)
+    for i, run in enumerate(runs):
+        days = len(run['days'])
+        for field in WEATHER_FIELDS:
+            weather[field][i, :days] = [day[field] for day in run['days']]
+        doy[i, :days] = [time.strptime(day['date'], '%Y-%m-%d').tm_yday for day in run['days']]
+        month[i, :days] = [int(day['date'][5:7]) for day in run['days']]
+        active[i, :days] = True
+
+    et = np.where(active, daily_et(weather, doy, [run['latitude'] for run in runs], model), 0.0)
+    rain = weather['precipitation']
+    upcoming_rain = forward_sum(rain, FORECAST_DAYS)
+    expected_loss = forward_sum(et, FORECAST_DAYS)
+
+    zone_set = zones.ZoneSet([dict(zone or {}, name='backtest')] * count, params)
+    deficit = np.zeros(count)
+    totals = {key: np.zeros(count) for key in ('water_applied_mm', 'irrigation_days', 'deficit_days',
+                                               'stress_days', 'runoff_mm')}
+    rule_counts = np.zeros((count, len(rules.RULE_NAMES)), dtype=int)
+    decision_counts = np.zeros((count, len(DECISIONS)), dtype=int)
+    rows = np.arange(count)
+
+    for day in range(length):
+        today = active[:, day]
+        decisions = zones.evaluate_zones(
+            zone_set, deficit, expected_loss[:, day], upcoming_rain[:, day],
+            False, 0.0, rain[:, day], weather['temp_max'][:, day], weather['humidity'][:, day], month[:, day],
+            params
+        )
+        amount = np.where(today, np.round(decisions['amount_mm'], 1), 0.0)  # As published, to 0.1 L/m²
+        np.add.at(rule_counts, (rows[today], decisions['rule'][today]), 1)
+        for k, recommendation in enumerate(DECISIONS):
+            decision_counts[:, k] += today & (decisions['recommendation'] == recommendation)
+
+        # Same bucket as the soil balance: water in, Kc * ET out, surplus above capacity runs off,
+        # and an empty root zone loses no more
+        balance = deficit - (rain[:, day] + amount - zone_set.crop_coefficient * et[:, day])
+        totals['runoff_mm'] += np.where(today, np.maximum(0.0, -zone_set.soil_capacity - balance), 0.0)
+        deficit = np.where(today, np.clip(balance, -zone_set.soil_capacity, zone_set.available_water), deficit)
+
+        totals['water_applied_mm'] += amount
+        totals['irrigation_days'] += amount > 0
+        totals['deficit_days'] += today & (deficit > 0)
+        totals['stress_days'] += today & (deficit > STRESS_DEFICIT_MM)
+
+    results = []
+    for i, run in enumerate(runs):
+        results.append({
+            'site': run['site'],
+            'season': run['season'],
+            'days': len(run['days']),
+            'rain_mm': round(float(rain[i].sum()), 1),
+            'et_mm': round(float(et[i].sum()), 1),
+            **{key: round(float(value[i]), 1) if key.endswith('_mm') else int(value[i])
+               for key, value in totals.items()},
+            'final_deficit_mm': round(float(deficit[i]), 1),
+            'decisions': dict(zip(DECISIONS, decision_counts[i].tolist())),
+            'rules': dict(zip(rules.RULE_NAMES, rule_counts[i].tolist()))
+        })
+    return results
+
+
+def run_backtest(runs, model=None, zone=None, workers=None, params=None):
+    """Simulate the runs, split across `workers` processes (default: all cores)"""
+    workers = max(1, min(workers or os.cpu_count() or 1, len(runs)))
+    if workers == 1:
+        return simulate(runs, model, zone, params)
+
+    chunks = [runs[i::workers] for i in range(workers)]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = [result for chunk in executor.map(partial(simulate, model=model, zone=zone, params=params), chunks)
+                   for result in chunk]
+    return sorted(results, key=lambda result: (result['site'], result['season']))
+
+
+def summarize(results):
+    """Totals and per-season averages over all runs"""
+    seasons = len(results) or 1
+    decisions = {}
+    for result in results:
+        for recommendation, number in result['decisions'].items():
+            decisions[recommendation] = decisions.get(recommendation, 0) + number
+    return {
+        'seasons': len(results),
+        'days': sum(result['days'] for result in results),
+        'water_applied_mm_per_season': round(sum(r['water_applied_mm'] for r in results) / seasons, 1),
+        'irrigation_days_per_season': round(sum(r['irrigation_days'] for r in results) / seasons, 1),
+        'deficit_days_per_season': round(sum(r['deficit_days'] for r in results) / seasons, 1),
+        'stress_days_per_season': round(sum(r['stress_days'] for r in results) / seasons, 1),
+        'runoff_mm_per_season': round(sum(r['runoff_mm'] for r in results) / seasons, 1),
+        'decisions': decisions
+    }
+
+
+def load_runs(paths=None, from_cache=False):
+    """Runs from the given CSV files (default: weather_history/*.csv) and/or the day_summary cache"""
+    runs = []
+    if from_cache:
+        runs += split_seasons('cache', load_cached_days())
+    for path in paths if paths else ([] if from_cache else sorted(glob.glob(os.path.join(WEATHER_HISTORY_DIR, "*.csv")))):
+        rows, latitude = load_site_csv(path)
+        runs += split_seasons(os.path.splitext(os.path.basename(path))[0], rows, latitude)
+    return runs
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Öntözési szabályok visszamérése tárolt időjárási adatokon")
+    parser.add_argument('paths', nargs='*', help="napi időjárás CSV fájlok (alapértelmezett: weather_history/*.csv)")
+    parser.add_argument('--from-cache', action='store_true', help="a day_summary cache napjai is")
+    parser.add_argument('--model', choices=['heuristic', 'fao56'], default=None)
+    parser.add_argument('--params', help="paraméter fájl (alapértelmezett: az advisor paraméterei)")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--json', action='store_true', help="eredmények JSON-ban")
+    args = parser.parse_args()
+
+    runs = load_runs(args.paths, args.from_cache)
+    if not runs:
+        print(f"❌ Nincs tárolt időjárási adat ({WEATHER_HISTORY_DIR}/*.csv)")
+        raise SystemExit(1)
+
+    start = time.perf_counter()
+    params = rule_params.load(args.params, enabled=True) if args.params else None
+    results = run_backtest(runs, model=args.model, workers=args.workers, params=params)
+    elapsed = time.perf_counter() - start
+    summary = summarize(results)
+
+    if args.json:
+        print(json.dumps({'summary': summary, 'runs': results}, ensure_ascii=False, indent=2))
+    else:
+        print(f"📊 BACKTEST: {summary['seasons']} szezon, {summary['days']} nap ({elapsed:.2f}s)")
+        for result in results:
+            print(f"   {result['site']} {result['season']}: öntözés {result['water_applied_mm']:.0f}mm "
+                  f"({result['irrigation_days']} nap), hiányos nap {result['deficit_days']}, "
+                  f"stressz nap {result['stress_days']}, elfolyás {result['runoff_mm']:.0f}mm")
+        print(f"💧 Szezononként: {summary['water_applied_mm_per_season']}mm öntözés, "
+              f"{summary['stress_days_per_season']} stressz nap")
+        print(f"🗳️ Döntések: {summary['decisions']}")
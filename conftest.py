@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Közös teszt eszközök
+Fixtures of the state tests: fresh state files under pytest's tmp_path
+(removed by pytest) and the recommendation / execution workflow they replay
+"""
+
+import itertools
+
+import pytest
+
+
+@pytest.fixture
+def new_state_file(tmp_path):
+    """Returns a function giving a new state file path, each in its own directory"""
+    directories = itertools.count()
+
+    def new_state_file():
+        directory = tmp_path / str(next(directories))  # Short: the state service socket lives there
+        directory.mkdir()
+        return str(directory / "irrigation_state.json")
+
+    return new_state_file
+
+
+@pytest.fixture
+def state_file(new_state_file):
+    """One new state file path"""
+    return new_state_file()
+
+
+def run_workflow(state, recommendations=120, every=4):
+    """
+    Log recommendations and execute every n-th (i % every == 1): every
+    other execution with 1.5 mm given explicitly, the rest as recommended
+    """
+    for i in range(recommendations):
+        state.log_recommendation(2 + i % 5, f"teszt {i}")
+        if i % every == 1:
+            state.mark_executed(1.5 if i % (2 * every) == 1 else None, f"végrehajtás {i}")
+    return state
+
+
+@pytest.fixture
+def workflow():
+    """run_workflow(state, recommendations=120, every=4), returns the state"""
+    return run_workflow
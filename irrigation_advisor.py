@@ -6,9 +6,31 @@ Figyelembe veszi a múltbéli, jelenlegi és jövőbeli időjárási adatokat
 
 import json
 import requests
-import time
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from collections.abc import Mapping
+from dataclasses import dataclass
+from functools import partial
 from datetime import datetime, timedelta
+from types import MappingProxyType
+
+import forecast_daily
+import rule_params
+import rules
+import soil_balance
+import state_service
+import weather_cache
+import weather_client
+
+# NumPy is optional: without it the array ET falls back to the scalar loop
+try:
+    import numpy as np
+    import et_fao56
+    import zones
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
 
 # Load configuration options from a JSON file
 # Support both addon format (latitude/longitude) and legacy format (lat/lon)
@@ -30,51 +52,107 @@ else:
 
 units = options.get("units", "metric")  # Default to metric if not specified
 
+# OpenWeatherMap base URL (tests point this at a local stub)
+OWM_BASE_URL = "https://api.openweathermap.org"
+
+# Max parallel day_summary requests when fetching history
+HISTORY_MAX_WORKERS = int(options.get("history_max_workers", 4))
+
+# Overall time limit for one recommendation run, and the budget of each
+# data collection stage inside it (seconds). The stages run in parallel.
+RECOMMENDATION_DEADLINE = float(options.get("recommendation_deadline_seconds", 25))
+STAGE_BUDGETS = {
+    'history': RECOMMENDATION_DEADLINE * 0.8,
+    'current': RECOMMENDATION_DEADLINE * 0.4,
+    'forecast': RECOMMENDATION_DEADLINE * 0.6
+}
+
+# Evapotranspiration model: "heuristic" (default) or "fao56" (Penman-Monteith, needs NumPy)
+ET_MODEL = options.get("et_model", "heuristic")
+ELEVATION = float(options.get("elevation", 100))  # m, for the FAO-56 pressure / clear-sky terms
+if ET_MODEL == "fao56" and not NUMPY_AVAILABLE:
+    print("⚠️ FAO-56 ET needs NumPy, using the heuristic model")
+    ET_MODEL = "heuristic"
+
+# Decision rule thresholds, with the calibrated values of tuned_params.json if use_tuned_params is set
+PARAMS = rule_params.load()
+
+# Optional irrigation zones (list of dicts under "zones" in options.json)
+ZONES = zones.load_zones(options, PARAMS) if NUMPY_AVAILABLE else None
+
+# Last good recommendation, returned (marked as degraded) when a run times out
+DATA_DIR = "/data" if os.path.exists("/data") else "."
+LAST_RECOMMENDATION_FILE = os.path.join(DATA_DIR, "last_recommendation.json")
+
+# Irrigation log (irrigation_state.py, JSON or SQLite backend)
+IRRIGATION_STATE_FILE = os.path.join(DATA_DIR, "irrigation_state.json")
+
 
 # === ADATGYŰJTŐ FÜGGVÉNYEK ===
 
-def get_historical_data(days_back=7):
-    """Get historical weather data for the past N days"""
-    historical_data = []
+def stage_timeout(budget):
+    """(connect, read) timeout for a call that must finish within budget seconds"""
+    return (min(5, budget), budget)
+
+
+def parse_day_summary(date, data):
+    """Extract the relevant fields of a day_summary response"""
+    return {
+        'date': date,
+        'temp_max': data.get('temperature', {}).get('max', 0),
+        'temp_min': data.get('temperature', {}).get('min', 0),
+        'temp_afternoon': data.get('temperature', {}).get('afternoon', 0),
+        'humidity': data.get('humidity', {}).get('afternoon', 50),
+        'precipitation': data.get('precipitation', {}).get('total', 0),
+        'wind_speed': data.get('wind', {}).get('max', {}).get('speed', 0),
+        'cloud_cover': data.get('cloud_cover', {}).get('afternoon', 0)
+    }
+
+
+def fetch_day_summary(date, timeout=None):
+    """Get the day_summary for one date, or None on error"""
+    # Past days never change, so the disk cache is checked first
+    data = weather_cache.get_day_summary(lat, lon, date, units)
     
-    for i in range(1, days_back + 1):
-        date = (datetime.now() - timedelta(days=i)).strftime("%Y-%m-%d")
-        url = f"https://api.openweathermap.org/data/3.0/onecall/day_summary?lat={lat}&lon={lon}&appid={api_key}&units={units}&lang=hu&date={date}"
+    try:
+        if data is None:
+            url = f"{OWM_BASE_URL}/data/3.0/onecall/day_summary?lat={lat}&lon={lon}&appid={api_key}&units={units}&lang=hu&date={date}"
+            data = weather_client.get_json(url, timeout=timeout)
+            weather_cache.put_day_summary(lat, lon, date, units, data)
         
-        try:
-            response = requests.get(url)
-            response.raise_for_status()
-            data = response.json()
-            
-            # Extract relevant data
-            day_data = {
-                'date': date,
-                'temp_max': data.get('temperature', {}).get('max', 0),
-                'temp_min': data.get('temperature', {}).get('min', 0),
-                'temp_afternoon': data.get('temperature', {}).get('afternoon', 0),
-                'humidity': data.get('humidity', {}).get('afternoon', 50),
-                'precipitation': data.get('precipitation', {}).get('total', 0),
-                'wind_speed': data.get('wind', {}).get('max', {}).get('speed', 0),
-                'cloud_cover': data.get('cloud_cover', {}).get('afternoon', 0)
-            }
-            historical_data.append(day_data)
-            
-        except requests.RequestException as e:
-            print(f"Hiba a múltbéli adatok lekérdezésekor ({date}): {e}")
+        return parse_day_summary(date, data)
         
-        time.sleep(0.1)  # API rate limiting
+    except requests.RequestException as e:
+        print(f"Hiba a múltbéli adatok lekérdezésekor ({date}): {e}")
+        return None
+
+
+def get_historical_data(days_back=7, timeout=None, dates=None):
+    """Get historical weather data for the past N days (or for the given dates)"""
+    if dates is None:
+        dates = [(datetime.now() - timedelta(days=i)).strftime("%Y-%m-%d") for i in range(1, days_back + 1)]
+    if not dates:
+        return []
+    
+    # Parallel requests, bounded by HISTORY_MAX_WORKERS (API rate limiting)
+    # map() keeps the results in date order; failed days are dropped
+    with ThreadPoolExecutor(max_workers=max(1, min(HISTORY_MAX_WORKERS, len(dates)))) as executor:
+        results = executor.map(partial(fetch_day_summary, timeout=timeout), dates)
+        historical_data = [day for day in results if day is not None]
+    
+    weather_cache.save_stats()
+    stats = weather_cache.get_cache_stats()["process"]
+    print(f"💾 day_summary cache: {stats['day_summary_hits']} hit, {stats['day_summary_misses']} miss")
     
     return historical_data
 
 
-def get_current_weather():
+def get_current_weather(timeout=None):
     """Get current weather conditions"""
-    url = f"https://api.openweathermap.org/data/2.5/weather?lat={lat}&lon={lon}&appid={api_key}&units={units}&lang=hu"
+    url = f"{OWM_BASE_URL}/data/2.5/weather?lat={lat}&lon={lon}&appid={api_key}&units={units}&lang=hu"
     
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-        data = response.json()
+        data = weather_client.get_json(url, timeout=timeout)
         
         return {
             'temperature': data.get('main', {}).get('temp', 0),
@@ -91,90 +169,45 @@ def get_current_weather():
         return None
 
 
-def get_forecast_data():
+def get_forecast_data(timeout=None):
     """Get 5-day forecast data"""
-    url = f"https://api.openweathermap.org/data/2.5/forecast?lat={lat}&lon={lon}&appid={api_key}&units={units}&lang=hu"
+    url = f"{OWM_BASE_URL}/data/2.5/forecast?lat={lat}&lon={lon}&appid={api_key}&units={units}&lang=hu"
+    
+    def fetch():
+        return weather_client.get_json(url, timeout=timeout)
     
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-        data = response.json()
-        
-        # Group by day
-        daily_forecast = {}
-        
-        for item in data.get('list', []):
-            dt_txt = item.get('dt_txt', '')
-            if not dt_txt:
-                continue
-                
-            date = dt_txt.split(' ')[0]
-            
-            if date not in daily_forecast:
-                daily_forecast[date] = {
-                    'date': date,
-                    'temp_max': float('-inf'),
-                    'temp_min': float('inf'),
-                    'total_rain': 0,
-                    'humidity_avg': 0,
-                    'wind_max': 0,
-                    'cloud_avg': 0,
-                    'humidity_readings': 0
-                }
-            
-            # Temperature
-            temp = item.get('main', {}).get('temp', 0)
-            daily_forecast[date]['temp_max'] = max(daily_forecast[date]['temp_max'], temp)
-            daily_forecast[date]['temp_min'] = min(daily_forecast[date]['temp_min'], temp)
-            
-            # Rain
-            rain_3h = item.get('rain', {}).get('3h', 0) + item.get('snow', {}).get('3h', 0)
-            daily_forecast[date]['total_rain'] += rain_3h
-            
-            # Humidity
-            humidity = item.get('main', {}).get('humidity', 50)
-            daily_forecast[date]['humidity_avg'] += humidity
-            daily_forecast[date]['humidity_readings'] += 1
-            
-            # Wind
-            wind_speed = item.get('wind', {}).get('speed', 0)
-            daily_forecast[date]['wind_max'] = max(daily_forecast[date]['wind_max'], wind_speed)
-            
-            # Clouds
-            clouds = item.get('clouds', {}).get('all', 0)
-            daily_forecast[date]['cloud_avg'] += clouds
+        # Shared with the other scripts until OWM publishes a new forecast;
+        # waiting for another script's request counts against the same budget
+        data = weather_cache.get_forecast(lat, lon, units, fetch, wait=timeout[1] if timeout else None)
         
-        # Calculate averages and clean up
-        forecast_list = []
-        for date in sorted(daily_forecast.keys()):
-            day = daily_forecast[date]
-            if day['humidity_readings'] > 0:
-                day['humidity_avg'] = day['humidity_avg'] / day['humidity_readings']
-                day['cloud_avg'] = day['cloud_avg'] / day['humidity_readings']
-            
-            # Handle infinite values
-            if day['temp_max'] == float('-inf'):
-                day['temp_max'] = 25
-            if day['temp_min'] == float('inf'):
-                day['temp_min'] = 15
-            
-            del day['humidity_readings']  # Remove helper field
-            forecast_list.append(day)
+        # Daily statistics, grouped once per forecast document
+        return forecast_daily.daily_forecast(data).days()
         
-        return forecast_list
-        
-    except requests.RequestException as e:
+    except (requests.RequestException, TimeoutError) as e:
         print(f"Hiba az előrejelzés lekérdezésekor: {e}")
         return []
 
 
 # === ÖNTÖZÉSI LOGIKA ===
 
-def calculate_evapotranspiration(temp_max, humidity, wind_speed, cloud_cover):
+def day_of_year(date=None):
+    """Day of year for a 'YYYY-MM-DD' date (today if missing)"""
+    day = datetime.strptime(date, '%Y-%m-%d') if date else datetime.now()
+    return day.timetuple().tm_yday
+
+
+def calculate_evapotranspiration(temp_max, humidity, wind_speed, cloud_cover,
+                                 temp_min=None, doy=None, model=None):
     """
     Simplified evapotranspiration calculation (Penman-Monteith inspired)
     Returns daily water loss in mm
+    With model="fao56" (or et_model in options) the FAO-56 reference ET is used
     """
+    if (model or ET_MODEL) == "fao56" and NUMPY_AVAILABLE:
+        return float(et_fao56.reference_et(temp_max, humidity, wind_speed, cloud_cover,
+                                           doy or day_of_year(), lat, ELEVATION, temp_min))
+    
     # Base evapotranspiration for grass (rough estimate)
     base_et = 4.0  # mm/day for moderate conditions
     
@@ -199,6 +232,56 @@ def calculate_evapotranspiration(temp_max, humidity, wind_speed, cloud_cover):
     return max(0.5, et)  # Minimum 0.5mm/day
 
 
+def calculate_evapotranspiration_array(temp_max, humidity, wind_speed, cloud_cover,
+                                       temp_min=None, doy=None, model=None):
+    """
+    calculate_evapotranspiration for many days / zones in one call.
+    Takes equal-shaped arrays (or sequences, scalars broadcast) and returns
+    a float array of daily water loss in mm, with the same factors, clamping
+    and results as the scalar version. Without NumPy the scalar version is
+    called per day: a list for sequences, a float when every input is scalar.
+    """
+    if not NUMPY_AVAILABLE:
+        columns = [value if isinstance(value, (int, float)) else list(value)
+                   for value in (temp_max, humidity, wind_speed, cloud_cover)]
+        lengths = [len(column) for column in columns if isinstance(column, list)]
+        if not lengths:
+            return calculate_evapotranspiration(*columns)
+        columns = [column if isinstance(column, list) else [column] * max(lengths) for column in columns]
+        return [calculate_evapotranspiration(*values) for values in zip(*columns)]
+    
+    if (model or ET_MODEL) == "fao56":
+        return et_fao56.reference_et(temp_max, humidity, wind_speed, cloud_cover,
+                                     day_of_year() if doy is None else doy, lat, ELEVATION, temp_min)
+    
+    temp_max = np.asarray(temp_max, dtype=float)
+    humidity = np.asarray(humidity, dtype=float)
+    wind_speed = np.asarray(wind_speed, dtype=float)
+    cloud_cover = np.asarray(cloud_cover, dtype=float)
+    
+    base_et = 4.0
+    temp_factor = np.maximum(0.2, 1.0 + (temp_max - 25) * 0.08)
+    humidity_factor = np.minimum(2.0, np.maximum(0.3, 1.5 - (humidity / 100.0)))
+    wind_factor = np.minimum(2.5, np.maximum(1.0, 1.0 + (wind_speed * 0.1)))
+    cloud_factor = np.maximum(0.4, 1.0 - (cloud_cover / 100.0 * 0.3))
+    
+    et = base_et * temp_factor * humidity_factor * wind_factor * cloud_factor
+    
+    return np.maximum(0.5, et)
+
+
+def daily_evapotranspiration(historical_data):
+    """ET of every historical day, in one array call"""
+    return calculate_evapotranspiration_array(
+        [day['temp_max'] for day in historical_data],
+        [day['humidity'] for day in historical_data],
+        [day['wind_speed'] for day in historical_data],
+        [day['cloud_cover'] for day in historical_data],
+        temp_min=[day.get('temp_min', day['temp_max']) for day in historical_data],
+        doy=[day_of_year(day.get('date')) for day in historical_data]
+    )
+
+
 def analyze_soil_moisture_history(historical_data):
     """
     Analyze historical data to estimate current soil moisture deficit
@@ -206,14 +289,11 @@ def analyze_soil_moisture_history(historical_data):
     """
     net_balance = 0
     
-    for day in historical_data:
-        # Calculate daily water loss
-        et = calculate_evapotranspiration(
-            day['temp_max'], 
-            day['humidity'], 
-            day['wind_speed'], 
-            day['cloud_cover']
-        )
+    # Daily water loss for all days in one call
+    daily_et = daily_evapotranspiration(historical_data)
+    
+    for day, et in zip(historical_data, daily_et):
+        et = float(et)
         
         # Water gained from precipitation
         water_gained = day['precipitation']
@@ -235,25 +315,181 @@ def analyze_soil_moisture_history(historical_data):
     return max(-30, deficit)
 
 
-def get_irrigation_recommendation():
+def load_irrigation_by_day():
+    """Executed watering per day (mm) of the days the soil balance keeps, from the daily rollups"""
+    since = (datetime.now() - timedelta(days=soil_balance.KEEP_DAYS)).strftime("%Y-%m-%d")
+    try:
+        state = state_service.connect(IRRIGATION_STATE_FILE)
+        try:
+            days = state.get_rollups("day", since)
+        finally:
+            state.close()
+    except Exception as e:
+        print(f"⚠️ Nem sikerült beolvasni az öntözési naplót: {e}")
+        return {}
+    return {day['bucket']: day['executed_lpm2'] for day in days if day['executed_lpm2']}
+
+
+def update_soil_balance(historical_data, irrigation=None):
     """
-    Main function: analyze all data and provide irrigation recommendation
+    Advance the persisted soil water balance with the newly fetched days.
+    irrigation: {date: mm} watering per day; recorded again each run, so a
+    late entry replays the balance from that day.
+    Returns the current deficit in mm, or None if the balance has no data yet.
     """
-    print("🌱 Adatok gyűjtése az öntözési tanácshoz...")
-    
-    # Collect all data
-    historical = get_historical_data(7)  # Last 7 days
-    current = get_current_weather()
-    forecast = get_forecast_data()
+    daily_et = daily_evapotranspiration(historical_data)
+    
+    with soil_balance.locked() as balance:
+        for day, et in zip(historical_data, daily_et):
+            balance.record_day(day['date'], et=float(et), rain=day['precipitation'])
+        for date, amount in (irrigation or {}).items():
+            if date in balance.days:
+                balance.record_day(date, irrigation=amount)
+        
+        if balance.last_date() is None:
+            return None
+        print(f"💧 Talajvíz-mérleg: {len(historical_data)} új nap, hiány {balance.deficit():.1f}mm ({balance.last_date()})")
+        return balance.deficit()
+
+
+def collect_weather_data():
+    """
+    Run the history, current and forecast stages in parallel, each within its
+    budget and all within RECOMMENDATION_DEADLINE.
+    Returns (historical, current, forecast, timed_out_stages); a stage that
+    failed or ran out of time is None.
+    """
+    start = time.monotonic()
+    stages = {
+        # Only the days the soil balance has not seen yet
+        'history': partial(get_historical_data, dates=soil_balance.dates_to_fetch(), timeout=stage_timeout(STAGE_BUDGETS['history'])),
+        'current': partial(get_current_weather, timeout=stage_timeout(STAGE_BUDGETS['current'])),
+        'forecast': partial(get_forecast_data, timeout=stage_timeout(STAGE_BUDGETS['forecast']))
+    }
     
-    if not historical or not current or not forecast:
+    executor = ThreadPoolExecutor(max_workers=len(stages))
+    futures = {name: executor.submit(stage) for name, stage in stages.items()}
+    results = {}
+    timed_out = []
+    for name, future in futures.items():
+        remaining = min(STAGE_BUDGETS[name], RECOMMENDATION_DEADLINE) - (time.monotonic() - start)
+        try:
+            results[name] = future.result(timeout=max(0, remaining))
+        except FutureTimeoutError:
+            print(f"⏱️ Időtúllépés: {name} ({STAGE_BUDGETS[name]:.0f}s)")
+            results[name] = None
+            timed_out.append(name)
+    # Do not wait for stalled stages, their calls end on their own timeout
+    executor.shutdown(wait=False, cancel_futures=True)
+    
+    return results['history'], results['current'], results['forecast'], timed_out
+
+
+def save_last_recommendation(recommendation):
+    """Keep the last complete recommendation for degraded answers"""
+    try:
+        tmp_file = f"{LAST_RECOMMENDATION_FILE}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(recommendation, f, ensure_ascii=False)
+        os.replace(tmp_file, LAST_RECOMMENDATION_FILE)
+    except OSError as e:
+        print(f"⚠️ Nem sikerült menteni a javaslatot: {e}")
+
+
+def degraded_recommendation(timed_out):
+    """
+    Answer for a run without complete data: the last good recommendation
+    marked as degraded, or the no_data error if there is none
+    """
+    reason = f"Időtúllépés: {', '.join(timed_out)}" if timed_out else 'Hiányos időjárás adatok'
+    try:
+        with open(LAST_RECOMMENDATION_FILE, 'r', encoding='utf-8') as f:
+            cached = json.load(f)
+        cached['degraded'] = True
+        cached['degraded_reason'] = reason
+        cached['cached_at'] = cached.get('timestamp')
+        print(f"⚠️ {reason} - a legutóbbi javaslatot adom vissza ({cached['cached_at']})")
+        return cached
+    except (OSError, ValueError):
         return {
             'error': 'Nem sikerült az összes szükséges adatot lekérdezni',
-            'recommendation': 'no_data'
+            'recommendation': 'no_data',
+            'degraded': True,
+            'degraded_reason': reason
         }
-    
-    # Analyze current situation
-    soil_deficit = analyze_soil_moisture_history(historical)
+
+
+# === DÖNTÉSI MAG ===
+
+def freeze(value):
+    """Read-only copy: dicts become mappingproxies, lists tuples, arrays read-only arrays (all levels)"""
+    if isinstance(value, Mapping):
+        return MappingProxyType({key: freeze(item) for key, item in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    if NUMPY_AVAILABLE and isinstance(value, np.ndarray):
+        value = value.copy()
+        value.flags.writeable = False
+    return value
+
+
+@dataclass(frozen=True, slots=True)
+class WeatherSnapshot:
+    """
+    All inputs of one recommendation, collected before deciding.
+    history: parsed past days, current: get_current_weather() result,
+    forecast: daily forecast days, now: time of the decision,
+    state: {'soil_deficit_mm': float, 'zone_deficits': per-zone array or None}
+    The inputs are copied read-only on construction (freeze): the days and
+    the state are mappingproxies, the sequences tuples, the zone deficits a
+    read-only array. Changing the caller's dicts afterwards does not change
+    the snapshot, and the snapshot cannot be changed through its fields;
+    dict(snapshot.current) gives a mutable copy.
+    """
+    history: tuple
+    current: Mapping
+    forecast: tuple
+    now: datetime
+    state: Mapping
+    
+    def __post_init__(self):
+        for field in ('history', 'current', 'forecast', 'state'):
+            object.__setattr__(self, field, freeze(getattr(self, field)))
+    
+    @classmethod
+    def from_dict(cls, data):
+        """Snapshot from a JSON body (REST API, saved test cases)"""
+        return cls(
+            history=data.get('history', ()),
+            current=data['current'],
+            forecast=data['forecast'],
+            now=datetime.fromisoformat(data['now']) if data.get('now') else datetime.now(),
+            state={'soil_deficit_mm': float(data['soil_deficit_mm']), 'zone_deficits': None}
+        )
+
+
+def get_zone_recommendations(snapshot, upcoming_rain, expected_loss, params):
+    """Every configured zone from the same snapshot, in one batch"""
+    deficits = snapshot.state['zone_deficits']
+    current, forecast = snapshot.current, snapshot.forecast
+    decisions = zones.evaluate_zones(
+        ZONES, deficits, expected_loss, upcoming_rain,
+        current['is_raining'], current['rain_amount'],
+        forecast[0]['total_rain'], forecast[0]['temp_max'], current['humidity'],
+        snapshot.now.month, params
+    )
+    return zones.zone_results(ZONES, deficits, decisions, upcoming_rain, forecast[0]['total_rain'])
+
+
+def evaluate_snapshot(snapshot, params=None):
+    """
+    Irrigation decision for one snapshot. Pure: no network, no files, no
+    clock and no printing, so simulations, the REST API and tests can call
+    it in bulk. params: rule thresholds (PARAMS by default)
+    """
+    soil_deficit = snapshot.state['soil_deficit_mm']
+    current = snapshot.current
+    forecast = snapshot.forecast
     
     # Check if it's currently raining
     currently_raining = current['is_raining']
@@ -262,94 +498,39 @@ def get_irrigation_recommendation():
     upcoming_rain = sum(day['total_rain'] for day in forecast[:3])
     
     # Calculate expected water loss for next 3 days
-    expected_loss = 0
-    for day in forecast[:3]:
-        et = calculate_evapotranspiration(
-            day['temp_max'],
-            day['humidity_avg'],
-            day['wind_max'],
-            day['cloud_avg']
-        )
-        expected_loss += et
-    
-    # Decision logic
-    recommendation = 'no'
-    irrigation_amount = 0
-    confidence = 0
-    reasons = []
-    
-    # Rule 0: Soil has surplus moisture (recent heavy rain)
-    if soil_deficit < -5:  # Surplus > 5mm
-        recommendation = 'no'
-        reasons.append(f'Talaj jól öntözött, többlet: {abs(soil_deficit):.1f}mm')
-        confidence = 95
-    
-    # Rule 1: Currently raining heavily
-    elif currently_raining and current['rain_amount'] > 2:
-        recommendation = 'no'
-        reasons.append('Jelenleg erősen esik az eső')
-        confidence = 95
-    
-    # Rule 2: Significant rain expected in next 24 hours
-    elif forecast[0]['total_rain'] > 10:
-        recommendation = 'wait'
-        reasons.append(f"Holnap {forecast[0]['total_rain']:.1f}mm eső várható")
-        confidence = 85
-    
-    # Rule 3: High soil deficit
-    elif soil_deficit > 15:
-        recommendation = 'yes'
-        irrigation_amount = min(25, soil_deficit * 0.7)  # Irrigate 70% of deficit, max 25mm
-        reasons.append(f'Nagy talajnedvesség hiány ({soil_deficit:.1f}mm)')
-        confidence = 90
-    
-    # Rule 4: Moderate deficit + hot weather expected
-    elif soil_deficit > 8 and forecast[0]['temp_max'] > 30:
-        recommendation = 'yes'
-        irrigation_amount = 15
-        reasons.append('Mérsékelt hiány + forró idő várható')
-        confidence = 75
-    
-    # Rule 5: Low deficit but very hot and dry conditions
-    elif soil_deficit > 5 and forecast[0]['temp_max'] > 32 and current['humidity'] < 30:
-        recommendation = 'yes'
-        irrigation_amount = 10
-        reasons.append('Nagyon forró és száraz körülmények')
-        confidence = 70
-    
-    # Rule 6: Upcoming rain will cover needs
-    elif upcoming_rain > expected_loss:
-        recommendation = 'no'
-        reasons.append(f'Várható eső ({upcoming_rain:.1f}mm) fedezi az igényt ({expected_loss:.1f}mm)')
-        confidence = 80
-    
-    # Rule 7: Small deficit, but manageable
-    elif soil_deficit > 0 and soil_deficit <= 5:
-        if upcoming_rain < expected_loss * 0.3:  # Less rain expected than needed
-            recommendation = 'light'
-            irrigation_amount = 8
-            reasons.append('Kis hiány, mérsékelt öntözés')
-            confidence = 60
-        else:
-            recommendation = 'no'
-            reasons.append('Kis hiány, de várható eső segít')
-            confidence = 65
-    
-    # Rule 8: No deficit (well watered)
-    else:
-        recommendation = 'no'
-        reasons.append('Megfelelő talajnedvesség')
-        confidence = 75
-    
-    # Seasonal adjustment (August is typically dry in Hungary)
-    if datetime.now().month in [7, 8, 9] and recommendation == 'no' and soil_deficit > 8:
-        recommendation = 'light'
-        irrigation_amount = max(irrigation_amount, 8)
-        reasons.append('Nyár végi korrekcó: száraz évszak')
-        confidence = max(60, confidence - 10)
-    
-    return {
-        'timestamp': datetime.now().isoformat(),
+    next_days = forecast[:3]
+    expected_loss = float(sum(calculate_evapotranspiration_array(
+        [day['temp_max'] for day in next_days],
+        [day['humidity_avg'] for day in next_days],
+        [day['wind_max'] for day in next_days],
+        [day['cloud_avg'] for day in next_days],
+        temp_min=[day['temp_min'] for day in next_days],
+        doy=[day_of_year(day['date']) for day in next_days]
+    )))
+    
+    # Decision logic (rules.py, shared with the zones and the backtest)
+    p = params or PARAMS
+    values = {
+        'deficit': soil_deficit,
+        'expected_loss': expected_loss,
+        'upcoming_rain': upcoming_rain,
+        'currently_raining': currently_raining,
+        'current_rain': current['rain_amount'],
+        'humidity_now': current['humidity'],
+        'rain_tomorrow': forecast[0]['total_rain'],
+        'temp_tomorrow': forecast[0]['temp_max']
+    }
+    decision = rules.decide(values, snapshot.now.month, p, p['max_irrigation_mm'])
+    recommendation = decision['recommendation']
+    irrigation_amount = decision['amount_mm']
+    confidence = decision['confidence']
+    reasons = [rules.reason(decision['rule'], soil_deficit, upcoming_rain, expected_loss, forecast[0]['total_rain'])]
+    if decision['seasonal']:
+        reasons.append(rules.SEASONAL_REASON)
+    
+    result = {
+        'timestamp': snapshot.now.isoformat(),
+        'degraded': False,
         'recommendation': recommendation,
         'irrigation_amount_mm': round(irrigation_amount, 1),
         'irrigation_amount_liters_per_m2': round(irrigation_amount, 1),  # 1mm = 1 liter/m²
@@ -376,6 +557,44 @@ def get_irrigation_recommendation():
             ]
         }
     }
+    
+    if ZONES and snapshot.state.get('zone_deficits') is not None:
+        result['zones'] = get_zone_recommendations(snapshot, upcoming_rain, expected_loss, p)
+    
+    return result
+
+
+def get_irrigation_recommendation():
+    """
+    Main function: collect all data, then decide with evaluate_snapshot
+    """
+    print("🌱 Adatok gyűjtése az öntözési tanácshoz...")
+    
+    # Collect all data
+    historical, current, forecast, timed_out = collect_weather_data()
+    
+    if historical is None or not current or not forecast:
+        return degraded_recommendation(timed_out)
+    
+    # Analyze current situation (persisted balance, advanced with the new days)
+    soil_deficit = update_soil_balance(historical, load_irrigation_by_day())
+    if soil_deficit is None:
+        return degraded_recommendation(timed_out)
+    
+    snapshot = WeatherSnapshot(
+        history=tuple(historical),
+        current=current,
+        forecast=tuple(forecast),
+        now=datetime.now(),
+        state={
+            'soil_deficit_mm': soil_deficit,
+            'zone_deficits': zones.zone_deficits(soil_balance.load(), ZONES) if ZONES else None
+        }
+    )
+    result = evaluate_snapshot(snapshot)
+    
+    save_last_recommendation(result)
+    return result
 
 
 def format_irrigation_advice():
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Tartós MQTT kapcsolat a publikáláshoz
+One auto-reconnecting paho client per process; publishes are pipelined and
+the QoS1 acknowledgements are awaited together. Retained payloads that did not
+change since the last delivery are not sent again until the forced refresh
+"""
+
+import atexit
+import json
+import os
+import threading
+import time
+
+import paho.mqtt.client as mqtt
+
+# Seconds to wait for the broker connection and for the acks of one batch
+CONNECT_TIMEOUT = 10
+ACK_TIMEOUT = 10
+
+# Reconnect backoff of the paho network thread (seconds)
+RECONNECT_MIN_DELAY = 1
+RECONNECT_MAX_DELAY = 60
+
+# Addon data directory
+DATA_DIR = "/data" if os.path.exists("/data") else "."
+LAST_PUBLISHED_FILE = os.path.join(DATA_DIR, "mqtt_last_published.json")
+
+# Unchanged retained payloads are still resent after this long (minutes)
+FORCE_REFRESH_MINUTES = 60
+
+_publisher = None
+_publisher_lock = threading.Lock()
+
+
+class MQTTPublisher:
+    """Long-lived publisher, paho's network thread keeps it connected"""
+
+    def __init__(self, mqtt_config):
+        self.mqtt_config = mqtt_config
+        self.connected = threading.Event()
+        self.publish_lock = threading.Lock()
+        self.stats = {"connects": 0, "disconnects": 0, "published": 0, "delivered": 0, "failed": 0,
+                      "sent": 0, "suppressed": 0}
+        self.force_refresh = False
+
+        # Unique id per process, so the scheduler and the REST service don't
+        # keep kicking each other off the broker
+        client_id = f"{mqtt_config['MQTT_CLIENT_ID']}_{os.getpid()}"
+        self.client = mqtt.Client(callback_api_version=mqtt.CallbackAPIVersion.VERSION2, client_id=client_id)
+        if mqtt_config['MQTT_USERNAME'] and mqtt_config['MQTT_PASSWORD']:
+            self.client.username_pw_set(mqtt_config['MQTT_USERNAME'], mqtt_config['MQTT_PASSWORD'])
+        self.client.reconnect_delay_set(RECONNECT_MIN_DELAY, RECONNECT_MAX_DELAY)
+        self.client.on_connect = self.on_connect
+        self.client.on_disconnect = self.on_disconnect
+
+        self.client.connect_async(mqtt_config['MQTT_BROKER'], int(mqtt_config['MQTT_PORT']), 60)
+        self.client.loop_start()
+
+    def on_connect(self, client, userdata, flags, reason_code, properties):
+        if reason_code == 0:
+            self.stats["connects"] += 1
+            if self.stats["connects"] > 1:
+                # The broker may have restarted and lost the retained messages
+                self.force_refresh = True
+            self.connected.set()
+        else:
+            print(f"❌ MQTT connect refused: {reason_code}")
+
+    def on_disconnect(self, client, userdata, flags, reason_code, properties):
+        self.connected.clear()
+        self.stats["disconnects"] += 1
+        if reason_code != 0:
+            print(f"⚠️ MQTT connection lost ({reason_code}), reconnecting...")
+
+    def publish_many(self, messages, qos=1, retain=True, timeout=ACK_TIMEOUT):
+        """
+        Publish (topic, payload) pairs back to back, then wait for all acks.
+        Returns {topic: 'delivered' | 'timeout' | 'not_connected' | 'failed: ...'}
+        """
+        with self.publish_lock:
+            if not self.connected.wait(CONNECT_TIMEOUT):
+                self.stats["failed"] += len(messages)
+                return {topic: "not_connected" for topic, _ in messages}
+
+            pending = []
+            status = {}
+            for topic, payload in messages:
+                info = self.client.publish(topic, payload, qos=qos, retain=retain)
+                self.stats["published"] += 1
+                if info.rc == mqtt.MQTT_ERR_SUCCESS:
+                    pending.append((topic, info))
+                else:
+                    status[topic] = f"failed: {mqtt.error_string(info.rc)}"
+
+            deadline = time.monotonic() + timeout
+            for topic, info in pending:
+                try:
+                    info.wait_for_publish(max(0, deadline - time.monotonic()))
+                except (RuntimeError, ValueError) as e:
+                    status[topic] = f"failed: {e}"
+                    continue
+                status[topic] = "delivered" if info.is_published() else "timeout"
+
+            for topic, result in status.items():
+                self.stats["delivered" if result == "delivered" else "failed"] += 1
+            return {topic: status[topic] for topic, _ in messages}
+
+    def publish_changed(self, messages, qos=1, retain=True, refresh_minutes=FORCE_REFRESH_MINUTES):
+        """
+        publish_many() for the topics whose payload differs from the last
+        delivered one (or is older than refresh_minutes); the others get 'unchanged'
+        """
+        last_published = load_last_published()
+        now = time.time()
+        force = self.force_refresh
+        changed = []
+        status = {}
+        for topic, payload in messages:
+            last = last_published.get(topic)
+            if (not force and last and last["payload"] == payload
+                    and now - last["sent_at"] < refresh_minutes * 60):
+                status[topic] = "unchanged"
+                self.stats["suppressed"] += 1
+            else:
+                changed.append((topic, payload))
+
+        if changed:
+            status.update(self.publish_many(changed, qos=qos, retain=retain))
+            delivered = [(topic, payload) for topic, payload in changed if status[topic] == "delivered"]
+            self.stats["sent"] += len(delivered)
+            if delivered:
+                last_published = load_last_published()
+                for topic, payload in delivered:
+                    last_published[topic] = {"payload": payload, "sent_at": now}
+                save_last_published(last_published)
+            if force and len(delivered) == len(changed):
+                self.force_refresh = False
+        return {topic: status[topic] for topic, _ in messages}
+
+    def close(self):
+        self.client.disconnect()
+        self.client.loop_stop()
+
+
+def load_last_published():
+    """{topic: {'payload', 'sent_at'}} of the last delivered retained messages"""
+    try:
+        with open(LAST_PUBLISHED_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_last_published(last_published):
+    try:
+        tmp_file = f"{LAST_PUBLISHED_FILE}.{os.getpid()}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(last_published, f, ensure_ascii=False)
+        os.replace(tmp_file, LAST_PUBLISHED_FILE)
+    except OSError as e:
+        print(f"⚠️ Could not save last published payloads: {e}")
+
+
+def get_publisher(mqtt_config):
+    """Shared publisher, rebuilt when the broker settings change"""
+    global _publisher
+    with _publisher_lock:
+        if _publisher is not None and _publisher.mqtt_config != mqtt_config:
+            _publisher.close()
+            _publisher = None
+        if _publisher is None:
+            _publisher = MQTTPublisher(mqtt_config)
+        return _publisher
+
+
+def get_stats():
+    """Counters of this process' publisher (sent / suppressed / delivered ...)"""
+    with _publisher_lock:
+        return dict(_publisher.stats) if _publisher is not None else {}
+
+
+def close():
+    """Disconnect cleanly (registered for interpreter exit)"""
+    global _publisher
+    with _publisher_lock:
+        if _publisher is not None:
+            _publisher.close()
+            _publisher = None
+
+
+atexit.register(close)
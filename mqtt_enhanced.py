@@ -97,8 +97,8 @@ def publish_enhanced_message(message):
             
             tracking_info = {
                 'last_24h_events': len(recent_events),
-                'pending_recommendations': len([e for e in recent_events if not e[4]]),  # not executed
-                'last_execution': recent_events[0][5] if recent_events and recent_events[0][4] else None
+                'pending_recommendations': tracker.pending_count(),
+                'last_execution': recent_events[0]['execution_time'] if recent_events else None
             }
             
             individual_topics[f"{MQTT_TOPIC_BASE}/tracking"] = json.dumps(tracking_info)
@@ -151,8 +151,7 @@ def main():
         if recent:
             print(f"📊 Recent activity (24h): {len(recent)} events")
             for event in recent[:3]:  # Show last 3
-                status = "✅ Executed" if event[4] else "⏳ Pending"
-                print(f"   {event[0][:19]} - {event[1]}L/m² - {status}")
+                print(f"   {event['execution_time'][:19]} - {event['execution_amount']}L/m² - ✅ Executed")
         else:
             print("📊 No recent irrigation events")
     else:
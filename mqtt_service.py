@@ -11,17 +11,26 @@ import logging
 from datetime import datetime
 import paho.mqtt.client as mqtt
 import time
+import threading
+import queue
 
 # Add current directory to path
 sys.path.append(os.path.dirname(__file__))
 
-from irrigation_state import SimpleIrrigationState
+import state_service
 
 # Addon data directory
 DATA_DIR = "/data" if os.path.exists("/data") else "."
 STATE_FILE = os.path.join(DATA_DIR, "irrigation_state.json")
 CONFIG_FILE = os.path.join(DATA_DIR, "options.json")
 
+# /execute messages waiting for the worker (more are dropped, the network loop never waits)
+EXECUTION_QUEUE_SIZE = 100
+# Queued executions written in one journal update
+MAX_BATCH = 20
+# Seconds between retries of a failed write (the last one repeats until it succeeds or the service stops)
+RETRY_BACKOFF = (1, 2, 5, 10, 30)
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
@@ -70,67 +79,111 @@ class MQTTIrrigationService:
         self.state_file = STATE_FILE
         self.mqtt_config = load_addon_config()
         self.client = None
-        self.state = self.load_state()
+        self.expiry_timer = None
+        self.store = self.open_store()
+        # Written on the worker thread only; on_message just queues
+        self.executions = queue.Queue(maxsize=EXECUTION_QUEUE_SIZE)
+        self.metrics = {"received": 0, "dropped": 0, "applied": 0, "failed": 0, "retries": 0,
+                        "batches": 0, "max_depth": 0, "last_flush_ms": 0}
+        self.stopping = threading.Event()
+        self.worker = None
         
-    def load_state(self):
-        """Load state with addon-specific path"""
-        try:
-            if os.path.exists(self.state_file):
-                with open(self.state_file, 'r', encoding='utf-8') as f:
-                    state = json.load(f)
-                logger.info(f"State loaded from {self.state_file}")
-                return state
-            else:
-                logger.info(f"Creating new state file: {self.state_file}")
-                return self.default_state()
-        except Exception as e:
-            logger.error(f"Error loading state: {e}")
-            return self.default_state()
-    
-    def default_state(self):
-        return {
-            "last_recommendation": None,
-            "last_execution": None,
-            "irrigation_log": [],
-            "version": "1.0"
-        }
-    
-    def save_state(self):
-        """Save state to addon data directory"""
-        try:
-            with open(self.state_file, 'w', encoding='utf-8') as f:
-                json.dump(self.state, f, indent=2, ensure_ascii=False)
-            logger.info(f"State saved to {self.state_file}")
-        except Exception as e:
-            logger.error(f"Error saving state: {e}")
+    def open_store(self):
+        """The state of the configured backend (state_backend), through the owning process if one serves it"""
+        store = state_service.connect(self.state_file)
+        logger.info(f"State opened: {self.state_file} ({type(store).__name__})")
+        return store
     
     def mark_executed(self, amount, notes=""):
         """Mark irrigation as executed"""
-        if self.state["last_recommendation"] and not self.state["last_recommendation"]["executed"]:
-            self.state["last_recommendation"]["executed"] = True
-            self.state["last_recommendation"]["execution_time"] = datetime.now().isoformat()
-            self.state["last_recommendation"]["execution_amount"] = amount
-            
-            if notes:
-                self.state["last_recommendation"]["notes"] = notes
-            
-            # Update in log
-            for entry in reversed(self.state["irrigation_log"]):
-                if not entry["executed"] and entry["timestamp"] == self.state["last_recommendation"]["timestamp"]:
-                    entry.update(self.state["last_recommendation"])
-                    break
-            
-            self.save_state()
+        return self.apply_executions([(amount, notes)])
+    
+    def apply_executions(self, executions):
+        """Mark a batch of executions in one write (journal update / transaction), then publish once"""
+        # Decided on the current state: another process may have logged or marked meanwhile
+        marked = self.store.mark_executed_many(executions)
+        for amount, notes in executions[:marked]:
             logger.info(f"Irrigation marked as executed: {amount}L/m² - {notes}")
-            
+        for amount, notes in executions[marked:]:
+            logger.warning(f"No pending recommendation to mark as executed: {amount}L/m²")
+        if marked:
             # Publish confirmation
             self.publish_status_update()
-        else:
-            logger.warning("No pending recommendation to mark as executed")
+        return marked
+    
+    def queue_execution(self, amount, notes):
+        """Hand an execution to the worker (network thread: never blocks)"""
+        self.metrics["received"] += 1
+        try:
+            self.executions.put_nowait((amount, notes))
+        except queue.Full:
+            self.metrics["dropped"] += 1
+            logger.warning(f"Execution queue full ({EXECUTION_QUEUE_SIZE}), dropped: {amount}L/m² - {notes}")
+            return False
+        self.metrics["max_depth"] = max(self.metrics["max_depth"], self.executions.qsize())
+        return True
+    
+    def process_executions(self):
+        """Worker: write what is queued, consecutive messages in one batch"""
+        while not (self.stopping.is_set() and self.executions.empty()):
+            try:
+                batch = [self.executions.get(timeout=1)]
+            except queue.Empty:
+                continue
+            while len(batch) < MAX_BATCH:
+                try:
+                    batch.append(self.executions.get_nowait())
+                except queue.Empty:
+                    break
+            executions = [item for item in batch if item is not None]
+            start = time.perf_counter()
+            if self.write_executions(executions, None in batch):
+                self.metrics["applied"] += len(executions)
+            else:
+                self.metrics["failed"] += len(executions)
+            self.metrics["batches"] += 1
+            self.metrics["last_flush_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    
+    def write_executions(self, executions, publish):
+        """Write a batch, retrying with a backoff while the store fails; False if given up at stop"""
+        attempt = 0
+        while True:
+            try:
+                marked = self.apply_executions(executions) if executions else 0
+                if not marked and publish:
+                    self.publish_status_update()  # Asked for by the expiry timer
+                return True
+            except Exception as e:
+                if self.stopping.is_set():
+                    logger.error(f"Error writing executions, giving up on {len(executions)} at stop: {e}")
+                    return False
+                delay = RETRY_BACKOFF[min(attempt, len(RETRY_BACKOFF) - 1)]
+                logger.warning(f"Error writing executions, retrying in {delay}s: {e}")
+                self.metrics["retries"] += 1
+                attempt += 1
+                # Queued messages wait (new ones are dropped when it is full); stop cuts the wait short
+                self.stopping.wait(delay)
+    
+    def start_worker(self):
+        self.stopping.clear()
+        self.worker = threading.Thread(target=self.process_executions, daemon=True, name="mqtt-executions")
+        self.worker.start()
+    
+    def stop_worker(self, timeout=10):
+        """Write what is still queued, then stop"""
+        self.stopping.set()
+        if self.worker:
+            self.worker.join(timeout)
+            self.worker = None
+    
+    def queue_metrics(self):
+        """Backpressure of the execution queue"""
+        return dict(self.metrics, depth=self.executions.qsize(), capacity=EXECUTION_QUEUE_SIZE)
     
     def publish_status_update(self):
         """Publish status update to MQTT"""
         try:
+            self.store.refresh()  # Other processes write the state too
             summary = self.get_status_summary()
             status_topic = f"{self.mqtt_config['MQTT_TOPIC_BASE']}/addon_status"
             
@@ -138,33 +191,38 @@ class MQTTIrrigationService:
                 "timestamp": datetime.now().isoformat(),
                 "last_execution": summary["last_recommendation"]["time"] if summary["last_recommendation"]["executed"] else None,
                 "pending_count": summary["pending_recommendations"],
-                "recent_24h_amount": summary["recent_24h"]["total_amount"]
+                "recent_24h_amount": summary["recent_24h"]["total_amount"],
+                "queue": self.queue_metrics()
             }
             
             self.client.publish(status_topic, json.dumps(status_message), qos=1, retain=True)
             logger.info(f"Status update published to {status_topic}")
+            self.schedule_expiry()
             
         except Exception as e:
             logger.error(f"Error publishing status: {e}")
     
+    def schedule_expiry(self):
+        """Publish again when the oldest irrigation leaves the 24h window (the status is retained)"""
+        if self.expiry_timer:
+            self.expiry_timer.cancel()
+        expiry = self.store.next_expiry()  # Kept on write / index lookup, no pass over the log
+        if expiry:
+            delay = max(1, (datetime.fromisoformat(expiry) - datetime.now()).total_seconds() + 1)
+            self.expiry_timer = threading.Timer(delay, self.request_status_update)
+            self.expiry_timer.daemon = True
+            self.expiry_timer.start()
+    
+    def request_status_update(self):
+        """Publish from the worker thread (it writes the state)"""
+        try:
+            self.executions.put_nowait(None)
+        except queue.Full:
+            pass  # The queued executions publish anyway
+    
     def get_status_summary(self):
-        """Get status summary"""
-        last_rec = self.state["last_recommendation"]
-        recent = [entry for entry in self.state["irrigation_log"] 
-                 if entry["executed"] and entry["execution_time"]]
-        
-        return {
-            "last_recommendation": {
-                "time": last_rec["timestamp"][:19] if last_rec else None,
-                "amount": last_rec["amount_lpm2"] if last_rec else 0,
-                "executed": last_rec["executed"] if last_rec else False
-            },
-            "recent_24h": {
-                "count": len(recent),
-                "total_amount": sum(e["execution_amount"] or 0 for e in recent)
-            },
-            "pending_recommendations": len([e for e in self.state["irrigation_log"] if not e["executed"]])
-        }
+        """Get status summary (counters kept on write / index queries, no pass over the log)"""
+        return self.store.get_status_summary()
     
     def on_connect(self, client, userdata, flags, rc):
         """MQTT connection callback"""
@@ -194,13 +252,13 @@ class MQTTIrrigationService:
                     amount = float(data.get('amount', 0))
                     notes = data.get('notes', 'Home Assistant automatic')
                     
-                    self.mark_executed(amount, notes)
+                    self.queue_execution(amount, notes)
                     
-                except (json.JSONDecodeError, ValueError):
-                    # Simple numeric value
+                except (json.JSONDecodeError, ValueError, AttributeError):
+                    # Simple numeric value (valid JSON too, but not an object)
                     try:
                         amount = float(payload)
-                        self.mark_executed(amount, 'Home Assistant automatic')
+                        self.queue_execution(amount, 'Home Assistant automatic')
                     except ValueError:
                         logger.error(f"Invalid execution payload: {payload}")
                         
@@ -225,6 +283,7 @@ class MQTTIrrigationService:
             self.client.connect(self.mqtt_config['MQTT_BROKER'], self.mqtt_config['MQTT_PORT'], 60)
             
             logger.info("Starting MQTT irrigation service... (Ctrl+C to stop)")
+            self.start_worker()
             self.client.loop_forever()
             
         except KeyboardInterrupt:
@@ -232,6 +291,8 @@ class MQTTIrrigationService:
         except Exception as e:
             logger.error(f"Service error: {e}")
         finally:
+            self.stop_worker()
+            self.store.close()
             if self.client:
                 self.client.disconnect()
 
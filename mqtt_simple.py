@@ -12,15 +12,15 @@ import json
 import sys
 import os
 from datetime import datetime
-import paho.mqtt.client as mqtt
 
 # Import the irrigation advisor and state tracker
 sys.path.append(os.path.dirname(__file__))
 from irrigation_advisor import get_irrigation_recommendation
+import mqtt_client
 
 # Import state tracker if available
 try:
-    from irrigation_state import SimpleIrrigationState
+    from state_service import connect
     STATE_TRACKING = True
 except ImportError:
     print("ℹ️ State tracking not available")
@@ -50,7 +50,8 @@ def load_addon_config():
             'MQTT_USERNAME': config.get('mqtt_username', None),
             'MQTT_PASSWORD': config.get('mqtt_password', None),
             'MQTT_CLIENT_ID': 'irrigation_advisor_publisher',
-            'MQTT_TOPIC_BASE': 'irrigation/scheduler'
+            'MQTT_TOPIC_BASE': 'irrigation/scheduler',
+            'MQTT_FORCE_REFRESH_MINUTES': config.get('mqtt_force_refresh_minutes', mqtt_client.FORCE_REFRESH_MINUTES)
         }
         
         # Convert empty strings to None
@@ -73,7 +74,8 @@ def load_addon_config():
                 'MQTT_USERNAME': mqtt_config.MQTT_USERNAME,
                 'MQTT_PASSWORD': mqtt_config.MQTT_PASSWORD,
                 'MQTT_CLIENT_ID': mqtt_config.MQTT_CLIENT_ID,
-                'MQTT_TOPIC_BASE': mqtt_config.MQTT_TOPIC_BASE
+                'MQTT_TOPIC_BASE': mqtt_config.MQTT_TOPIC_BASE,
+                'MQTT_FORCE_REFRESH_MINUTES': getattr(mqtt_config, 'MQTT_FORCE_REFRESH_MINUTES', mqtt_client.FORCE_REFRESH_MINUTES)
             }
         except ImportError:
             return {
@@ -82,7 +84,8 @@ def load_addon_config():
                 'MQTT_USERNAME': None,
                 'MQTT_PASSWORD': None,
                 'MQTT_CLIENT_ID': 'irrigation_advisor_publisher',
-                'MQTT_TOPIC_BASE': 'irrigation/scheduler'
+                'MQTT_TOPIC_BASE': 'irrigation/scheduler',
+                'MQTT_FORCE_REFRESH_MINUTES': mqtt_client.FORCE_REFRESH_MINUTES
             }
     except Exception as e:
         print(f"Error loading config: {e}")
@@ -120,33 +123,56 @@ def convert_to_simple_format(recommendation_data):
     }
 
 
-def check_recent_irrigation_state(message):
-    """Check recent irrigation using state file"""
+def convert_zones_to_simple(recommendation_data):
+    """Per-zone messages in the same simple format, plus the sprinkler runtime"""
+    return [{
+        'zone': zone['id'],
+        'watering_required': zone['recommendation'] in ['yes', 'light'],
+        'water_amount_lpm2': zone['irrigation_amount_mm'],
+        'runtime_minutes': zone['runtime_minutes'],
+        'reason': zone['reasons'][0]
+    } for zone in recommendation_data.get('zones', [])]
+
+
+def skip_recent_irrigation(message, zone_messages, recent_amount):
+    """The main and the zone messages with watering turned off after a recent irrigation"""
+    reason = f"Frissen öntözve ({recent_amount}L/m²), átmenetileg kihagyva"
+    if message['watering_required']:
+        message = {
+            'watering_required': False,
+            'water_amount_lpm2': 0,
+            'reason': reason
+        }
+    zone_messages = [dict(zone, watering_required=False, water_amount_lpm2=0, runtime_minutes=0, reason=reason)
+                     if zone['watering_required'] else zone for zone in zone_messages]
+    return message, zone_messages
+
+
+def check_recent_irrigation_state(message, zone_messages=()):
+    """Check recent irrigation using state file (main and zone messages)"""
 
     print("mqtt_simple > Checking recent irrigation state")
 
+    zone_messages = list(zone_messages)
     if not STATE_TRACKING:
-        return message
+        return message, zone_messages
     
     try:
-        state = SimpleIrrigationState()
+        state = connect()
         should_skip, recent_amount = state.should_skip_recommendation(hours=6)
         
-        if should_skip and message['watering_required']:
+        watering = message['watering_required'] or any(zone['watering_required'] for zone in zone_messages)
+        if should_skip and watering:
             log_with_timestamp(f"Skipping due to recent irrigation: {recent_amount}L/m²", "WARN")
-            message = {
-                'watering_required': False,
-                'water_amount_lpm2': 0,
-                'reason': f"Frissen öntözve ({recent_amount}L/m²), átmenetileg kihagyva"
-            }
+            message, zone_messages = skip_recent_irrigation(message, zone_messages, recent_amount)
             
     except Exception as e:
         print(f"⚠️ State check error: {e}")
     
-    return message
+    return message, zone_messages
 
 
-def publish_simple_message(message):
+def publish_simple_message(message, zone_messages=None):
     """Publish simple message to MQTT - both raw JSON and individual values"""
 
     print("mqtt_simple > Publishing simple message")
@@ -155,46 +181,48 @@ def publish_simple_message(message):
     mqtt_config = load_addon_config()
     
     try:
-        client = mqtt.Client(callback_api_version=mqtt.CallbackAPIVersion.VERSION1, client_id=mqtt_config['MQTT_CLIENT_ID'])
-        
-        # Set credentials if provided
-        if mqtt_config['MQTT_USERNAME'] and mqtt_config['MQTT_PASSWORD']:
-            client.username_pw_set(mqtt_config['MQTT_USERNAME'], mqtt_config['MQTT_PASSWORD'])
-            
-        client.connect(mqtt_config['MQTT_BROKER'], mqtt_config['MQTT_PORT'], 60)
-        
-        # Publish raw JSON to main topic
-        raw_topic = f"{mqtt_config['MQTT_TOPIC_BASE']}/raw"
-        raw_payload = json.dumps(message)
-        
-        result1 = client.publish(raw_topic, raw_payload, qos=1, retain=True)
-        
-        # Publish individual values to separate topics
-        individual_topics = {
-            f"{mqtt_config['MQTT_TOPIC_BASE']}/watering_required": str(message['watering_required']).lower(),
-            f"{mqtt_config['MQTT_TOPIC_BASE']}/water_amount": str(message['water_amount_lpm2']),
-            f"{mqtt_config['MQTT_TOPIC_BASE']}/reason": message['reason']
-        }
-        
+        publisher = mqtt_client.get_publisher(mqtt_config)
+
+        # Raw JSON to the main topic, individual values to separate topics
+        base = mqtt_config['MQTT_TOPIC_BASE']
+        messages = [
+            (f"{base}/raw", json.dumps(message)),
+            (f"{base}/watering_required", str(message['watering_required']).lower()),
+            (f"{base}/water_amount", str(message['water_amount_lpm2'])),
+            (f"{base}/reason", message['reason'])
+        ]
+
+        # Same topics per zone under {base}/zones/<zone id>/
+        for zone in zone_messages or []:
+            zone_base = f"{base}/zones/{zone['zone']}"
+            messages += [
+                (f"{zone_base}/raw", json.dumps(zone)),
+                (f"{zone_base}/watering_required", str(zone['watering_required']).lower()),
+                (f"{zone_base}/water_amount", str(zone['water_amount_lpm2'])),
+                (f"{zone_base}/runtime_minutes", str(zone['runtime_minutes'])),
+                (f"{zone_base}/reason", zone['reason'])
+            ]
+
+        # Only changed payloads go out (pipelined, acks awaited together)
+        delivery = publisher.publish_changed(messages, qos=1, retain=True,
+                                             refresh_minutes=mqtt_config['MQTT_FORCE_REFRESH_MINUTES'])
+
         success_count = 0
-        if result1.rc == mqtt.MQTT_ERR_SUCCESS:
-            log_with_timestamp(f"Published to {raw_topic}")
-            success_count += 1
-        
-        for topic, payload in individual_topics.items():
-            result = client.publish(topic, payload, qos=1, retain=True)
-            if result.rc == mqtt.MQTT_ERR_SUCCESS:
+        for topic, payload in messages:
+            result = delivery[topic]
+            if result == "delivered":
                 log_with_timestamp(f"Published to {topic}: {payload}")
                 success_count += 1
+            elif result == "unchanged":
+                log_with_timestamp(f"Unchanged, not republished: {topic}")
+                success_count += 1
             else:
-                log_with_timestamp(f"Failed to publish to {topic}", "ERROR")
-        
-        client.disconnect()
+                log_with_timestamp(f"Failed to publish to {topic}: {result}", "ERROR")
         
         # Log recommendation if tracking enabled and irrigation required
         if STATE_TRACKING and message['watering_required']:
             try:
-                state = SimpleIrrigationState()
+                state = connect()
                 state.log_recommendation(message['water_amount_lpm2'], message['reason'])
             except Exception as e:
                 print(f"⚠️ Logging error: {e}")
@@ -220,7 +248,7 @@ def main():
     # Show tracking status
     if STATE_TRACKING:
         try:
-            state = SimpleIrrigationState()
+            state = connect()
             summary = state.get_status_summary()
             print(f"✅ State tracking enabled")
             print(f"📊 Status: {summary['pending_recommendations']} pending, {summary['recent_24h']['count']} recent (24h)")
@@ -239,13 +267,14 @@ def main():
     simple_message = convert_to_simple_format(recommendation)
     
     # Check against recent irrigation state
-    simple_message = check_recent_irrigation_state(simple_message)
+    simple_message, zone_messages = check_recent_irrigation_state(
+        simple_message, convert_zones_to_simple(recommendation))
     
     # Show what we're publishing (exactly your format)
     log_with_timestamp(f"Publishing message: {simple_message}")
     
     # Publish to MQTT
-    if publish_simple_message(simple_message):
+    if publish_simple_message(simple_message, zone_messages):
         log_with_timestamp("MQTT publication successful!")
         
         if STATE_TRACKING:
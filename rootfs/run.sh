@@ -118,6 +118,13 @@ from datetime import datetime
 ENABLE_AUTO_CHECK = '${ENABLE_AUTO_CHECK}'
 CHECK_INTERVAL_MINUTES = int('${CHECK_INTERVAL_MINUTES}')
 
+def next_check():
+    try:
+        with open('/data/scheduler_status.json') as f:
+            return json.load(f).get('next_run')
+    except (OSError, ValueError):
+        return None
+
 class HealthHandler(http.server.SimpleHTTPRequestHandler):
     def do_GET(self):
         if self.path == '/health':
@@ -129,7 +136,8 @@ class HealthHandler(http.server.SimpleHTTPRequestHandler):
                 'service': 'irrigation-advisor',
                 'timestamp': datetime.now().isoformat(),
                 'auto_checks': ENABLE_AUTO_CHECK,
-                'interval_minutes': CHECK_INTERVAL_MINUTES
+                'interval_minutes': CHECK_INTERVAL_MINUTES,
+                'next_check': next_check()
             }
             self.wfile.write(json.dumps(health).encode())
 
@@ -152,66 +160,10 @@ cleanup() {
 
 
 # Function for automatic irrigation checks
+# Resident Python scheduler: imports, HTTP session and MQTT stay warm between checks,
+# next run time is written to /data/scheduler_status.json
 irrigation_scheduler() {
-    local CHECK_INTERVAL_MINUTES="$CHECK_INTERVAL_MINUTES"
-    local ENABLE_AUTO_CHECK="$ENABLE_AUTO_CHECK"
-    local next_check_time
-    local current_time
-
-    echo "🕒 Scheduler started: checks every $CHECK_INTERVAL_MINUTES minutes"
-    echo "🤖 Auto checks enabled: $ENABLE_AUTO_CHECK"
-    echo "[DEBUG] ENABLE_AUTO_CHECK értéke: $ENABLE_AUTO_CHECK"
-
-    # Calculate and log next check time
-    next_check_time=$(date -d "+${CHECK_INTERVAL_MINUTES} minutes" '+%Y-%m-%d %H:%M:%S')
-    echo "⏰ Next irrigation check scheduled for: $next_check_time"
-
-    while true; do
-        if [[ "$ENABLE_AUTO_CHECK" == "true" ]]; then
-            current_time=$(date '+%Y-%m-%d %H:%M:%S')
-            echo "🌱 [${current_time}] Starting automatic irrigation check (interval: ${CHECK_INTERVAL_MINUTES}min)..."
-
-            # Run irrigation check with enhanced logging
-            if python3 /usr/bin/mqtt_simple.py > /tmp/irrigation_check.log 2>&1; then
-
-                # write logfile to console
-                cat /tmp/irrigation_check.log | while IFS= read -r line; do
-                    echo "   $line"
-                done
-                
-                current_time=$(date '+%Y-%m-%d %H:%M:%S')
-                echo "✅ [${current_time}] Automatic irrigation check completed successfully"
-
-                # Log basic results if available
-                if [ -f "/tmp/irrigation_check.log" ]; then
-                    if grep -q "watering_required" /tmp/irrigation_check.log; then
-                        local watering_status=$(grep "watering_required" /tmp/irrigation_check.log | tail -1)
-                        echo "📊 Result: $watering_status"
-                    fi
-                fi
-            else
-                current_time=$(date '+%Y-%m-%d %H:%M:%S')
-                echo "⚠️  [${current_time}] Automatic irrigation check failed!"
-                echo "📋 Error log content:"
-                if [ -f "/tmp/irrigation_check.log" ]; then
-                    cat /tmp/irrigation_check.log | while IFS= read -r line; do
-                        echo "   $line"
-                    done
-                fi
-            fi
-            
-            # Calculate and log next check time
-            next_check_time=$(date -d "+${CHECK_INTERVAL_MINUTES} minutes" '+%Y-%m-%d %H:%M:%S')
-            echo "⏰ Next irrigation check scheduled for: $next_check_time"
-
-        else
-            current_time=$(date '+%Y-%m-%d %H:%M:%S')
-            echo "⏸️ [${current_time}] Auto checks disabled, skipping... (next check would be in ${CHECK_INTERVAL_MINUTES}min)"
-        fi
-        
-        # Wait for next check (convert minutes to seconds)
-        sleep $((CHECK_INTERVAL_MINUTES * 60))
-    done
+    exec python3 /usr/bin/irrigation_scheduler.py
 }
 
 # Set trap for clean shutdown
@@ -252,6 +204,13 @@ from datetime import datetime
 ENABLE_AUTO_CHECK = '$ENABLE_AUTO_CHECK'
 CHECK_INTERVAL_MINUTES = $CHECK_INTERVAL_MINUTES
 
+def next_check():
+    try:
+        with open('/data/scheduler_status.json') as f:
+            return json.load(f).get('next_run')
+    except (OSError, ValueError):
+        return None
+
 class HealthHandler(http.server.SimpleHTTPRequestHandler):
     def do_GET(self):
         if self.path == '/health':
@@ -263,7 +222,8 @@ class HealthHandler(http.server.SimpleHTTPRequestHandler):
                 'service': 'irrigation-advisor',
                 'timestamp': datetime.now().isoformat(),
                 'auto_checks': ENABLE_AUTO_CHECK,
-                'interval_minutes': CHECK_INTERVAL_MINUTES
+                'interval_minutes': CHECK_INTERVAL_MINUTES,
+                'next_check': next_check()
             }
             self.wfile.write(json.dumps(health).encode())
         else:
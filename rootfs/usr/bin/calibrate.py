@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Döntési küszöbök kalibrálása
+Searches the rule thresholds of rule_params against the backtest: random
+candidates around the hand-picked defaults, evaluated with successive
+halving (every round only the best third goes on to more seasons), spread
+over all CPU cores. The latest seasons are held out: the search never sees
+them, and the winner is only written to tuned_params.json if it beats the
+defaults on them too. The advisor uses the file when use_tuned_params is set.
+
+Objective (lower is better): water applied per season plus STRESS_DAY_COST_MM
+for every day the deficit stays above the stress limit.
+
+    python3 calibrate.py [site.csv ...] [--candidates 64] [--workers 4] [--dry-run]
+"""
+
+import argparse
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+
+import backtest
+import rule_params
+
+# Searched parameters and their ranges. Soil capacity and available water are
+# properties of the soil, not decisions, so they are only set by hand in
+# tuned_params.json.
+SEARCH_SPACE = {
+    'rain_tomorrow_mm': (4.0, 20.0),
+    'high_deficit_mm': (8.0, 25.0),
+    'irrigation_factor': (0.4, 1.0),
+    'max_irrigation_mm': (15.0, 35.0),
+    'hot_deficit_mm': (4.0, 12.0),
+    'hot_temp': (26.0, 34.0),
+    'hot_amount_mm': (8.0, 20.0),
+    'small_rain_ratio': (0.1, 0.6),
+    'light_amount_mm': (4.0, 12.0),
+    'seasonal_deficit_mm': (4.0, 14.0)
+}
+
+# One stress day weighs as much as this much extra water
+STRESS_DAY_COST_MM = 10.0
+
+# Successive halving: rounds, and the share of candidates kept after each
+ROUNDS = 3
+KEEP_RATIO = 1 / 3
+
+# Share of the season years held out of the search, the latest ones
+HOLDOUT_RATIO = 0.25
+
+_runs = None
+_model = None
+
+
+def _init_worker(runs, model):
+    """Runs are sent to every worker once, tasks only carry params and run indices"""
+    global _runs, _model
+    _runs, _model = runs, model
+
+
+def _evaluate(task):
+    params, indices, stress_cost = task
+    summary = backtest.summarize(backtest.simulate([_runs[i] for i in indices], _model, params=params))
+    return objective(summary, stress_cost), summary
+
+
+def objective(summary, stress_cost=STRESS_DAY_COST_MM):
+    return summary['water_applied_mm_per_season'] + stress_cost * summary['stress_days_per_season']
+
+
+def split_holdout(runs, ratio=HOLDOUT_RATIO):
+    """(search runs, held out runs): the latest season years, of every site, are held out"""
+    years = sorted({run['season'] for run in runs})
+    count = min(len(years) - 1, math.ceil(len(years) * ratio))  # At least one year is searched
+    held = set(years[len(years) - count:]) if count > 0 else set()
+    return [run for run in runs if run['season'] not in held], [run for run in runs if run['season'] in held]
+
+
+def sample_params(rng):
+    """Defaults with every searched parameter drawn from its range"""
+    params = dict(rule_params.DEFAULTS)
+    for key, (low, high) in SEARCH_SPACE.items():
+        params[key] = round(float(rng.uniform(low, high)), 2 if high <= 1 else 1)
+    return params
+
+
+def calibrate(runs, candidates=64, workers=None, model=None, stress_cost=STRESS_DAY_COST_MM, seed=0,
+              holdout=HOLDOUT_RATIO):
+    """
+    Search the thresholds on the backtest runs, except the held out seasons.
+    The defaults are always evaluated on every round as the baseline.
+    Returns the best params, its objective and summary, and the baseline's,
+    on the searched seasons and on the held out ones (None without any)
+    """
+    runs, held_out = split_holdout(runs, holdout)
+    rng = np.random.default_rng(seed)
+    pool = [dict(rule_params.DEFAULTS)] + [sample_params(rng) for _ in range(candidates - 1)]
+    order = rng.permutation(len(runs))
+    workers = max(1, min(workers or os.cpu_count() or 1, candidates))
+
+    executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                   initargs=(runs, model)) if workers > 1 else None
+    if executor is None:
+        _init_worker(runs, model)
+    mapper = executor.map if executor else map
+
+    alive = list(range(len(pool)))
+    scores = {}
+    evaluations = 0
+    try:
+        for round_number in range(ROUNDS):
+            # Seasons grow geometrically: the last round uses every season
+            size = max(1, math.ceil(len(runs) * KEEP_RATIO ** (ROUNDS - 1 - round_number)))
+            indices = sorted(order[:size].tolist())
+            tasks = [(pool[c], indices, stress_cost) for c in alive]
+            for c, result in zip(alive, mapper(_evaluate, tasks)):
+                scores[c] = result
+            evaluations += len(tasks)
+
+            if round_number < ROUNDS - 1:
+                keep = max(1, math.ceil(len(alive) * KEEP_RATIO))
+                ranked = sorted((c for c in alive if c != 0), key=lambda c: scores[c][0])
+                alive = [0] + ranked[:keep]
+    finally:
+        if executor:
+            executor.shutdown()
+
+    best = min(alive, key=lambda c: scores[c][0])
+    holdout_scores = {}
+    if held_out:
+        _init_worker(held_out, model)
+        for c in (0, best):
+            holdout_scores[c] = _evaluate((pool[c], range(len(held_out)), stress_cost))
+    return {
+        'params': pool[best],
+        'objective': round(scores[best][0], 1),
+        'summary': scores[best][1],
+        'baseline_objective': round(scores[0][0], 1),
+        'baseline_summary': scores[0][1],
+        'holdout_objective': round(holdout_scores[best][0], 1) if held_out else None,
+        'holdout_summary': holdout_scores[best][1] if held_out else None,
+        'baseline_holdout_objective': round(holdout_scores[0][0], 1) if held_out else None,
+        'evaluations': evaluations,
+        'candidates': len(pool),
+        'seasons': len(runs),
+        'holdout_seasons': sorted({run['season'] for run in held_out})
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Döntési küszöbök hangolása tárolt időjáráson")
+    parser.add_argument('paths', nargs='*', help="napi időjárás CSV fájlok (alapértelmezett: weather_history/*.csv)")
+    parser.add_argument('--from-cache', action='store_true', help="a day_summary cache napjai is")
+    parser.add_argument('--model', choices=['heuristic', 'fao56'], default=None)
+    parser.add_argument('--candidates', type=int, default=64)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--stress-cost', type=float, default=STRESS_DAY_COST_MM)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--holdout', type=float, default=HOLDOUT_RATIO,
+                        help="a legutóbbi évek ekkora része marad ki a keresésből")
+    parser.add_argument('--dry-run', action='store_true', help="nem írja ki a tuned_params.json-t")
+    args = parser.parse_args()
+
+    runs = backtest.load_runs(args.paths, args.from_cache)
+    if not runs:
+        print(f"❌ Nincs tárolt időjárási adat ({backtest.WEATHER_HISTORY_DIR}/*.csv)")
+        raise SystemExit(1)
+
+    start = time.perf_counter()
+    result = calibrate(runs, args.candidates, args.workers, args.model, args.stress_cost, args.seed, args.holdout)
+    elapsed = time.perf_counter() - start
+
+    print(f"🎛️ KALIBRÁCIÓ: {result['candidates']} jelölt, {result['evaluations']} kiértékelés, "
+          f"{result['seasons']} szezon ({elapsed:.1f}s)")
+    print(f"   Alapértékek: {result['baseline_objective']} "
+          f"({result['baseline_summary']['water_applied_mm_per_season']}mm, "
+          f"{result['baseline_summary']['stress_days_per_season']} stressz nap / szezon)")
+    print(f"   Legjobb:     {result['objective']} "
+          f"({result['summary']['water_applied_mm_per_season']}mm, "
+          f"{result['summary']['stress_days_per_season']} stressz nap / szezon)")
+    if result['holdout_seasons']:
+        print(f"   Kihagyott évek ({', '.join(result['holdout_seasons'])}): "
+              f"alapértékek {result['baseline_holdout_objective']}, legjobb {result['holdout_objective']}")
+    for key, value in result['params'].items():
+        if value != rule_params.DEFAULTS[key]:
+            print(f"   {key}: {rule_params.DEFAULTS[key]} -> {value}")
+
+    if not result['holdout_seasons']:
+        print("⚠️ Legalább két év adata kell az ellenőrzéshez, nincs mentés")
+    elif result['objective'] >= result['baseline_objective']:
+        print("✅ Az alapértékek a legjobbak, nincs mit menteni")
+    elif result['holdout_objective'] >= result['baseline_holdout_objective']:
+        print("⚠️ A kihagyott éveken nem jobb az alapértékeknél (túlillesztés), nincs mentés")
+    elif not args.dry_run:
+        rule_params.save(result['params'], objective=result['objective'],
+                         baseline_objective=result['baseline_objective'], seasons=result['seasons'],
+                         holdout_objective=result['holdout_objective'],
+                         baseline_holdout_objective=result['baseline_holdout_objective'],
+                         holdout_seasons=result['holdout_seasons'],
+                         stress_day_cost_mm=args.stress_cost, created=datetime.now().isoformat())
+        print(f"💾 Mentve: {rule_params.TUNED_PARAMS_FILE}")
+        if not rule_params.USE_TUNED_PARAMS:
+            print("   Az advisor csak use_tuned_params: true beállítással használja")
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Napi előrejelzés összesítés
+The OWM 5 day / 3 hour forecast grouped into days. Every daily statistic
+any script needs is computed in one pass over the 3-hour items, into
+per-day columns, and the result is memoized per forecast document (the
+weather cache hands out the same document object until OWM publishes a
+new one).
+"""
+
+import threading
+from collections import OrderedDict
+
+# Forecast documents remembered (one per location / units is plenty)
+MEMO_SIZE = 4
+
+_memo = OrderedDict()
+_memo_lock = threading.Lock()
+
+
+class DailyForecast:
+    """Daily statistics as parallel lists, one entry per date (ascending)"""
+
+    __slots__ = ('city', 'dates', 'temp_max', 'temp_min', 'total_rain', 'rain_periods',
+                 'humidity_avg', 'wind_max', 'cloud_avg', 'descriptions')
+
+    def __init__(self, city):
+        self.city = city
+        self.dates = []
+        self.temp_max = []
+        self.temp_min = []
+        self.total_rain = []        # Rain + snow, mm
+        self.rain_periods = []      # 3-hour periods with precipitation
+        self.humidity_avg = []
+        self.wind_max = []
+        self.cloud_avg = []
+        self.descriptions = []      # Distinct weather descriptions, comma separated
+
+    def __len__(self):
+        return len(self.dates)
+
+    def days(self):
+        """One dict per day with every statistic"""
+        return [
+            {
+                'date': self.dates[i],
+                'temp_max': self.temp_max[i],
+                'temp_min': self.temp_min[i],
+                'total_rain': self.total_rain[i],
+                'rain_periods': self.rain_periods[i],
+                'humidity_avg': self.humidity_avg[i],
+                'wind_max': self.wind_max[i],
+                'cloud_avg': self.cloud_avg[i],
+                'descriptions': self.descriptions[i]
+            }
+            for i in range(len(self.dates))
+        ]
+
+    def rain_by_day(self):
+        """{date: precipitation mm}"""
+        return dict(zip(self.dates, self.total_rain))
+
+
+def aggregate(data):
+    """Group the 3-hour items of a /forecast document into days, in one pass"""
+    daily = DailyForecast(data.get('city', {}).get('name', 'N/A'))
+    index = {}
+    readings = []
+    descriptions = []
+
+    for item in data.get('list', []):
+        dt_txt = item.get('dt_txt', '')
+        if not dt_txt:
+            continue
+        date = dt_txt[:10]  # "2025-08-24 15:00:00" -> "2025-08-24"
+
+        main = item.get('main', {})
+        temp = main.get('temp', 0)
+        rain_3h = item.get('rain', {}).get('3h', 0) + item.get('snow', {}).get('3h', 0)
+        wind_speed = item.get('wind', {}).get('speed', 0)
+
+        i = index.get(date)
+        if i is None:
+            i = index[date] = len(daily.dates)
+            daily.dates.append(date)
+            daily.temp_max.append(temp)
+            daily.temp_min.append(temp)
+            daily.total_rain.append(0)
+            daily.rain_periods.append(0)
+            daily.humidity_avg.append(0)
+            daily.wind_max.append(wind_speed)
+            daily.cloud_avg.append(0)
+            readings.append(0)
+            descriptions.append({})
+        else:
+            if temp > daily.temp_max[i]:
+                daily.temp_max[i] = temp
+            if temp < daily.temp_min[i]:
+                daily.temp_min[i] = temp
+            if wind_speed > daily.wind_max[i]:
+                daily.wind_max[i] = wind_speed
+
+        daily.total_rain[i] += rain_3h
+        if rain_3h > 0:
+            daily.rain_periods[i] += 1
+        daily.humidity_avg[i] += main.get('humidity', 50)
+        daily.cloud_avg[i] += item.get('clouds', {}).get('all', 0)
+        readings[i] += 1
+        for weather in item.get('weather', []):
+            descriptions[i][weather.get('description', '')] = True
+
+    for i, count in enumerate(readings):
+        daily.humidity_avg[i] /= count
+        daily.cloud_avg[i] /= count
+        daily.descriptions.append(', '.join(descriptions[i]))
+
+    # OWM lists the items in time order; re-sort only if a document does not
+    if daily.dates != sorted(daily.dates):
+        order = sorted(range(len(daily.dates)), key=daily.dates.__getitem__)
+        for column in DailyForecast.__slots__[1:]:
+            values = getattr(daily, column)
+            setattr(daily, column, [values[i] for i in order])
+    return daily
+
+
+def daily_forecast(data):
+    """Memoized aggregate(): the same document object is grouped only once"""
+    key = id(data)
+    with _memo_lock:
+        entry = _memo.get(key)
+        # The document is kept in the entry, so its id can't be reused meanwhile
+        if entry is not None and entry[0] is data:
+            _memo.move_to_end(key)
+            return entry[1]
+
+        daily = aggregate(data)
+        _memo[key] = (data, daily)
+        while len(_memo) > MEMO_SIZE:
+            _memo.popitem(last=False)
+        return daily
@@ -5,16 +5,22 @@ REST API az addon és a Home Assistant közötti kommunikációhoz
 """
 
 from flask import Flask, request, jsonify
+import json
 import logging
 import sys
 import os
+import threading
+import time
+from datetime import datetime
 
 # Add current directory to path
 sys.path.append(os.path.dirname(__file__))
 
-from irrigation_state import SimpleIrrigationState
-from irrigation_advisor import get_irrigation_recommendation
-from mqtt_simple import convert_to_simple_format, publish_simple_message
+from irrigation_advisor import WeatherSnapshot, evaluate_snapshot, get_irrigation_recommendation
+from mqtt_simple import convert_to_simple_format, convert_zones_to_simple, publish_simple_message, skip_recent_irrigation
+import weather_cache
+import mqtt_client
+import state_service
 
 app = Flask(__name__)
 logging.basicConfig(level=logging.INFO)
@@ -23,11 +29,206 @@ logging.basicConfig(level=logging.INFO)
 DATA_DIR = "/data" if os.path.exists("/data") else "."
 STATE_FILE = os.path.join(DATA_DIR, "irrigation_state.json")
 
-class AddonIrrigationState(SimpleIrrigationState):
-    def __init__(self):
-        # Override state file location for addon
-        self.state_file = STATE_FILE
-        self.state = self.load_state()
+CONFIG_FILE = os.path.join(DATA_DIR, "options.json")
+RECOMMENDATION_CACHE_FILE = os.path.join(DATA_DIR, "recommendation_cache.json")
+
+
+def load_addon_options():
+    """Addon options (empty if options.json is missing or unreadable)"""
+    try:
+        with open(CONFIG_FILE, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+options = load_addon_options()
+
+# The latest recommendation is served immediately. Older than the soft TTL
+# it is refreshed in the background; older than the hard TTL (or missing)
+# the caller waits for a new one.
+RECOMMENDATION_FRESHNESS = float(options.get('recommendation_freshness_seconds', 300))
+RECOMMENDATION_MAX_AGE = float(options.get('recommendation_max_age_seconds', 3 * 3600))
+
+
+class SingleFlight:
+    """
+    Runs a computation once for all concurrent callers of the same key.
+    Callers arriving while it runs wait for it and get the same result;
+    a finished result is reused while it is younger than max_age seconds.
+    """
+    def __init__(self, max_age):
+        self.max_age = max_age
+        self.lock = threading.Lock()
+        self.calls = {}
+        self.stats = {"computed": 0, "shared": 0, "fresh_hits": 0}
+
+    def do(self, key, func):
+        with self.lock:
+            call = self.calls.get(key)
+            if call and call["done"].is_set() and time.monotonic() - call["finished"] < self.max_age and call["error"] is None:
+                self.stats["fresh_hits"] += 1
+                return call["result"]
+            if call and not call["done"].is_set():
+                self.stats["shared"] += 1
+                leader = False
+            else:
+                call = {"done": threading.Event(), "result": None, "error": None, "finished": 0}
+                self.calls[key] = call
+                self.stats["computed"] += 1
+                leader = True
+
+        if leader:
+            try:
+                call["result"] = func()
+            except Exception as e:
+                call["error"] = e
+            finally:
+                call["finished"] = time.monotonic()
+                call["done"].set()
+        else:
+            call["done"].wait()
+
+        if call["error"] is not None:
+            raise call["error"]
+        return call["result"]
+
+
+class RecommendationCache:
+    """
+    Stale-while-revalidate store for the latest recommendation, kept in
+    memory and in cache_file so a restarted service answers at once
+    """
+    def __init__(self, compute, soft_ttl, hard_ttl, cache_file):
+        self.compute = compute
+        self.soft_ttl = soft_ttl
+        self.hard_ttl = hard_ttl
+        self.cache_file = cache_file
+        self.flight = SingleFlight(0)
+        self.lock = threading.Lock()
+        self.refreshing = False
+        self.stats = {"fresh": 0, "stale": 0, "background_refreshes": 0}
+        self.entry = self.load()
+
+    def load(self):
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+            logging.info(f"Recommendation cache loaded from {self.cache_file}")
+            return entry
+        except (OSError, ValueError):
+            return None
+
+    def save(self, entry):
+        try:
+            tmp_file = f"{self.cache_file}.tmp"
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(entry, f, ensure_ascii=False)
+            os.replace(tmp_file, self.cache_file)
+        except OSError as e:
+            logging.error(f"Recommendation cache save error: {e}")
+
+    def _compute_and_store(self):
+        entry = {"result": self.compute(), "computed_at": time.time()}
+        with self.lock:
+            self.entry = entry
+        self.save(entry)
+        return entry
+
+    def refresh(self):
+        """New recommendation now; concurrent callers share one computation"""
+        return self.flight.do("recommendation", self._compute_and_store)
+
+    def _background_refresh(self):
+        try:
+            self.refresh()
+        except Exception as e:
+            logging.error(f"Background refresh error: {e}")
+        finally:
+            with self.lock:
+                self.refreshing = False
+
+    def refresh_in_background(self):
+        with self.lock:
+            if self.refreshing:
+                return
+            self.refreshing = True
+            self.stats["background_refreshes"] += 1
+        threading.Thread(target=self._background_refresh, daemon=True).start()
+
+    def get(self):
+        """Returns (result, age_seconds, fresh)"""
+        with self.lock:
+            entry = self.entry
+        age = time.time() - entry["computed_at"] if entry else None
+
+        if entry is None or age > self.hard_ttl:
+            entry = self.refresh()
+            age = time.time() - entry["computed_at"]
+        elif age > self.soft_ttl:
+            self.refresh_in_background()
+
+        fresh = age <= self.soft_ttl
+        with self.lock:
+            self.stats["fresh" if fresh else "stale"] += 1
+        return entry["result"], age, fresh
+
+    def response(self, **extra):
+        """Cached result plus its age, ready for jsonify"""
+        result, age, fresh = self.get()
+        body = dict(result)
+        body.update(extra)
+        body["age_seconds"] = round(age, 1)
+        body["fresh"] = fresh
+        body["computed_at"] = datetime.fromtimestamp(time.time() - age).isoformat()
+        return body
+
+
+def compute_recommendation():
+    """Full pipeline behind /recommendation: weather, state check, logging"""
+    recommendation = get_irrigation_recommendation()
+    simple = convert_to_simple_format(recommendation)
+    zones = convert_zones_to_simple(recommendation)
+    
+    # Check against state (the zones too)
+    state = state_service.attach(STATE_FILE)
+    should_skip, recent_amount = state.should_skip_recommendation(hours=6)
+    
+    if should_skip:
+        simple, zones = skip_recent_irrigation(simple, zones, recent_amount)
+    
+    # Log recommendation if irrigation needed
+    if simple['watering_required']:
+        state.log_recommendation(simple['water_amount_lpm2'], simple['reason'])
+    
+    return {
+        "success": True,
+        "recommendation": simple,
+        "zones": zones,
+        "recent_irrigation": recent_amount if should_skip else 0,
+        "degraded": recommendation.get('degraded', False)
+    }
+
+
+def check_recent_irrigation(result):
+    """
+    A cached result checked against the state again: irrigation executed
+    since it was computed turns "water now" off until the next refresh
+    """
+    zones = result.get('zones', [])
+    if not (result['recommendation']['watering_required'] or any(zone['watering_required'] for zone in zones)):
+        return result
+    state = state_service.attach(STATE_FILE)
+    should_skip, recent_amount = state.should_skip_recommendation(hours=6)
+    if not should_skip:
+        return result
+    simple, zones = skip_recent_irrigation(result['recommendation'], zones, recent_amount)
+    return dict(result, recommendation=simple, zones=zones, recent_irrigation=recent_amount)
+
+
+recommendation_cache = RecommendationCache(
+    compute_recommendation, RECOMMENDATION_FRESHNESS, RECOMMENDATION_MAX_AGE, RECOMMENDATION_CACHE_FILE
+)
 
 
 @app.route('/health', methods=['GET'])
@@ -40,30 +241,8 @@ def health():
 def get_recommendation():
     """Get irrigation recommendation"""
     try:
-        # Get fresh recommendation
-        recommendation = get_irrigation_recommendation()
-        simple = convert_to_simple_format(recommendation)
-        
-        # Check against state
-        state = AddonIrrigationState()
-        should_skip, recent_amount = state.should_skip_recommendation(hours=6)
-        
-        if should_skip and simple['watering_required']:
-            simple = {
-                'watering_required': False,
-                'water_amount_lpm2': 0,
-                'reason': f'Frissen öntözve ({recent_amount}L/m²), átmenetileg kihagyva'
-            }
-        
-        # Log recommendation if irrigation needed
-        if simple['watering_required']:
-            state.log_recommendation(simple['water_amount_lpm2'], simple['reason'])
-        
-        return jsonify({
-            "success": True,
-            "recommendation": simple,
-            "recent_irrigation": recent_amount if should_skip else 0
-        })
+        # Latest recommendation at once, refreshed in the background when old
+        return jsonify(check_recent_irrigation(recommendation_cache.response()))
         
     except Exception as e:
         logging.error(f"Recommendation error: {e}")
@@ -78,6 +257,28 @@ def get_recommendation():
         }), 500
 
 
+@app.route('/evaluate', methods=['POST'])
+def evaluate():
+    """
+    Recommendation for caller-supplied weather: one snapshot, or many under
+    "snapshots". No API calls and no state changes.
+    """
+    try:
+        data = request.get_json()
+        snapshots = data['snapshots'] if 'snapshots' in data else [data]
+        results = [evaluate_snapshot(WeatherSnapshot.from_dict(item)) for item in snapshots]
+    except (KeyError, IndexError, TypeError, ValueError) as e:
+        return jsonify({
+            "success": False,
+            "error": f"Hibás snapshot: {e}"
+        }), 400
+    
+    return jsonify({
+        "success": True,
+        "results": results
+    })
+
+
 @app.route('/mark_executed', methods=['POST'])
 def mark_executed():
     """Mark irrigation as executed (called by Home Assistant)"""
@@ -86,8 +287,10 @@ def mark_executed():
         amount = float(data.get('amount', 0))
         notes = data.get('notes', 'Home Assistant automatic')
         
-        state = AddonIrrigationState()
+        state = state_service.attach(STATE_FILE)
         state.mark_executed(amount, notes)
+        # The cached recommendation predates this irrigation
+        recommendation_cache.refresh_in_background()
         
         logging.info(f"Irrigation marked as executed: {amount}L/m² - {notes}")
         
@@ -108,7 +311,7 @@ def mark_executed():
 def get_status():
     """Get current irrigation status"""
     try:
-        state = AddonIrrigationState()
+        state = state_service.attach(STATE_FILE)
         summary = state.get_status_summary()
         recent = state.get_recent_irrigation(48)
         
@@ -134,36 +337,56 @@ def get_status():
         }), 500
 
 
+@app.route('/history', methods=['GET'])
+def get_history():
+    """Daily / weekly / monthly irrigation totals, e.g. /history?period=month&from=2025-04"""
+    period = request.args.get('period', 'month')
+    try:
+        state = state_service.attach(STATE_FILE)
+        totals = state.get_rollups(period, request.args.get('from'), request.args.get('to'))
+    except ValueError as e:
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 400
+    
+    return jsonify({
+        "success": True,
+        "period": period,
+        "totals": totals
+    })
+
+
+@app.route('/cache_stats', methods=['GET'])
+def get_cache_stats():
+    """Weather cache hit/miss and MQTT sent/suppressed counters"""
+    return jsonify({
+        "success": True,
+        "cache": weather_cache.get_cache_stats(),
+        "recommendation_cache": recommendation_cache.stats,
+        "recommendation_flight": recommendation_cache.flight.stats,
+        "mqtt": mqtt_client.get_stats()
+    })
+
+
 @app.route('/publish_mqtt', methods=['POST'])
 def publish_mqtt():
     """Manually trigger MQTT publish"""
     try:
-        # Get recommendation
-        recommendation = get_irrigation_recommendation()
-        simple = convert_to_simple_format(recommendation)
-        
-        # Check state
-        state = AddonIrrigationState()
-        should_skip, recent_amount = state.should_skip_recommendation(hours=6)
-        
-        if should_skip and simple['watering_required']:
-            simple = {
-                'watering_required': False,
-                'water_amount_lpm2': 0,
-                'reason': f'Frissen öntözve ({recent_amount}L/m²), átmenetileg kihagyva'
-            }
+        # Cached recommendation (logged when computed), checked against irrigation executed since
+        result, age, fresh = recommendation_cache.get()
+        result = check_recent_irrigation(result)
+        simple = result['recommendation']
         
         # Publish to MQTT
-        success = publish_simple_message(simple)
-        
-        # Log if irrigation recommended
-        if simple['watering_required'] and success:
-            state.log_recommendation(simple['water_amount_lpm2'], simple['reason'])
+        success = publish_simple_message(simple, result.get('zones'))
         
         return jsonify({
             "success": success,
             "message": simple,
-            "mqtt_published": success
+            "mqtt_published": success,
+            "age_seconds": round(age, 1),
+            "fresh": fresh
         })
         
     except Exception as e:
@@ -5,12 +5,12 @@ Egyszerű parancssori eszközök az öntözés nyilvántartásához
 """
 
 import sys
-from irrigation_state import SimpleIrrigationState
+from state_service import connect
 from datetime import datetime
 
 def show_status():
     """Show current irrigation status"""
-    state = SimpleIrrigationState()
+    state = connect()
     summary = state.get_status_summary()
     
     print("📊 ÖNTÖZÉSI ÁLLAPOT")
@@ -39,7 +39,7 @@ def mark_irrigation(amount_str, notes=""):
     """Mark irrigation as executed"""
     try:
         amount = float(amount_str)
-        state = SimpleIrrigationState()
+        state = connect()
         state.mark_executed(amount, notes)
         print(f"✅ Öntözés rögzítve: {amount}L/m²")
         if notes:
@@ -47,14 +47,31 @@ def mark_irrigation(amount_str, notes=""):
     except ValueError:
         print(f"❌ Hibás mennyiség: {amount_str}")
 
+def show_history(period="month"):
+    """Show daily / weekly / monthly totals"""
+    state = connect()
+    try:
+        totals = state.get_rollups(period)
+    except ValueError:
+        print(f"❌ Ismeretlen időszak: {period} (day / week / month)")
+        return
+    
+    print(f"📅 ÖNTÖZÉSI ÖSSZESÍTŐ ({period})")
+    print("=" * 25)
+    if not totals:
+        print("ℹ️  Még nincs adat")
+    for row in totals:
+        print(f"   {row['bucket']:<10} javasolt: {row['recommendations']}x {row['recommended_lpm2']:.1f}L/m²"
+              f" - öntözve: {row['executions']}x {row['executed_lpm2']:.1f}L/m²")
+
 def clear_state():
     """Clear irrigation state (with confirmation)"""
     response = input("⚠️  Biztosan törölni szeretnéd az állapotot? (yes/no): ")
     if response.lower() in ['yes', 'y', 'igen', 'i']:
-        import os
-        from irrigation_state import STATE_FILE
-        if os.path.exists(STATE_FILE):
-            os.remove(STATE_FILE)
+        from irrigation_state import STATE_FILE, database_file
+        from state_journal import StateJournal
+        from state_store import remove_database
+        if StateJournal(STATE_FILE).remove() | remove_database(database_file(STATE_FILE)):
             print(f"🗑️  Állapotfájl törölve: {STATE_FILE}")
         else:
             print("ℹ️  Nincs állapotfájl")
@@ -70,6 +87,7 @@ def main():
         print(f"  {sys.argv[0]} status              - Állapot megtekintése")
         print(f"  {sys.argv[0]} mark <mennyiség>    - Öntözés rögzítése (L/m²)")
         print(f"  {sys.argv[0]} mark <mennyiség> '<megjegyzés>' - Öntözés rögzítése megjegyzéssel")
+        print(f"  {sys.argv[0]} history [day|week|month] - Napi / heti / havi összesítő")
         print(f"  {sys.argv[0]} clear               - Állapot törlése")
         print()
         print("Példák:")
@@ -89,6 +107,8 @@ def main():
             mark_irrigation(amount, notes)
         else:
             print("❌ Hiányzó mennyiség paraméter")
+    elif command == 'history':
+        show_history(sys.argv[2] if len(sys.argv) >= 3 else "month")
     elif command == 'clear':
         clear_state()
     else:
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Rezidens öntözési ütemező
+Replaces the bash loop in run.sh: one long-lived process keeps the imports,
+the HTTP session and the MQTT connection warm and runs the checks on a timer
+"""
+
+import json
+import os
+import random
+import signal
+import sys
+import threading
+import time
+from datetime import datetime
+
+# Add current directory to path
+sys.path.append(os.path.dirname(__file__))
+
+# Addon data directory
+DATA_DIR = "/data" if os.path.exists("/data") else "."
+CONFIG_FILE = os.path.join(DATA_DIR, "options.json")
+STATUS_FILE = os.path.join(DATA_DIR, "scheduler_status.json")
+
+# Longest single sleep, so clock jumps and suspends are noticed quickly
+MAX_SLEEP_SECONDS = 60
+
+
+def log_with_timestamp(message, level="INFO"):
+    """Log line with timestamp, same format as mqtt_simple"""
+    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    print(f"[{timestamp}] {level}: {message}", flush=True)
+
+
+def load_scheduler_config():
+    """Scheduler settings from the addon options"""
+    try:
+        with open(CONFIG_FILE, 'r') as f:
+            config = json.load(f)
+    except (OSError, ValueError):
+        config = {}
+    return {
+        'enabled': str(config.get('enable_auto_check', True)).lower() == 'true',
+        'interval_minutes': int(config.get('check_interval_minutes', 30)),
+        'jitter_seconds': int(config.get('check_jitter_seconds', 30))
+    }
+
+
+def run_irrigation_check():
+    """One check: recommendation + MQTT publish, in this process"""
+    import mqtt_simple
+    return mqtt_simple.main()
+
+
+class IrrigationScheduler:
+    """
+    In-process timer for the irrigation checks.
+    Runs are planned at a fixed interval plus a random jitter. If one or more
+    planned runs were missed (long check, suspend, restart) a single catch-up
+    run happens at once and the plan continues from there.
+    """
+    def __init__(self, interval_minutes=30, enabled=True, jitter_seconds=30,
+                 check=run_irrigation_check, status_file=STATUS_FILE):
+        self.interval = interval_minutes * 60
+        self.enabled = enabled
+        self.jitter = jitter_seconds
+        self.check = check
+        self.status_file = status_file
+        self.stop_event = threading.Event()
+        self.status = self.load_status()
+        self.status.update({
+            "interval_minutes": interval_minutes,
+            "enabled": enabled,
+            "pid": os.getpid()
+        })
+        self.next_run = self.first_run_time(time.time())
+
+    def load_status(self):
+        try:
+            with open(self.status_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {"runs": 0, "failures": 0, "missed_runs": 0}
+
+    def save_status(self):
+        self.status["next_run"] = datetime.fromtimestamp(self.next_run).isoformat()
+        try:
+            tmp_file = f"{self.status_file}.tmp"
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(self.status, f, indent=2, ensure_ascii=False)
+            os.replace(tmp_file, self.status_file)
+        except OSError as e:
+            log_with_timestamp(f"Scheduler status save error: {e}", "WARN")
+
+    def first_run_time(self, now):
+        """Right away if the last run is older than one interval, else on schedule"""
+        last_run = self.status.get("last_run_epoch")
+        if last_run is None or now - last_run >= self.interval:
+            return now
+        return last_run + self.interval
+
+    def plan_next(self, planned, now):
+        """Next planned time after a run that was due at `planned`"""
+        next_run = planned + self.interval
+        if next_run <= now:
+            # The late run just done was the catch-up; skip the other missed
+            # slots instead of running them back to back
+            missed = int((now - planned) // self.interval)
+            self.status["missed_runs"] = self.status.get("missed_runs", 0) + missed
+            log_with_timestamp(f"{missed} missed check(s) covered by one catch-up run", "WARN")
+            next_run += missed * self.interval
+        return next_run + random.uniform(0, self.jitter)
+
+    def next_run_time(self):
+        """Planned time of the next check (datetime)"""
+        return datetime.fromtimestamp(self.next_run)
+
+    def run_once(self):
+        started = time.time()
+        cpu_started = time.process_time()
+        log_with_timestamp(f"Starting automatic irrigation check (interval: {self.interval // 60}min)...")
+        try:
+            result = self.check()
+            self.status["last_result"] = result
+            self.status["last_error"] = None
+            log_with_timestamp(f"Automatic irrigation check completed successfully")
+            log_with_timestamp(f"Result: {result}")
+        except Exception as e:
+            self.status["failures"] = self.status.get("failures", 0) + 1
+            self.status["last_error"] = str(e)
+            log_with_timestamp(f"Automatic irrigation check failed: {e}", "ERROR")
+        duration = time.time() - started
+        self.status["runs"] = self.status.get("runs", 0) + 1
+        self.status["last_run"] = datetime.fromtimestamp(started).isoformat()
+        self.status["last_run_epoch"] = started
+        self.status["last_duration_seconds"] = round(duration, 2)
+        self.status["last_cpu_seconds"] = round(time.process_time() - cpu_started, 2)
+        log_with_timestamp(f"Check took {duration:.1f}s wall, {self.status['last_cpu_seconds']}s CPU")
+
+    def tick(self, now):
+        """Run the check if it is due; returns True if it ran"""
+        if now < self.next_run:
+            return False
+        planned = self.next_run
+        if self.enabled:
+            self.run_once()
+        else:
+            log_with_timestamp("Auto checks disabled, skipping...", "DEBUG")
+        self.next_run = self.plan_next(planned, time.time())
+        self.save_status()
+        log_with_timestamp(f"Next irrigation check scheduled for: {self.next_run_time().strftime('%Y-%m-%d %H:%M:%S')}")
+        return True
+
+    def run_forever(self):
+        log_with_timestamp(f"Scheduler started: checks every {self.interval // 60} minutes (jitter {self.jitter}s)")
+        log_with_timestamp(f"Auto checks enabled: {self.enabled}")
+        self.save_status()
+        log_with_timestamp(f"Next irrigation check scheduled for: {self.next_run_time().strftime('%Y-%m-%d %H:%M:%S')}")
+        while not self.stop_event.is_set():
+            self.tick(time.time())
+            wait = min(MAX_SLEEP_SECONDS, max(0, self.next_run - time.time()))
+            self.stop_event.wait(wait)
+        log_with_timestamp("Scheduler stopped")
+
+    def stop(self, *args):
+        self.stop_event.set()
+
+
+def main():
+    """Main function"""
+    config = load_scheduler_config()
+    scheduler = IrrigationScheduler(
+        interval_minutes=config['interval_minutes'],
+        enabled=config['enabled'],
+        jitter_seconds=config['jitter_seconds']
+    )
+    signal.signal(signal.SIGTERM, scheduler.stop)
+    signal.signal(signal.SIGINT, scheduler.stop)
+    scheduler.run_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -8,20 +8,56 @@ import json
 import os
 from datetime import datetime, timedelta
 
+import rollups
+import status_counters
+from state_journal import StateJournal
+from state_store import IrrigationStateStore, SQLiteIrrigationState
+
 # State file for tracking irrigation
 STATE_FILE = "/data/irrigation_state.json" if os.path.exists("/data") else "irrigation_state.json"
 
-class SimpleIrrigationState:
-    def __init__(self):
-        self.state_file = STATE_FILE
+# The old mqtt_feedback database, imported into the SQLite state once
+LEGACY_DB_FILE = "irrigation_log.db"
+
+
+def configured_backend():
+    """state_backend option: json (snapshot + journal, default) or sqlite"""
+    config_file = "/data/options.json" if os.path.exists("/data/options.json") else "./options.json"
+    try:
+        with open(config_file) as f:
+            return json.load(f).get("state_backend", "json")
+    except (OSError, ValueError):
+        return "json"
+
+
+STATE_BACKEND = configured_backend()
+
+
+def database_file(state_file):
+    """irrigation_state.json -> irrigation_state.db"""
+    return os.path.splitext(state_file)[0] + ".db"
+
+
+def open_state(state_file=None, backend=None):
+    """State of the configured backend; both have the same interface"""
+    state_file = state_file or STATE_FILE
+    if (backend or STATE_BACKEND) == "sqlite":
+        return SQLiteIrrigationState(database_file(state_file), json_file=state_file,
+                                     legacy_db_file=os.path.join(os.path.dirname(state_file), LEGACY_DB_FILE))
+    return SimpleIrrigationState(state_file)
+
+
+class SimpleIrrigationState(IrrigationStateStore):
+    def __init__(self, state_file=None):
+        self.state_file = state_file or STATE_FILE
         self.state = self.load_state()
     
     def load_state(self):
-        """Load irrigation state from file"""
-        if os.path.exists(self.state_file):
+        """Load irrigation state: last snapshot + journal replay"""
+        self.journal = StateJournal(self.state_file)
+        if os.path.exists(self.state_file) or os.path.exists(self.journal.journal_file):
             try:
-                with open(self.state_file, 'r', encoding='utf-8') as f:
-                    state = json.load(f)
+                state = self.journal.load(self.default_state)
                 print(f"📂 State loaded from {self.state_file}")
                 return state
             except Exception as e:
@@ -37,14 +73,15 @@ class SimpleIrrigationState:
             "last_recommendation": None,
             "last_execution": None,  # Manual entry
             "irrigation_log": [],
+            "rollups": {},
+            "status": status_counters.empty(),
             "version": "1.0"
         }
     
     def save_state(self):
-        """Save state to file"""
+        """Write the full state as a new snapshot (changes themselves go to the journal)"""
         try:
-            with open(self.state_file, 'w', encoding='utf-8') as f:
-                json.dump(self.state, f, indent=2, ensure_ascii=False)
+            self.journal.compact(self.state)
             print(f"💾 State saved to {self.state_file}")
         except Exception as e:
             print(f"❌ Error saving state: {e}")
@@ -60,14 +97,11 @@ class SimpleIrrigationState:
             "execution_amount": None
         }
         
-        self.state["last_recommendation"] = recommendation
-        self.state["irrigation_log"].append(recommendation)
-        
-        # Keep only last 50 entries
-        if len(self.state["irrigation_log"]) > 50:
-            self.state["irrigation_log"] = self.state["irrigation_log"][-50:]
-        
-        self.save_state()
+        # One journal line per change (older entries move to the history file)
+        self.journal.update(self.state, lambda state: [
+            {"op": "append", "entry": recommendation},
+            {"op": "set", "key": "last_recommendation", "value": recommendation}
+        ])
         print(f"📝 Recommendation logged: {amount}L/m² - {reason}")
         return len(self.state["irrigation_log"]) - 1  # Return index
         def log_recommendation(self, amount, reason):
@@ -86,26 +120,61 @@ class SimpleIrrigationState:
             print(f"📝 Recommendation logged: {amount}L/m² - {reason}")
             return len(self.state["irrigation_log"]) - 1
     
-    def mark_executed(self, execution_amount=None, notes=""):
-        """Mark the most recent pending recommendation as executed"""
-        # Find the most recent pending recommendation
-        pending_entry = None
-        for entry in reversed(self.state["irrigation_log"]):
-            if not entry["executed"]:
-                pending_entry = entry
-                break
-        if pending_entry:
-            pending_entry["executed"] = True
-            pending_entry["execution_time"] = datetime.now().isoformat()
-            pending_entry["execution_amount"] = execution_amount or pending_entry["amount_lpm2"]
+    @staticmethod
+    def mark_events(state, executions):
+        """Events marking the most recent pending recommendations, one per (amount, notes)"""
+        # On the state as other processes left it
+        pending = (entry for entry in reversed(state["irrigation_log"]) if not entry.get("executed", True))
+        events = []
+        latest = None
+        for (execution_amount, notes), pending_entry in zip(executions, pending):
+            fields = {
+                "executed": True,
+                "execution_time": datetime.now().isoformat(),
+                "execution_amount": execution_amount or pending_entry["amount_lpm2"]
+            }
             if notes:
-                pending_entry["notes"] = notes
+                fields["notes"] = notes
+            events.append({"op": "update", "timestamp": pending_entry["timestamp"], "fields": fields})
+            latest = latest or dict(pending_entry, **fields)
+        if latest:
             # Update last_recommendation as well
-            self.state["last_recommendation"] = pending_entry
-            self.save_state()
+            events.append({"op": "set", "key": "last_recommendation", "value": latest})
+        return events
+
+    def mark_executed(self, execution_amount=None, notes=""):
+        """Mark the most recent pending recommendation as executed"""
+        if self.journal.update(self.state, lambda state: self.mark_events(state, [(execution_amount, notes)])):
             print(f"✅ Marked as executed: {execution_amount or 'recommended amount'}L/m²")
-        else:
-            print("⚠️ No pending recommendation to mark as executed")
+            return True
+        print("⚠️ No pending recommendation to mark as executed")
+        return False
+
+    def mark_executed_many(self, executions):
+        """Mark a pending recommendation for each (amount, notes), newest first, in one journal update"""
+        events = self.journal.update(self.state, lambda state: self.mark_events(state, executions))
+        marked = sum(1 for event in events if event["op"] == "update")
+        print(f"✅ Marked as executed: {marked} of {len(executions)}")
+        return marked
+
+    def log_executions(self, executions):
+        """Log (amount, notes) irrigation done without a recommendation (manual entries), in one journal update"""
+        entries = [{
+            "timestamp": datetime.now().isoformat(),
+            "amount_lpm2": amount,
+            "notes": notes,
+            "type": "manual"
+        } for amount, notes in executions]
+        if entries:
+            # Older entries move to the history file on compaction
+            self.journal.update(self.state, lambda state: [{"op": "append", "entry": entry} for entry in entries] + [
+                {"op": "set", "key": "last_executed", "value": entries[-1]}
+            ])
+        print(f"✅ Manual irrigation logged: {len(entries)}")
+        return len(entries)
+
+    def last_recommendation(self):
+        return self.state["last_recommendation"]
         def mark_executed(self, execution_amount=None, notes=""):
             """Log a new irrigation execution entry and update last_executed"""
             entry = {
@@ -122,17 +191,25 @@ class SimpleIrrigationState:
             self.save_state()
             print(f"✅ Manual irrigation logged: {execution_amount}L/m² - {notes}")
     
+    def last_execution(self):
+        """Time and amount of the latest executed irrigation, or None (status counter)"""
+        return self.state["status"]["last_execution"]
+
+    def next_expiry(self):
+        """When the oldest execution of the last 24 hours leaves the window (ISO time), or None (status counter)"""
+        expiry = status_counters.next_expiry(self.state["status"])
+        return expiry.isoformat() if expiry else None
+    
     def get_recent_irrigation(self, hours=24):
-        """Get recent executed irrigation"""
-        cutoff = datetime.now() - timedelta(hours=hours)
-        
-        recent = []
-        for entry in reversed(self.state["irrigation_log"]):
-            if entry["executed"] and entry["execution_time"]:
-                exec_time = datetime.fromisoformat(entry["execution_time"])
-                if exec_time > cutoff:
-                    recent.append(entry)
-        
+        """Get recent executed irrigation (manual entries as executions, like the SQLite state)"""
+        # ISO timestamps compare as strings, no parsing per entry
+        cutoff = (datetime.now() - timedelta(hours=hours)).isoformat()
+        executions = (dict(entry, executed=True, execution_time=entry["timestamp"],
+                           execution_amount=entry.get("amount_lpm2"))
+                      if entry.get("type") == "manual" else entry for entry in self.state["irrigation_log"])
+        recent = [entry for entry in executions
+                  if entry.get("executed") and (entry.get("execution_time") or "") > cutoff]
+        recent.sort(key=lambda entry: entry["execution_time"], reverse=True)
         return recent
         def get_recent_irrigation(self, hours=24):
             """Get recent irrigation executions (manual or advisor)"""
@@ -143,49 +220,30 @@ class SimpleIrrigationState:
                 if entry_time > cutoff and entry.get("type") in ["manual", "advisor"]:
                     recent.append(entry)
             return recent
-    
-    def should_skip_recommendation(self, hours=6):
-        """Check if should skip due to recent irrigation"""
-        recent = self.get_recent_irrigation(hours)
-        
-        if recent:
-            total_amount = sum(entry["execution_amount"] or 0 for entry in recent)
-            print(f"ℹ️ Recent irrigation in last {hours}h: {total_amount}L/m²")
-            
-            # Skip if recently irrigated significantly
-            if total_amount > 5:  # More than 5L/m² recently
-                return True, total_amount
-        
-        return False, 0
-        def should_skip_recommendation(self, hours=6):
-            """Check if should skip due to last executed irrigation"""
-            last_executed = self.state.get("last_executed")
-            if last_executed:
-                amount = last_executed.get("amount_lpm2", 0)
-                print(f"ℹ️ Last executed irrigation: {amount}L/m²")
-                if amount > 5:
-                    return True, amount
-            return False, 0
-    
-    def get_status_summary(self):
-        """Get current status summary"""
-        last_rec = self.state["last_recommendation"]
-        recent = self.get_recent_irrigation(24)
-        
-        summary = {
-            "last_recommendation": {
-                "time": last_rec["timestamp"][:19] if last_rec else None,
-                "amount": last_rec["amount_lpm2"] if last_rec else 0,
-                "executed": last_rec["executed"] if last_rec else False
-            },
-            "recent_24h": {
-                "count": len(recent),
-                "total_amount": sum(e["execution_amount"] or 0 for e in recent)
-            },
-            "pending_recommendations": len([e for e in self.state["irrigation_log"] if not e["executed"]])
-        }
-        
-        return summary
+
+    def pending_recommendations(self):
+        return [entry for entry in reversed(self.state["irrigation_log"]) if not entry.get("executed", True)]
+
+    def pending_count(self):
+        return self.state["status"]["pending"]
+
+    def recent_totals(self, hours=24):
+        """(count, total L/m²) of the executed irrigation of the last hours"""
+        if hours == status_counters.WINDOW_HOURS:
+            return status_counters.recent(self.state["status"])  # Kept on write, no pass over the log
+        return super().recent_totals(hours)
+
+    def get_rollups(self, period="day", start=None, end=None):
+        """Daily / weekly / monthly totals (kept up to date on every write)"""
+        return rollups.select(self.state.get("rollups", {}), period, start, end)
+
+    def get_history(self, since=None):
+        """Every logged entry, archived ones included"""
+        return self.journal.history(self.state, since)
+
+    def refresh(self):
+        """Pick up what other processes wrote (journal tail only); True if anything changed"""
+        return self.journal.refresh(self.state)
 
 
 def demo_manual_workflow():
@@ -4,131 +4,24 @@ MQTT Feedback Handler - Öntözési visszajelzések kezelése
 """
 
 import json
-import sqlite3
 import os
-from datetime import datetime, timedelta
 import paho.mqtt.client as mqtt
 from mqtt_config import *
+from irrigation_state import STATE_FILE, LEGACY_DB_FILE, database_file
+from state_store import SQLiteIrrigationState
 
-# Database file for tracking irrigation events
-DB_FILE = "irrigation_log.db"
+# Same SQLite state as irrigation_state with state_backend "sqlite"
+DB_FILE = database_file(STATE_FILE)
 
-class IrrigationTracker:
+class IrrigationTracker(SQLiteIrrigationState):
+    """The SQLite state backend; the old irrigation_log.db is imported on first use"""
     def __init__(self):
-        self.setup_database()
-        
-    def setup_database(self):
-        """Initialize SQLite database for tracking"""
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS irrigation_events (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                timestamp TEXT NOT NULL,
-                recommended_amount REAL,
-                actual_amount REAL,
-                reason TEXT,
-                executed BOOLEAN DEFAULT 0,
-                execution_timestamp TEXT
-            )
-        ''')
-        
-        conn.commit()
-        conn.close()
-        print(f"✅ Database initialized: {DB_FILE}")
-        
-    def log_recommendation(self, amount, reason):
-        """Log irrigation recommendation"""
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
-        
-        timestamp = datetime.now().isoformat()
-        cursor.execute('''
-            INSERT INTO irrigation_events 
-            (timestamp, recommended_amount, reason, executed)
-            VALUES (?, ?, ?, 0)
-        ''', (timestamp, amount, reason))
-        
-        recommendation_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
-        
-        print(f"📝 Recommendation logged: ID={recommendation_id}, Amount={amount}L/m²")
-        return recommendation_id
+        super().__init__(DB_FILE, json_file=STATE_FILE,
+                         legacy_db_file=os.path.join(os.path.dirname(STATE_FILE), LEGACY_DB_FILE))
         
     def log_execution(self, actual_amount, notes=""):
         """Log actual irrigation execution from Home Assistant"""
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
-        
-        # Find the most recent unexecuted recommendation
-        cursor.execute('''
-            SELECT id FROM irrigation_events 
-            WHERE executed = 0 
-            ORDER BY timestamp DESC 
-            LIMIT 1
-        ''')
-        
-        result = cursor.fetchone()
-        if result:
-            recommendation_id = result[0]
-            execution_time = datetime.now().isoformat()
-            
-            cursor.execute('''
-                UPDATE irrigation_events 
-                SET executed = 1, actual_amount = ?, execution_timestamp = ?
-                WHERE id = ?
-            ''', (actual_amount, execution_time, recommendation_id))
-            
-            conn.commit()
-            print(f"✅ Execution logged: ID={recommendation_id}, Actual={actual_amount}L/m²")
-        else:
-            print("⚠️ No pending recommendation found to mark as executed")
-            
-        conn.close()
-        
-    def get_recent_irrigation(self, hours=24):
-        """Get recent irrigation events"""
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
-        
-        since = (datetime.now() - timedelta(hours=hours)).isoformat()
-        
-        cursor.execute('''
-            SELECT timestamp, recommended_amount, actual_amount, reason, executed, execution_timestamp
-            FROM irrigation_events 
-            WHERE timestamp >= ? 
-            ORDER BY timestamp DESC
-        ''', (since,))
-        
-        events = cursor.fetchall()
-        conn.close()
-        
-        return events
-        
-    def should_skip_recommendation(self, hours=6):
-        """Check if we should skip recommendation due to recent irrigation"""
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
-        
-        since = (datetime.now() - timedelta(hours=hours)).isoformat()
-        
-        cursor.execute('''
-            SELECT SUM(actual_amount) FROM irrigation_events 
-            WHERE executed = 1 AND execution_timestamp >= ?
-        ''', (since,))
-        
-        result = cursor.fetchone()
-        recent_irrigation = result[0] if result[0] else 0
-        
-        conn.close()
-        
-        if recent_irrigation > 0:
-            print(f"ℹ️ Recent irrigation detected: {recent_irrigation}L/m² in last {hours} hours")
-            return True, recent_irrigation
-        else:
-            return False, 0
+        return self.mark_executed(actual_amount, notes)
 
 
 # MQTT Callback functions
@@ -8,20 +8,30 @@ import json
 import sys
 import os
 import logging
-from datetime import datetime, timedelta
+from datetime import datetime
 import paho.mqtt.client as mqtt
 import time
+import threading
+import queue
 
 # Add current directory to path
 sys.path.append(os.path.dirname(__file__))
 
-from irrigation_state import SimpleIrrigationState
+import state_service
+import status_counters
 
 # Addon data directory
 DATA_DIR = "/data" if os.path.exists("/data") else "."
 STATE_FILE = os.path.join(DATA_DIR, "irrigation_state.json")
 CONFIG_FILE = os.path.join(DATA_DIR, "options.json")
 
+# /execute messages waiting for the worker (more are dropped, the network loop never waits)
+EXECUTION_QUEUE_SIZE = 100
+# Queued executions written in one journal update
+MAX_BATCH = 20
+# Seconds between retries of a failed write (the last one repeats until it succeeds or the service stops)
+RETRY_BACKOFF = (1, 2, 5, 10, 30)
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
@@ -70,62 +80,108 @@ class MQTTIrrigationService:
         self.state_file = STATE_FILE
         self.mqtt_config = load_addon_config()
         self.client = None
-        self.state = self.load_state()
+        self.expiry_timer = None
+        self.store = self.open_store()
+        # Written on the worker thread only; on_message just queues
+        self.executions = queue.Queue(maxsize=EXECUTION_QUEUE_SIZE)
+        self.metrics = {"received": 0, "dropped": 0, "applied": 0, "failed": 0, "retries": 0,
+                        "batches": 0, "max_depth": 0, "last_flush_ms": 0}
+        self.stopping = threading.Event()
+        self.worker = None
         
-    def load_state(self):
-        """Load state with addon-specific path"""
-        try:
-            if os.path.exists(self.state_file):
-                with open(self.state_file, 'r', encoding='utf-8') as f:
-                    state = json.load(f)
-                logger.info(f"State loaded from {self.state_file}")
-                return state
-            else:
-                logger.info(f"Creating new state file: {self.state_file}")
-                return self.default_state()
-        except Exception as e:
-            logger.error(f"Error loading state: {e}")
-            return self.default_state()
-    
-    def default_state(self):
-        return {
-            "last_recommendation": None,
-            "last_execution": None,
-            "irrigation_log": [],
-            "version": "1.0"
-        }
-    
-    def save_state(self):
-        """Save state to addon data directory"""
-        try:
-            with open(self.state_file, 'w', encoding='utf-8') as f:
-                json.dump(self.state, f, indent=2, ensure_ascii=False)
-            logger.info(f"State saved to {self.state_file}")
-        except Exception as e:
-            logger.error(f"Error saving state: {e}")
+    def open_store(self):
+        """The state of the configured backend (state_backend), through the owning process if one serves it"""
+        store = state_service.connect(self.state_file)
+        logger.info(f"State opened: {self.state_file} ({type(store).__name__})")
+        return store
     
     def mark_executed(self, amount, notes=""):
         """Log a new irrigation execution entry and update last_executed"""
         print("[DEBUG] mark_executed called with amount:", amount, "notes:", notes)
-        entry = {
-            "timestamp": datetime.now().isoformat(),
-            "amount_lpm2": amount,
-            "notes": notes,
-            "type": "manual"
-        }
-        self.state["irrigation_log"].append(entry)
-        self.state["last_executed"] = entry
-        # Keep only last 50 entries
-        if len(self.state["irrigation_log"]) > 50:
-            self.state["irrigation_log"] = self.state["irrigation_log"][-50:]
-        self.save_state()
-        print(f"[DEBUG] Manual irrigation logged: {amount}L/m² - {notes}")
-        logger.info(f"Manual irrigation logged: {amount}L/m² - {notes}")
+        return self.apply_executions([(amount, notes)])
+    
+    def apply_executions(self, executions):
+        """Log a batch of executions in one write (journal update / transaction), then publish once"""
+        logged = self.store.log_executions(executions)
+        for amount, notes in executions:
+            print(f"[DEBUG] Manual irrigation logged: {amount}L/m² - {notes}")
+            logger.info(f"Manual irrigation logged: {amount}L/m² - {notes}")
         self.publish_status_update()
+        return logged
+    
+    def queue_execution(self, amount, notes):
+        """Hand an execution to the worker (network thread: never blocks)"""
+        self.metrics["received"] += 1
+        try:
+            self.executions.put_nowait((amount, notes))
+        except queue.Full:
+            self.metrics["dropped"] += 1
+            logger.warning(f"Execution queue full ({EXECUTION_QUEUE_SIZE}), dropped: {amount}L/m² - {notes}")
+            return False
+        self.metrics["max_depth"] = max(self.metrics["max_depth"], self.executions.qsize())
+        return True
+    
+    def process_executions(self):
+        """Worker: write what is queued, consecutive messages in one batch"""
+        while not (self.stopping.is_set() and self.executions.empty()):
+            try:
+                batch = [self.executions.get(timeout=1)]
+            except queue.Empty:
+                continue
+            while len(batch) < MAX_BATCH:
+                try:
+                    batch.append(self.executions.get_nowait())
+                except queue.Empty:
+                    break
+            executions = [item for item in batch if item is not None]
+            start = time.perf_counter()
+            if self.write_executions(executions, None in batch):
+                self.metrics["applied"] += len(executions)
+            else:
+                self.metrics["failed"] += len(executions)
+            self.metrics["batches"] += 1
+            self.metrics["last_flush_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    
+    def write_executions(self, executions, publish):
+        """Write a batch, retrying with a backoff while the store fails; False if given up at stop"""
+        attempt = 0
+        while True:
+            try:
+                marked = self.apply_executions(executions) if executions else 0
+                if not marked and publish:
+                    self.publish_status_update()  # Asked for by the expiry timer
+                return True
+            except Exception as e:
+                if self.stopping.is_set():
+                    logger.error(f"Error writing executions, giving up on {len(executions)} at stop: {e}")
+                    return False
+                delay = RETRY_BACKOFF[min(attempt, len(RETRY_BACKOFF) - 1)]
+                logger.warning(f"Error writing executions, retrying in {delay}s: {e}")
+                self.metrics["retries"] += 1
+                attempt += 1
+                # Queued messages wait (new ones are dropped when it is full); stop cuts the wait short
+                self.stopping.wait(delay)
+    
+    def start_worker(self):
+        self.stopping.clear()
+        self.worker = threading.Thread(target=self.process_executions, daemon=True, name="mqtt-executions")
+        self.worker.start()
+    
+    def stop_worker(self, timeout=10):
+        """Write what is still queued, then stop"""
+        self.stopping.set()
+        if self.worker:
+            self.worker.join(timeout)
+            self.worker = None
+    
+    def queue_metrics(self):
+        """Backpressure of the execution queue"""
+        return dict(self.metrics, depth=self.executions.qsize(), capacity=EXECUTION_QUEUE_SIZE)
     
     def publish_status_update(self):
         """Publish status update to MQTT (naplóalapú)"""
         try:
+            self.store.refresh()  # Other processes write the state too
             summary = self.get_status_summary()
             status_topic = f"{self.mqtt_config['MQTT_TOPIC_BASE']}/addon_status"
             status_message = {
@@ -133,24 +189,40 @@ class MQTTIrrigationService:
                 "last_execution": summary["last_execution"],
                 "last_execution_amount": summary["last_execution_amount"],
                 "recent_24h_amount": summary["recent_24h_amount"],
-                "recent_24h_count": summary["recent_24h_count"]
+                "recent_24h_count": summary["recent_24h_count"],
+                "queue": self.queue_metrics()
             }
             self.client.publish(status_topic, json.dumps(status_message), qos=1, retain=True)
             logger.info(f"Status update published to {status_topic}")
+            self.schedule_expiry()
         except Exception as e:
             logger.error(f"Error publishing status: {e}")
         
+    def schedule_expiry(self):
+        """Publish again when the oldest irrigation leaves the 24h window (the status is retained)"""
+        if self.expiry_timer:
+            self.expiry_timer.cancel()
+        expiry = self.store.next_expiry()  # Kept on write / index lookup, no pass over the log
+        if expiry:
+            delay = max(1, (datetime.fromisoformat(expiry) - datetime.now()).total_seconds() + 1)
+            self.expiry_timer = threading.Timer(delay, self.request_status_update)
+            self.expiry_timer.daemon = True
+            self.expiry_timer.start()
+    
+    def request_status_update(self):
+        """Publish from the worker thread (it writes the state)"""
+        try:
+            self.executions.put_nowait(None)
+        except queue.Full:
+            pass  # The queued executions publish anyway
+    
     def get_status_summary(self):
-        """Get status summary (last_executed mezővel)"""
-        last_executed = self.state.get("last_executed")
-        last_execution = last_executed["timestamp"][:19] if last_executed else None
-        last_execution_amount = last_executed["amount_lpm2"] if last_executed else 0
-        # Utolsó 24 óra locsolásai
-        cutoff = datetime.now() - timedelta(hours=24)
-        recent = [e for e in self.state["irrigation_log"]
-                if datetime.fromisoformat(e["timestamp"]) > cutoff and e.get("type") in ["manual", "advisor"]]
-        recent_24h_amount = sum(e["amount_lpm2"] or 0 for e in recent)
-        recent_24h_count = len(recent)
+        """Get status summary (utolsó öntözéssel)"""
+        last_executed = self.store.last_execution()
+        last_execution = last_executed["time"][:19] if last_executed else None
+        last_execution_amount = last_executed["amount"] if last_executed else 0
+        # Utolsó 24 óra locsolásai (íráskor vezetett számlálókból / indexelt lekérdezéssel)
+        recent_24h_count, recent_24h_amount = self.store.recent_totals(status_counters.WINDOW_HOURS)
         return {
             "last_execution": last_execution,
             "last_execution_amount": last_execution_amount,
@@ -184,13 +256,13 @@ class MQTTIrrigationService:
                     amount = float(data.get('amount', 0))
                     notes = data.get('notes', 'Home Assistant automatic')
                     
-                    self.mark_executed(amount, notes)
+                    self.queue_execution(amount, notes)
                     
-                except (json.JSONDecodeError, ValueError):
-                    # Simple numeric value
+                except (json.JSONDecodeError, ValueError, AttributeError):
+                    # Simple numeric value (valid JSON too, but not an object)
                     try:
                         amount = float(payload)
-                        self.mark_executed(amount, 'Home Assistant automatic')
+                        self.queue_execution(amount, 'Home Assistant automatic')
                     except ValueError:
                         logger.error(f"Invalid execution payload: {payload}")
                         
@@ -215,6 +287,7 @@ class MQTTIrrigationService:
             self.client.connect(self.mqtt_config['MQTT_BROKER'], self.mqtt_config['MQTT_PORT'], 60)
             
             logger.info("Starting MQTT irrigation service... (Ctrl+C to stop)")
+            self.start_worker()
             self.client.loop_forever()
             
         except KeyboardInterrupt:
@@ -222,6 +295,8 @@ class MQTTIrrigationService:
         except Exception as e:
             logger.error(f"Service error: {e}")
         finally:
+            self.stop_worker()
+            self.store.close()
             if self.client:
                 self.client.disconnect()
 
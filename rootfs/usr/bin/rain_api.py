@@ -7,6 +7,10 @@ import json
 import requests
 from datetime import datetime
 
+import forecast_daily
+import weather_cache
+import weather_client
+
 # Load configuration
 with open("./data/options.json") as f:
     options = json.load(f)
@@ -24,35 +28,19 @@ def get_rain_forecast_simple():
     """
     url = f"https://api.openweathermap.org/data/2.5/forecast?lat={lat}&lon={lon}&appid={api_key}&units={units}&lang=hu"
     
+    def fetch():
+        return weather_client.get_json(url)
+    
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-        forecast_data = response.json()
+        # Shared with the other scripts until OWM publishes a new forecast
+        forecast_data = weather_cache.get_forecast(lat, lon, units, fetch)
     except requests.RequestException as e:
         return {"error": f"API hiba: {e}"}
     
-    # Napi csapadék összesítés
-    daily_rain = {}
-    city = forecast_data.get('city', {}).get('name', 'N/A')
-    
-    for item in forecast_data.get('list', []):
-        dt_txt = item.get('dt_txt', '')
-        if not dt_txt:
-            continue
-            
-        date = dt_txt.split(' ')[0]
-        
-        # Csapadék
-        rain_3h = 0
-        if 'rain' in item:
-            rain_3h = item['rain'].get('3h', 0)
-        if 'snow' in item:
-            rain_3h += item['snow'].get('3h', 0)
-        
-        if date not in daily_rain:
-            daily_rain[date] = 0
-        
-        daily_rain[date] += rain_3h
+    # Napi csapadék összesítés (grouped once per forecast document)
+    daily = forecast_daily.daily_forecast(forecast_data)
+    daily_rain = daily.rain_by_day()
+    city = daily.city
     
     # Eredmény formázása
     result = {
@@ -6,6 +6,8 @@ Egyszerű szkript a jelenlegi esőzés ellenőrzésére.
 import json
 import requests
 
+import weather_client
+
 # Load configuration options from a JSON file
 with open("./data/options.json") as f:
     options = json.load(f)
@@ -21,9 +23,7 @@ def get_current_weather():
     url = f"https://api.openweathermap.org/data/2.5/weather?lat={lat}&lon={lon}&appid={api_key}&units={units}&lang=hu"
     
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-        return response.json()
+        return weather_client.get_json(url)
     except requests.RequestException as e:
         print(f"Hiba a jelenlegi időjárás lekérdezésekor: {e}")
         return None
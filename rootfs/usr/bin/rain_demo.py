@@ -7,6 +7,8 @@ import json
 import requests
 from datetime import datetime
 
+import weather_client
+
 # Load configuration options
 with open("./data/options.json") as f:
     options = json.load(f)
@@ -22,9 +24,7 @@ def get_current_weather():
     url = f"https://api.openweathermap.org/data/2.5/weather?lat={lat}&lon={lon}&appid={api_key}&units={units}&lang=hu"
     
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-        return response.json()
+        return weather_client.get_json(url)
     except requests.RequestException as e:
         print(f"Hiba: {e}")
         return None
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Öntözési összesítők (napi / heti / havi)
+Recommendations and executions summed per day, ISO week and month. Both
+state backends keep them up to date on every write, so season-long
+questions ("how much water in July?") read a few buckets instead of the
+raw log.
+
+Buckets: day "2030-06-01", week "2030-W22", month "2030-06". Each holds
+[recommendations, recommended_lpm2, executions, executed_lpm2]; executions
+count in the bucket of their execution time.
+"""
+
+from datetime import date
+
+PERIODS = ("day", "week", "month")
+FIELDS = ("recommendations", "recommended_lpm2", "executions", "executed_lpm2")
+
+
+def buckets(time_iso):
+    """{period: bucket} of an ISO timestamp"""
+    day = time_iso[:10]
+    year, week, _ = date.fromisoformat(day).isocalendar()
+    return {"day": day, "week": f"{year}-W{week:02d}", "month": day[:7]}
+
+
+def entry_contributions(entry):
+    """(time, recommended L/m², executed L/m²) pairs a log entry adds"""
+    if entry.get("type") == "manual":
+        return [(entry["timestamp"], None, entry.get("amount_lpm2") or 0)]
+    contributions = [(entry["timestamp"], entry.get("amount_lpm2") or 0, None)]
+    if entry.get("executed") and entry.get("execution_time"):
+        contributions.append((entry["execution_time"], None,
+                              entry.get("execution_amount") or entry.get("amount_lpm2") or 0))
+    return contributions
+
+
+def add(rollups, time_iso, recommended=None, executed=None):
+    """Count one recommendation and/or execution into a rollups dict"""
+    for period, bucket in buckets(time_iso).items():
+        totals = rollups.setdefault(period, {}).setdefault(bucket, [0, 0, 0, 0])
+        if recommended is not None:
+            totals[0] += 1
+            totals[1] += recommended
+        if executed is not None:
+            totals[2] += 1
+            totals[3] += executed
+
+
+def from_entries(entries):
+    """Rollups of a list of log entries (for states written before rollups)"""
+    rollups = {}
+    for entry in entries:
+        for time_iso, recommended, executed in entry_contributions(entry):
+            add(rollups, time_iso, recommended, executed)
+    return rollups
+
+
+def select(rollups, period="day", start=None, end=None):
+    """Buckets of one period between start and end (inclusive), oldest first"""
+    if period not in PERIODS:
+        raise ValueError(f"Unknown period: {period}")
+    return [
+        dict(zip(FIELDS, totals), period=period, bucket=bucket)
+        for bucket, totals in sorted(rollups.get(period, {}).items())
+        if (start is None or bucket >= start) and (end is None or bucket <= end)
+    ]
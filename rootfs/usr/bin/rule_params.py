@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Döntési szabályok paraméterei
+Thresholds and amounts of the irrigation decision rules. The defaults are
+the original hand-picked values; calibrate.py writes site-tuned values to
+tuned_params.json. The advisor loads them on top of the defaults only when
+the use_tuned_params option is set.
+"""
+
+import json
+import os
+
+# Addon data directory
+DATA_DIR = "/data" if os.path.exists("/data") else "."
+TUNED_PARAMS_FILE = os.path.join(DATA_DIR, "tuned_params.json")
+CONFIG_FILE = os.path.join(DATA_DIR, "options.json")
+
+DEFAULTS = {
+    'surplus_mm': 5.0,              # Rule 0: surplus above this -> no
+    'raining_now_mm': 2.0,          # Rule 1: current rain intensity
+    'rain_tomorrow_mm': 10.0,       # Rule 2: wait for tomorrow's rain
+    'high_deficit_mm': 15.0,        # Rule 3: high deficit
+    'irrigation_factor': 0.7,       # Rule 3: part of the deficit replaced
+    'max_irrigation_mm': 25.0,      # Rule 3: largest single watering
+    'hot_deficit_mm': 8.0,          # Rule 4: moderate deficit + hot
+    'hot_temp': 30.0,
+    'hot_amount_mm': 15.0,
+    'very_hot_deficit_mm': 5.0,     # Rule 5: very hot and dry
+    'very_hot_temp': 32.0,
+    'very_hot_humidity': 30.0,
+    'very_hot_amount_mm': 10.0,
+    'small_deficit_mm': 5.0,        # Rule 7: small deficit
+    'small_rain_ratio': 0.3,        # Rule 7: rain expected below this part of the loss
+    'light_amount_mm': 8.0,         # Rule 7 and the seasonal adjustment
+    'seasonal_deficit_mm': 8.0,     # Late summer: light watering above this deficit
+    'soil_capacity_mm': 30.0,       # Surplus the soil holds, the rest runs off
+    'available_water_mm': 40.0      # Total available water of the root zone: the largest deficit
+}
+
+
+def tuned_params_enabled():
+    """use_tuned_params option (default off): tuned_params.json is used only when asked for"""
+    try:
+        with open(CONFIG_FILE, 'r', encoding='utf-8') as f:
+            return bool(json.load(f).get('use_tuned_params', False))
+    except (OSError, ValueError, AttributeError):
+        return False
+
+
+USE_TUNED_PARAMS = tuned_params_enabled()
+
+
+def load(path=None, enabled=None):
+    """
+    DEFAULTS overridden by the tuned values in `path` (default: TUNED_PARAMS_FILE).
+    enabled: use the tuned values at all (default: the use_tuned_params option)
+    """
+    params = dict(DEFAULTS)
+    if not (USE_TUNED_PARAMS if enabled is None else enabled):
+        return params
+    try:
+        with open(path or TUNED_PARAMS_FILE, 'r', encoding='utf-8') as f:
+            tuned = json.load(f).get('params', {})
+    except (OSError, ValueError, AttributeError):
+        return params
+    params.update({key: float(value) for key, value in tuned.items() if key in DEFAULTS})
+    return params
+
+
+def save(params, path=None, **details):
+    """Write tuned params (only the ones differing from DEFAULTS) with calibration details"""
+    path = path or TUNED_PARAMS_FILE
+    data = dict(details, params={key: value for key, value in params.items() if DEFAULTS.get(key) != value})
+    tmp_file = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_file, path)
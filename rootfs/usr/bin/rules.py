@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Öntözési döntési szabályok
+The rule chain of the advisor, written once. Conditions and amounts use
+only comparisons, & and arithmetic, so the same functions take scalars
+(evaluate_snapshot: one lawn, no NumPy needed) and NumPy arrays
+(zones.evaluate_zones: every zone, or every backtest season, at once).
+
+Inputs, a dict of scalars or equal-shaped arrays:
+    deficit         soil moisture deficit (mm, negative = surplus)
+    expected_loss   ET of the next 3 days (mm, Kc applied)
+    upcoming_rain   rain of the next 3 days (mm)
+    currently_raining, current_rain, humidity_now   current observation
+    rain_tomorrow, temp_tomorrow                    first forecast day
+"""
+
+# Rule ids, in priority order: the first rule whose condition holds decides
+RULE_SURPLUS, RULE_RAINING, RULE_RAIN_TOMORROW, RULE_HIGH_DEFICIT, RULE_HOT, \
+    RULE_VERY_HOT_DRY, RULE_RAIN_COVERS, RULE_SMALL_DEFICIT, RULE_SMALL_DEFICIT_RAIN, \
+    RULE_WELL_WATERED = range(10)
+
+RULE_NAMES = ('surplus', 'raining', 'rain_tomorrow', 'high_deficit', 'hot', 'very_hot_dry',
+              'rain_covers', 'small_deficit', 'small_deficit_rain', 'well_watered')
+
+RECOMMENDATIONS = ('no', 'no', 'wait', 'yes', 'yes', 'yes', 'no', 'light', 'no', 'no')
+CONFIDENCE = (95, 95, 85, 90, 75, 70, 80, 60, 65, 75)
+
+# Late summer (August is typically dry in Hungary): first and last month
+SEASONAL_MONTHS = (7, 9)
+SEASONAL_REASON = 'Nyár végi korrekcó: száraz évszak'
+
+
+def conditions(v, p):
+    """Conditions of the rules before RULE_WELL_WATERED (the default), in order"""
+    deficit = v['deficit']
+    small_deficit = (deficit > 0) & (deficit <= p['small_deficit_mm'])
+    return [
+        deficit < -p['surplus_mm'],
+        v['currently_raining'] & (v['current_rain'] > p['raining_now_mm']),
+        v['rain_tomorrow'] > p['rain_tomorrow_mm'],
+        deficit > p['high_deficit_mm'],
+        (deficit > p['hot_deficit_mm']) & (v['temp_tomorrow'] > p['hot_temp']),
+        (deficit > p['very_hot_deficit_mm']) & (v['temp_tomorrow'] > p['very_hot_temp'])
+        & (v['humidity_now'] < p['very_hot_humidity']),
+        v['upcoming_rain'] > v['expected_loss'],
+        small_deficit & (v['upcoming_rain'] < v['expected_loss'] * p['small_rain_ratio']),
+        small_deficit
+    ]
+
+
+def amounts(v, p):
+    """Water (mm) of the rules that irrigate, before the max_irrigation cap"""
+    return {
+        RULE_HIGH_DEFICIT: v['deficit'] * p['irrigation_factor'],
+        RULE_HOT: p['hot_amount_mm'],
+        RULE_VERY_HOT_DRY: p['very_hot_amount_mm'],
+        RULE_SMALL_DEFICIT: p['light_amount_mm']
+    }
+
+
+def seasonal(v, month, p):
+    """Where a 'no' becomes light watering"""
+    return (month >= SEASONAL_MONTHS[0]) & (month <= SEASONAL_MONTHS[1]) & (v['deficit'] > p['seasonal_deficit_mm'])
+
+
+def decide(v, month, p, max_irrigation):
+    """The rule chain for scalar inputs (one lawn)"""
+    rule = next((rule for rule, met in enumerate(conditions(v, p)) if met), RULE_WELL_WATERED)
+    recommendation = RECOMMENDATIONS[rule]
+    amount = amounts(v, p).get(rule, 0.0)
+    confidence = CONFIDENCE[rule]
+    adjusted = recommendation == 'no' and bool(seasonal(v, month, p))
+    if adjusted:
+        recommendation = 'light'
+        amount = max(amount, p['light_amount_mm'])
+        confidence = max(60, confidence - 10)
+    return {
+        'rule': rule,
+        'recommendation': recommendation,
+        'amount_mm': min(amount, max_irrigation),
+        'confidence': confidence,
+        'seasonal': adjusted
+    }
+
+
+def reason(rule, deficit, upcoming_rain, expected_loss, rain_tomorrow):
+    """Hungarian reason text of a rule"""
+    if rule == RULE_SURPLUS:
+        return f'Talaj jól öntözött, többlet: {abs(deficit):.1f}mm'
+    if rule == RULE_RAINING:
+        return 'Jelenleg erősen esik az eső'
+    if rule == RULE_RAIN_TOMORROW:
+        return f"Holnap {rain_tomorrow:.1f}mm eső várható"
+    if rule == RULE_HIGH_DEFICIT:
+        return f'Nagy talajnedvesség hiány ({deficit:.1f}mm)'
+    if rule == RULE_HOT:
+        return 'Mérsékelt hiány + forró idő várható'
+    if rule == RULE_VERY_HOT_DRY:
+        return 'Nagyon forró és száraz körülmények'
+    if rule == RULE_RAIN_COVERS:
+        return f'Várható eső ({upcoming_rain:.1f}mm) fedezi az igényt ({expected_loss:.1f}mm)'
+    if rule == RULE_SMALL_DEFICIT:
+        return 'Kis hiány, mérsékelt öntözés'
+    if rule == RULE_SMALL_DEFICIT_RAIN:
+        return 'Kis hiány, de várható eső segít'
+    return 'Megfelelő talajnedvesség'
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Perzisztens napi talajvíz-mérleg
+A bucket model advanced one day at a time from the last saved state:
+deficit(day) = deficit(day - 1) - (rain + irrigation - ET), kept between
+MIN_DEFICIT (surplus runs off) and MAX_DEFICIT (the root zone is empty).
+Re-recording a day with corrected values replays the days after it, and
+recording the same values again changes nothing.
+"""
+
+import fcntl
+import json
+import os
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import rule_params
+
+# Addon data directory
+DATA_DIR = "/data" if os.path.exists("/data") else "."
+BALANCE_FILE = os.path.join(DATA_DIR, "soil_balance.json")
+
+# Soil can't hold infinite water - above 30mm surplus (or the tuned
+# soil capacity) the rest runs off
+MIN_DEFICIT = -rule_params.load()['soil_capacity_mm']
+
+# ...nor lose more than it holds: once the root zone is dry (total available
+# water, TAW) the lawn stops transpiring, so the deficit stops growing
+MAX_DEFICIT = rule_params.load()['available_water_mm']
+
+# Days fetched when there is no saved state yet, and at most after a long gap
+BOOTSTRAP_DAYS = 7
+MAX_BACKFILL_DAYS = 30
+
+# Per-day entries kept for corrections; older days are folded into the anchor
+KEEP_DAYS = 60
+
+
+class SoilWaterBalance:
+    """Daily water balance; state is a plain dict so it can be stored as JSON"""
+
+    def __init__(self, state=None):
+        state = state or {}
+        self.anchor = state.get("anchor", {"date": None, "deficit": 0.0})
+        self.days = state.get("days", {})
+
+    def to_dict(self):
+        return {"anchor": self.anchor, "days": self.days}
+
+    def last_date(self):
+        return max(self.days) if self.days else self.anchor["date"]
+
+    def deficit(self, date=None):
+        """Deficit in mm after `date` (default: the last recorded day)"""
+        dates = [d for d in self.days if date is None or d <= date]
+        return self.days[max(dates)]["deficit"] if dates else self.anchor["deficit"]
+
+    def record_day(self, date, et=None, rain=None, irrigation=None):
+        """
+        Add or correct one day; fields left as None keep their stored value.
+        Returns True if the balance changed.
+        """
+        if self.anchor["date"] and date <= self.anchor["date"]:
+            return False  # Folded into the anchor already
+
+        old = self.days.get(date, {"et": 0.0, "rain": 0.0, "irrigation": 0.0})
+        entry = {
+            "et": old["et"] if et is None else float(et),
+            "rain": old["rain"] if rain is None else float(rain),
+            "irrigation": old["irrigation"] if irrigation is None else float(irrigation)
+        }
+        if date in self.days and all(self.days[date][key] == entry[key] for key in entry):
+            return False
+
+        self.days[date] = entry
+        self._replay_from(date)
+        return True
+
+    def _replay_from(self, date):
+        earlier = [d for d in self.days if d < date]
+        deficit = self.days[max(earlier)]["deficit"] if earlier else self.anchor["deficit"]
+        for day in sorted(d for d in self.days if d >= date):
+            entry = self.days[day]
+            deficit = min(MAX_DEFICIT, max(MIN_DEFICIT, deficit - (entry["rain"] + entry["irrigation"] - entry["et"])))
+            entry["deficit"] = round(deficit, 3)
+            deficit = entry["deficit"]
+
+    def compact(self, today=None):
+        """Fold days older than KEEP_DAYS into the anchor"""
+        today = today or datetime.now().strftime("%Y-%m-%d")
+        cutoff = (datetime.strptime(today, "%Y-%m-%d") - timedelta(days=KEEP_DAYS)).strftime("%Y-%m-%d")
+        old = sorted(d for d in self.days if d < cutoff)
+        if old:
+            self.anchor = {"date": old[-1], "deficit": self.days[old[-1]]["deficit"]}
+            for day in old:
+                del self.days[day]
+
+    def dates_to_fetch(self, today=None):
+        """
+        Complete days (before today) missing from the balance, oldest first:
+        new days since the last check, and days whose download failed earlier
+        """
+        today = datetime.strptime(today or datetime.now().strftime("%Y-%m-%d"), "%Y-%m-%d")
+        if not self.days and self.anchor["date"] is None:
+            count = BOOTSTRAP_DAYS
+        else:
+            first = min(self.days) if self.days else self.anchor["date"]
+            count = min(MAX_BACKFILL_DAYS, (today - datetime.strptime(first, "%Y-%m-%d")).days)
+        dates = [(today - timedelta(days=i)).strftime("%Y-%m-%d") for i in range(count, 0, -1)]
+        return [date for date in dates if date not in self.days and
+                (self.anchor["date"] is None or date > self.anchor["date"])]
+
+
+def load():
+    try:
+        with open(BALANCE_FILE, 'r', encoding='utf-8') as f:
+            return SoilWaterBalance(json.load(f))
+    except (OSError, ValueError):
+        return SoilWaterBalance()
+
+
+def save(balance):
+    tmp_file = f"{BALANCE_FILE}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(balance.to_dict(), f, ensure_ascii=False, indent=1)
+    os.replace(tmp_file, BALANCE_FILE)
+
+
+@contextmanager
+def locked():
+    """Load, let the caller update, then save - under a cross-process lock"""
+    with open(f"{BALANCE_FILE}.lock", 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            balance = load()
+            yield balance
+            balance.compact()
+            save(balance)
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def dates_to_fetch():
+    """Days the next check has to download"""
+    return load().dates_to_fetch()
+
+
+if __name__ == "__main__":
+    balance = load()
+    print(f"💧 Talajvíz-mérleg: {balance.deficit():.1f}mm hiány ({balance.last_date()})")
+    for day in sorted(balance.days)[-10:]:
+        entry = balance.days[day]
+        print(f"   {day}: ET {entry['et']:.1f}, eső {entry['rain']:.1f}, öntözés {entry['irrigation']:.1f} -> {entry['deficit']:.1f}mm")
@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+"""
+Öntözési állapot napló (append-only journal)
+Every change of irrigation_state.json is appended as one JSON line to
+irrigation_state.json.journal instead of rewriting the whole file. Loading
+replays the journal on top of the last snapshot; after COMPACT_AFTER_EVENTS
+lines the state is written as a new snapshot and the journal starts over.
+
+Events carry a sequence number and the snapshot stores the last one it
+contains, so a crash between writing the snapshot and emptying the journal
+does not apply anything twice, and a torn last line is skipped.
+
+Log entries beyond the newest MAX_LOG_ENTRIES move to the history file
+(one compact JSON line each) when the state is compacted, so nothing is
+lost; per day / week / month totals (rollups.py) and the counters of the
+status summary (status_counters.py) are kept in the state.
+
+Several processes (REST service, MQTT service, scheduler, CLI) share the
+files: writers serialize on a lock file and re-read what the others wrote
+before changing anything, so no update is lost.
+
+Events:
+    {"op": "append", "entry": {...}}                      -> irrigation_log
+    {"op": "update", "timestamp": ts, "fields": {...}}    -> log entry with that timestamp
+    {"op": "set", "key": k, "value": v}                   -> top-level state key
+"""
+
+import fcntl
+import json
+import os
+import threading
+from contextlib import contextmanager
+
+import rollups
+import status_counters
+
+JOURNAL_SUFFIX = ".journal"
+HISTORY_SUFFIX = ".history"
+
+# Journal lines before the state is compacted into a new snapshot
+COMPACT_AFTER_EVENTS = 100
+
+# Log entries kept in the state (older ones move to the history file)
+MAX_LOG_ENTRIES = 50
+
+
+def default_state():
+    return {
+        "last_recommendation": None,
+        "last_execution": None,
+        "irrigation_log": [],
+        "rollups": {},
+        "status": status_counters.empty(),
+        "version": "1.0"
+    }
+
+
+def apply_event(state, event):
+    """Apply one journal event to a state dict (rollups and status counters included)"""
+    op = event["op"]
+    if op == "append":
+        entry = event["entry"]
+        state["irrigation_log"].append(entry)
+        for time_iso, recommended, executed in rollups.entry_contributions(entry):
+            rollups.add(state.setdefault("rollups", {}), time_iso, recommended, executed)
+        status = state.setdefault("status", status_counters.empty())
+        if entry.get("type") == "manual":
+            status_counters.add_execution(status, entry["timestamp"], entry.get("amount_lpm2"))
+        elif entry.get("executed") and entry.get("execution_time"):
+            status_counters.add_execution(status, entry["execution_time"], entry.get("execution_amount"))
+        elif not entry.get("executed", True):
+            status_counters.add_recommendation(status)
+    elif op == "update":
+        fields = event["fields"]
+        was_pending = False
+        for entry in reversed(state["irrigation_log"]):
+            if entry.get("timestamp") == event["timestamp"]:
+                was_pending = not entry.get("executed", True)
+                entry.update(fields)
+                break
+        if fields.get("executed") and fields.get("execution_time"):
+            rollups.add(state.setdefault("rollups", {}), fields["execution_time"],
+                        executed=fields.get("execution_amount") or 0)
+            status_counters.add_execution(state.setdefault("status", status_counters.empty()),
+                                          fields["execution_time"], fields.get("execution_amount"), was_pending)
+    elif op == "set":
+        state[event["key"]] = event["value"]
+
+
+class StateConflict(Exception):
+    """The state changed on disk since the caller read it"""
+
+
+class StateJournal:
+    """
+    Snapshot + journal pair of one state file, shared by several processes.
+    Writers hold an exclusive lock on <state file>.lock and first catch up
+    with what other processes wrote; readers take a shared lock, so they
+    never see a snapshot and a journal from different compactions.
+    """
+
+    def __init__(self, state_file):
+        self.state_file = state_file
+        self.journal_file = state_file + JOURNAL_SUFFIX
+        self.lock_file = state_file + ".lock"
+        self.history_file = state_file + HISTORY_SUFFIX
+        self.journal_events = 0
+        self.journal_offset = 0     # Bytes of the journal already applied
+        self.snapshot_id = None     # Which snapshot the state was built on
+        self.default = default_state
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def _locked(self, mode):
+        with self.lock, open(self.lock_file, 'a') as lock_file:
+            fcntl.flock(lock_file, mode)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _snapshot_signature(self):
+        try:
+            stat = os.stat(self.state_file)
+        except FileNotFoundError:
+            return None
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    def _read(self):
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            state = self.default()
+        self.snapshot_id = self._snapshot_signature()
+        state.setdefault("journal_seq", 0)
+        if "rollups" not in state:
+            state["rollups"] = rollups.from_entries(state["irrigation_log"])
+        if "status" not in state:
+            # Archived executions may still be in the 24 hour window (once per old state)
+            state["status"] = status_counters.from_entries(self._read_history() + state["irrigation_log"])
+            state["status"]["pending"] = sum(1 for entry in state["irrigation_log"] if not entry.get("executed", True))
+        self.journal_offset = 0
+        self.journal_events = 0
+        self._replay(state)
+        return state
+
+    def _replay(self, state):
+        """Apply the journal lines after journal_offset"""
+        try:
+            with open(self.journal_file, 'rb') as f:
+                f.seek(self.journal_offset)
+                data = f.read()
+        except FileNotFoundError:
+            return
+        for line in data.splitlines(keepends=True):
+            if not line.endswith(b"\n"):
+                break  # Torn write of a crashed process, left unconsumed
+            self.journal_offset += len(line)
+            try:
+                event = json.loads(line)
+            except ValueError:
+                continue
+            self.journal_events += 1
+            if event.get("seq", 0) > state["journal_seq"]:
+                apply_event(state, event)
+                state["journal_seq"] = event["seq"]
+
+    def _refresh(self, state):
+        """Catch up with the changes of other processes (under the lock)"""
+        state.setdefault("journal_seq", 0)
+        try:
+            journal_size = os.path.getsize(self.journal_file)
+        except FileNotFoundError:
+            journal_size = 0
+        if self._snapshot_signature() != self.snapshot_id or journal_size < self.journal_offset:
+            fresh = self._read()  # Compacted meanwhile
+            state.clear()
+            state.update(fresh)
+        else:
+            self._replay(state)
+
+    def refresh(self, state):
+        """Bring a long-lived state up to date with the files; True if it changed"""
+        seq = state.get("journal_seq", 0)
+        with self._locked(fcntl.LOCK_SH):
+            self._refresh(state)
+        return state["journal_seq"] != seq
+
+    def load(self, default=default_state):
+        """Snapshot with the journal replayed on top (default() if neither exists)"""
+        self.default = default
+        with self._locked(fcntl.LOCK_SH):
+            return self._read()
+
+    def update(self, state, change):
+        """
+        Read-modify-write: change(state) runs on the up-to-date state under the
+        exclusive lock and returns the events to record. Returns the events.
+        """
+        with self._locked(fcntl.LOCK_EX):
+            self._refresh(state)
+            events = change(state) or []
+            if events:
+                self._append(state, events)
+            return events
+
+    def record(self, state, *events, expected_seq=None):
+        """
+        Append events computed by the caller. Optimistic check: raises
+        StateConflict (with state refreshed) if another process wrote since
+        the caller's version (expected_seq, default: state's journal_seq).
+        """
+        with self._locked(fcntl.LOCK_EX):
+            seen = state.get("journal_seq", 0) if expected_seq is None else expected_seq
+            self._refresh(state)
+            if state["journal_seq"] != seen:
+                raise StateConflict(f"state changed: version {seen} -> {state['journal_seq']}")
+            self._append(state, events)
+
+    def _append(self, state, events):
+        """One write + fsync for all events (O(1) per event)"""
+        lines = []
+        for event in events:
+            state["journal_seq"] = state.get("journal_seq", 0) + 1
+            event = dict(event, seq=state["journal_seq"])
+            lines.append(json.dumps(event, ensure_ascii=False) + "\n")
+            apply_event(state, event)
+        data = "".join(lines).encode("utf-8")
+
+        fd = os.open(self.journal_file, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            # A torn line left by a crash must not swallow the next event
+            if os.fstat(fd).st_size > self.journal_offset:
+                data = b"\n" + data
+            os.write(fd, data)
+            os.fsync(fd)
+            self.journal_offset = os.fstat(fd).st_size
+        finally:
+            os.close(fd)
+        self.journal_events += len(lines)
+
+        if self.journal_events >= COMPACT_AFTER_EVENTS:
+            self._compact(state)
+
+    def compact(self, state):
+        """Write the state as the new snapshot and empty the journal"""
+        with self._locked(fcntl.LOCK_EX):
+            self._refresh(state)
+            self._compact(state)
+
+    def _archive(self, state):
+        """Move the log entries beyond MAX_LOG_ENTRIES to the history file"""
+        log = state["irrigation_log"]
+        if len(log) <= MAX_LOG_ENTRIES:
+            return
+        old = log[:-MAX_LOG_ENTRIES]
+        # A compaction that crashed after archiving must not archive twice
+        last = self._last_archived()
+        if last in old:
+            old = old[old.index(last) + 1:]
+        if old:
+            with open(self.history_file, 'a', encoding='utf-8') as f:
+                f.writelines(json.dumps(entry, ensure_ascii=False, separators=(',', ':')) + "\n" for entry in old)
+                f.flush()
+                os.fsync(f.fileno())
+        state["irrigation_log"] = log[-MAX_LOG_ENTRIES:]
+        # Archived recommendations can not be marked executed any more
+        status = state.setdefault("status", status_counters.empty())
+        status["pending"] = max(0, status["pending"] - sum(1 for entry in log[:-MAX_LOG_ENTRIES]
+                                                           if not entry.get("executed", True)))
+
+    def _last_archived(self):
+        try:
+            with open(self.history_file, 'rb') as f:
+                f.seek(max(0, os.fstat(f.fileno()).st_size - 65536))
+                lines = f.read().splitlines()
+            return json.loads(lines[-1]) if lines else None
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def history(self, state, since=None):
+        """Every log entry (from since on): the history file, then the state's log"""
+        with self._locked(fcntl.LOCK_SH):
+            self._refresh(state)
+            entries = self._read_history() + state["irrigation_log"]
+        return [entry for entry in entries if since is None or entry["timestamp"] >= since]
+
+    def _read_history(self):
+        entries = []
+        try:
+            with open(self.history_file, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entries.append(json.loads(line))
+                    except ValueError:
+                        continue
+        except FileNotFoundError:
+            pass
+        return entries
+
+    def _compact(self, state):
+        self._archive(state)
+        tmp_file = f"{self.state_file}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(state, f, indent=2, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, self.state_file)
+        # Events up to journal_seq are in the snapshot now
+        with open(self.journal_file, 'w', encoding='utf-8'):
+            pass
+        self.snapshot_id = self._snapshot_signature()
+        self.journal_offset = 0
+        self.journal_events = 0
+
+    def remove(self):
+        """Delete snapshot, journal and history"""
+        removed = False
+        for path in (self.state_file, self.journal_file, self.history_file):
+            if os.path.exists(path):
+                os.remove(path)
+                removed = True
+        return removed
+
+
+def load_state(state_file, default=default_state):
+    """Current state of a state file (snapshot + journal), read-only"""
+    return StateJournal(state_file).load(default)
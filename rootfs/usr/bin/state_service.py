@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+Rezidens állapot szolgáltatás
+One process owns the irrigation state and keeps it in memory; the other
+processes talk to it over a local Unix socket (<state file>.sock) instead
+of loading the state file themselves. Reads are answered from memory, so
+they do not depend on the file size or the disk; writes still go to the
+journal / database first.
+
+The owner picks up changes written to the files by processes that bypass
+it from the journal tail (or SQLite's data_version), and tells waiting
+clients about every change (wait_for_change) instead of them reloading.
+
+Protocol: one JSON object per line, {"method": ..., "args": [...],
+"kwargs": {...}} -> {"result": ...} or {"error": "..."}.
+"""
+
+import fcntl
+import json
+import os
+import socket
+import socketserver
+import threading
+import time
+
+from irrigation_state import STATE_FILE, open_state
+from state_store import IrrigationStateStore
+
+SOCKET_SUFFIX = ".sock"
+OWNER_SUFFIX = ".owner"
+
+# Methods clients may call
+METHODS = ("log_recommendation", "mark_executed", "mark_executed_many", "log_executions", "last_recommendation",
+           "last_execution", "next_expiry", "get_recent_irrigation", "recent_totals", "pending_recommendations", "pending_count",
+           "get_rollups", "get_history", "should_skip_recommendation", "get_status_summary", "wait_for_change")
+WRITE_METHODS = ("log_recommendation", "mark_executed", "mark_executed_many", "log_executions")
+
+# Longest wait_for_change a client may ask for (seconds)
+MAX_WAIT_SECONDS = 300
+
+_attached = {}
+_attached_lock = threading.Lock()
+
+
+def _after_fork():
+    # A forked child is another process: it is not the owner, and must not share the parent's sockets
+    global _attached_lock
+    _attached.clear()
+    _attached_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_after_fork)
+
+
+class ResidentState(IrrigationStateStore):
+    """The state of the owning process, kept in memory"""
+
+    def __init__(self, store):
+        self.store = store
+        self.lock = threading.RLock()
+        self.changed = threading.Condition(self.lock)
+        self.version = 0
+        self.listeners = []
+
+    def _notify(self):
+        self.version += 1
+        self.changed.notify_all()
+        for listener in self.listeners:
+            try:
+                listener(self.version)
+            except Exception as e:
+                print(f"⚠️ State listener error: {e}")
+
+    def _sync(self):
+        """Changes other processes wrote to the files (cheap when there are none)"""
+        if self.store.refresh():
+            self._notify()
+
+    def subscribe(self, listener):
+        """listener(version) is called after every change"""
+        self.listeners.append(listener)
+
+    def wait_for_change(self, since, timeout=30):
+        """Block until the version passes since (or timeout); returns the version"""
+        deadline = time.monotonic() + min(timeout, MAX_WAIT_SECONDS)
+        with self.changed:
+            self._sync()
+            while self.version <= since:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                # Writes through this process notify at once; direct file writes are polled
+                self.changed.wait(min(remaining, 1.0))
+                self._sync()
+            return self.version
+
+    def call(self, method, *args, **kwargs):
+        if method not in METHODS:
+            raise ValueError(f"Unknown method: {method}")
+        if method == "wait_for_change":
+            return self.wait_for_change(*args, **kwargs)
+        with self.lock:
+            self._sync()
+            result = getattr(self.store, method)(*args, **kwargs)
+            if method in WRITE_METHODS:
+                self._notify()
+            return result
+
+
+for _method in METHODS[:-1]:
+    setattr(ResidentState, _method,
+            lambda self, *args, _method=_method, **kwargs: self.call(_method, *args, **kwargs))
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+                result = self.server.resident.call(request["method"], *request.get("args", []),
+                                                   **request.get("kwargs", {}))
+                response = {"result": result}
+            except Exception as e:
+                response = {"error": f"{type(e).__name__}: {e}"}
+            self.wfile.write(json.dumps(response, ensure_ascii=False).encode("utf-8") + b"\n")
+
+
+class StateServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path, resident):
+        self.resident = resident
+        super().__init__(socket_path, _Handler)
+
+
+class StateClient(IrrigationStateStore):
+    """
+    The state of another process, through its socket. If the owner is gone
+    for good (no new connection), calls go to the store fallback() returns.
+    """
+
+    def __init__(self, socket_path, timeout=MAX_WAIT_SECONDS + 30, fallback=None):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self.fallback = fallback
+        self.store = None
+        self.lock = threading.Lock()
+        self._open()
+
+    def _open(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+        self.reader = self.sock.makefile("rb")
+
+    def close(self):
+        self.reader.close()
+        self.sock.close()
+        if self.store is not None:
+            self.store.close()
+
+    def refresh(self):
+        """Nothing to pick up: the owner reads what other processes wrote on every call"""
+        return self.store.refresh() if self.store is not None else False
+
+    def _roundtrip(self, request):
+        self.sock.sendall(request)
+        line = self.reader.readline()
+        if not line:
+            raise ConnectionError(f"State service closed the connection: {self.socket_path}")
+        return line
+
+    def call(self, method, *args, **kwargs):
+        request = json.dumps({"method": method, "args": args, "kwargs": kwargs}, ensure_ascii=False)
+        with self.lock:
+            if self.store is None:
+                try:
+                    line = self._roundtrip(request.encode("utf-8") + b"\n")
+                except (ConnectionError, BrokenPipeError):
+                    # The owner restarted: one new connection
+                    self.reader.close()
+                    self.sock.close()
+                    try:
+                        self._open()
+                        line = self._roundtrip(request.encode("utf-8") + b"\n")
+                    except OSError as e:
+                        # The owner exited: no one serves the socket any more
+                        if self.fallback is None:
+                            raise
+                        print(f"⚠️ State service gone ({e}), using the state directly")
+                        self.store = self.fallback()
+            store = self.store
+        if store is not None:
+            return getattr(store, method)(*args, **kwargs)
+        response = json.loads(line)
+        if "error" in response:
+            raise RuntimeError(response["error"])
+        result = response["result"]
+        # JSON has no tuples
+        return tuple(result) if method in ("should_skip_recommendation", "recent_totals") else result
+
+
+for _method in METHODS:
+    setattr(StateClient, _method,
+            lambda self, *args, _method=_method, **kwargs: self.call(_method, *args, **kwargs))
+
+
+def socket_file(state_file):
+    return state_file + SOCKET_SUFFIX
+
+
+def _connect(state_file, fallback=None):
+    try:
+        return StateClient(socket_file(state_file), fallback=fallback)
+    except OSError:
+        return None
+
+
+def connect(state_file=None, backend=None):
+    """Client of the owning process if one serves this state, the state itself otherwise"""
+    state_file = state_file or STATE_FILE
+    return _connect(state_file, lambda: open_state(state_file, backend)) or open_state(state_file, backend)
+
+
+def _reattach(state_file, backend):
+    """The cached client's owner exited: take ownership, or follow the next owner"""
+    with _attached_lock:
+        _attached.pop(state_file, None)
+    return attach(state_file, backend)
+
+
+def attach(state_file=None, backend=None):
+    """
+    Become the owner of the state (ResidentState + socket server thread),
+    or a client if another process already owns it. Cached per process.
+    """
+    state_file = state_file or STATE_FILE
+    with _attached_lock:
+        if state_file in _attached:
+            return _attached[state_file]
+
+        owner_lock = open(state_file + OWNER_SUFFIX, 'a')
+        try:
+            fcntl.flock(owner_lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            owner_lock.close()
+            # The owner may be between taking the lock and listening
+            for _ in range(50):
+                client = _connect(state_file, lambda: _reattach(state_file, backend))
+                if client:
+                    _attached[state_file] = client
+                    return client
+                time.sleep(0.1)
+            return open_state(state_file, backend)
+
+        # Owner: a socket left behind by a crashed owner is stale
+        path = socket_file(state_file)
+        if os.path.exists(path):
+            os.remove(path)
+        resident = ResidentState(open_state(state_file, backend))
+        server = StateServer(path, resident)
+        resident.server = server
+        resident.owner_lock = owner_lock  # Held for the lifetime of the process
+        threading.Thread(target=server.serve_forever, daemon=True, name="state-service").start()
+        _attached[state_file] = resident
+        print(f"🏠 State service listening on {path}")
+        return resident
+
+
+def detach(state_file=None):
+    """Stop serving / disconnect (tests, shutdown)"""
+    state_file = state_file or STATE_FILE
+    with _attached_lock:
+        attached = _attached.pop(state_file, None)
+    if isinstance(attached, ResidentState):
+        attached.server.shutdown()
+        attached.server.server_close()
+        os.remove(socket_file(state_file))
+        attached.owner_lock.close()
+    elif isinstance(attached, StateClient):
+        attached.close()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Állapot összesítő számlálók
+The numbers of the status summary (pending recommendations, executions
+of the last 24 hours, last execution) kept as counters in the state and
+changed by each log / execution event, so a summary is O(1) instead of a
+pass over the log. Executions that left the 24 hour window are dropped
+on the next write and skipped (without changing anything) on read;
+next_expiry() tells when the next one leaves, for a timer.
+
+state["status"] = {
+    "pending": 2,
+    "recent": [["2025-08-25T16:05:12", 8.0], ...],   # executions in the window, oldest first
+    "recent_total": 8.0,
+    "last_execution": {"time": "2025-08-25T16:05:12", "amount": 8.0}
+}
+"""
+
+from datetime import datetime, timedelta
+
+WINDOW_HOURS = 24
+
+
+def empty():
+    return {"pending": 0, "recent": [], "recent_total": 0, "last_execution": None}
+
+
+def add_recommendation(status):
+    status["pending"] += 1
+
+
+def add_execution(status, time_iso, amount, was_pending=False):
+    """One execution (a marked recommendation, or a manual entry)"""
+    amount = amount or 0
+    if was_pending:
+        status["pending"] = max(0, status["pending"] - 1)
+    status["recent"].append([time_iso, amount])
+    status["recent_total"] += amount
+    last = status["last_execution"]
+    if last is None or time_iso >= last["time"]:
+        status["last_execution"] = {"time": time_iso, "amount": amount}
+    expire(status)
+
+
+def from_entries(entries, now=None):
+    """Counters of a list of log entries (for states written before them)"""
+    status = empty()
+    executions = []
+    for entry in entries:
+        if entry.get("type") == "manual":
+            executions.append((entry["timestamp"], entry.get("amount_lpm2")))
+        elif entry.get("executed") and entry.get("execution_time"):
+            executions.append((entry["execution_time"], entry.get("execution_amount") or entry.get("amount_lpm2")))
+        elif not entry.get("executed", True):
+            status["pending"] += 1
+    for time_iso, amount in sorted(executions):
+        add_execution(status, time_iso, amount)
+    expire(status, now)
+    return status
+
+
+def expire(status, now=None):
+    """Drop the executions that left the window"""
+    cutoff = ((now or datetime.now()) - timedelta(hours=WINDOW_HOURS)).isoformat()
+    recent = status["recent"]
+    expired = 0
+    while expired < len(recent) and recent[expired][0] <= cutoff:
+        status["recent_total"] -= recent[expired][1]
+        expired += 1
+    if expired:
+        del recent[:expired]
+        if not recent:
+            status["recent_total"] = 0  # No float drift left behind
+
+
+def recent(status, now=None):
+    """(count, total L/m²) of the executions in the last 24 hours (read only)"""
+    cutoff = ((now or datetime.now()) - timedelta(hours=WINDOW_HOURS)).isoformat()
+    recent, total = status["recent"], status["recent_total"]
+    expired = 0
+    while expired < len(recent) and recent[expired][0] <= cutoff:
+        total -= recent[expired][1]
+        expired += 1
+    if expired == len(recent):
+        return 0, 0
+    return len(recent) - expired, round(total, 3)
+
+
+def next_expiry(status, now=None):
+    """When the oldest execution still in the window leaves it (datetime), or None (read only)"""
+    cutoff = ((now or datetime.now()) - timedelta(hours=WINDOW_HOURS)).isoformat()
+    for time_iso, _ in status["recent"]:
+        if time_iso > cutoff:
+            return datetime.fromisoformat(time_iso) + timedelta(hours=WINDOW_HOURS)
+    return None
@@ -4,6 +4,9 @@ import requests
 import time
 from datetime import datetime, timedelta
 
+import forecast_daily
+import weather_cache
+import weather_client
 
 
 # Load configuration options from a JSON file
@@ -24,10 +27,7 @@ def get_daily_aggregation(day):
     """
     url = f"https://api.openweathermap.org/data/3.0/onecall/day_summary?lat={lat}&lon={lon}&appid={api_key}&units={units}&lang=hu&date={day}"
 
-    payload = {}
-    headers = {}
-
-    response = requests.request("GET", url, headers=headers, data=payload)
+    response = weather_client.get(url)
 
     return response.text
 
@@ -117,6 +117,14 @@ def get_historical_weather_range(start_date, end_date):
     
     while current <= end:
         date_str = current.strftime("%Y-%m-%d")
+        current += timedelta(days=1)
+        
+        # Lezárt napok a lemez cache-ből jönnek
+        parsed_data = weather_cache.get_day_summary(lat, lon, date_str, units)
+        if parsed_data:
+            weather_data.append(parsed_data)
+            continue
+        
         print(f"Időjárás adatok lekérdezése: {date_str}")
         
         raw_data = get_daily_aggregation(date_str)
@@ -124,11 +132,14 @@ def get_historical_weather_range(start_date, end_date):
         
         if parsed_data:
             weather_data.append(parsed_data)
+            # Error responses carry a 'cod' field, those are not cached
+            if 'cod' not in parsed_data:
+                weather_cache.put_day_summary(lat, lon, date_str, units, parsed_data)
         
-        current += timedelta(days=1)
         # Kis szünet az API hívások között
         time.sleep(0.1)
     
+    weather_cache.save_stats()
     return weather_data
 
 
@@ -140,9 +151,7 @@ def get_current_weather():
     url = f"https://api.openweathermap.org/data/2.5/weather?lat={lat}&lon={lon}&appid={api_key}&units={units}&lang=hu"
     
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-        return response.json()
+        return weather_client.get_json(url)
     except requests.RequestException as e:
         print(f"Hiba a jelenlegi időjárás lekérdezésekor: {e}")
         return None
@@ -255,10 +264,12 @@ def get_5day_forecast():
     """
     url = f"https://api.openweathermap.org/data/2.5/forecast?lat={lat}&lon={lon}&appid={api_key}&units={units}&lang=hu"
     
+    def fetch():
+        return weather_client.get_json(url)
+    
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-        return response.json()
+        # Shared with the other scripts until OWM publishes a new forecast
+        return weather_cache.get_forecast(lat, lon, units, fetch)
     except requests.RequestException as e:
         print(f"Hiba az előrejelzés lekérdezésekor: {e}")
         return None
@@ -274,70 +285,20 @@ def extract_daily_rain_forecast():
     if not forecast_data:
         return None
     
-    # Napi csapadék adatok gyűjtése
-    daily_rain = {}
-    
-    for item in forecast_data.get('list', []):
-        # Dátum kinyerése (YYYY-MM-DD formátum)
-        dt_txt = item.get('dt_txt', '')
-        if not dt_txt:
-            continue
-            
-        date = dt_txt.split(' ')[0]  # "2025-08-24 15:00:00" -> "2025-08-24"
-        
-        # Csapadék adatok
-        rain_3h = 0
-        if 'rain' in item:
-            rain_3h = item['rain'].get('3h', 0)
-        
-        # Snow is also precipitation
-        if 'snow' in item:
-            rain_3h += item['snow'].get('3h', 0)
-        
-        # Napi összegzés
-        if date not in daily_rain:
-            daily_rain[date] = {
-                'date': date,
-                'total_rain_mm': 0,
-                'rain_periods': 0,
-                'max_temp': float('-inf'),
-                'min_temp': float('inf'),
-                'descriptions': set(),
-                'city': forecast_data.get('city', {}).get('name', 'N/A')
-            }
-        
-        # Csapadék hozzáadása
-        daily_rain[date]['total_rain_mm'] += rain_3h
-        
-        if rain_3h > 0:
-            daily_rain[date]['rain_periods'] += 1
-        
-        # Hőmérséklet min/max
-        temp = item.get('main', {}).get('temp', 0)
-        daily_rain[date]['max_temp'] = max(daily_rain[date]['max_temp'], temp)
-        daily_rain[date]['min_temp'] = min(daily_rain[date]['min_temp'], temp)
-        
-        # Időjárás leírások
-        for weather in item.get('weather', []):
-            daily_rain[date]['descriptions'].add(weather.get('description', ''))
-    
-    # Rendezés dátum szerint és lista formátumra konvertálás
-    sorted_days = []
-    for date in sorted(daily_rain.keys()):
-        day_data = daily_rain[date]
-        
-        # Descriptions set -> string
-        day_data['descriptions'] = ', '.join(day_data['descriptions'])
-        
-        # Handle infinite values
-        if day_data['max_temp'] == float('-inf'):
-            day_data['max_temp'] = 'N/A'
-        if day_data['min_temp'] == float('inf'):
-            day_data['min_temp'] = 'N/A'
-        
-        sorted_days.append(day_data)
-    
-    return sorted_days
+    # Daily statistics, grouped once per forecast document
+    daily = forecast_daily.daily_forecast(forecast_data)
+    return [
+        {
+            'date': day['date'],
+            'total_rain_mm': day['total_rain'],
+            'rain_periods': day['rain_periods'],
+            'max_temp': day['temp_max'],
+            'min_temp': day['temp_min'],
+            'descriptions': day['descriptions'],
+            'city': daily.city
+        }
+        for day in daily.days()
+    ]
 
 
 def get_rainy_days_forecast():
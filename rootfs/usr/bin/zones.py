@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Többzónás öntözési javaslat
+Zones come from the "zones" list in options.json. The weather is fetched
+once; every zone's water balance and decision rules are evaluated together
+as NumPy arrays, so extra zones cost almost nothing.
+"""
+
+import re
+
+import numpy as np
+
+import rule_params
+import rules
+
+# Per-zone settings and their defaults (a default zone is the plain lawn)
+ZONE_DEFAULTS = {
+    'crop_coefficient': 1.0,            # Kc, multiplies the ET
+    'soil_capacity_mm': rule_params.DEFAULTS['soil_capacity_mm'],  # Surplus the soil holds before runoff
+    'available_water_mm': rule_params.DEFAULTS['available_water_mm'],  # Largest deficit (TAW)
+    'sprinkler_rate_mm_per_hour': 10.0,
+    'max_irrigation_mm': rule_params.DEFAULTS['max_irrigation_mm']  # Largest single watering
+}
+
+# Rule outcomes as arrays, indexed by rule id
+RECOMMENDATIONS = np.array(rules.RECOMMENDATIONS)
+CONFIDENCE = np.array(rules.CONFIDENCE)
+
+
+def zone_id(name):
+    """MQTT-safe id from the zone name ('Első gyep' -> 'első_gyep')"""
+    return re.sub(r'[^\w]+', '_', name.strip().lower()).strip('_')
+
+
+class ZoneSet:
+    """Zone parameters as parallel arrays; unset soil capacity / available water / max watering come from params"""
+
+    def __init__(self, zones, params=None):
+        defaults = dict(ZONE_DEFAULTS)
+        if params:
+            defaults.update(soil_capacity_mm=params['soil_capacity_mm'], available_water_mm=params['available_water_mm'],
+                            max_irrigation_mm=params['max_irrigation_mm'])
+        zones = [dict(defaults, **zone) for zone in zones]
+        self.names = [zone['name'] for zone in zones]
+        self.ids = [zone.get('id') or zone_id(zone['name']) for zone in zones]
+        self.crop_coefficient = np.array([float(zone['crop_coefficient']) for zone in zones])
+        self.soil_capacity = np.array([float(zone['soil_capacity_mm']) for zone in zones])
+        self.available_water = np.array([float(zone['available_water_mm']) for zone in zones])
+        self.sprinkler_rate = np.array([float(zone['sprinkler_rate_mm_per_hour']) for zone in zones])
+        self.max_irrigation = np.array([float(zone['max_irrigation_mm']) for zone in zones])
+
+    def __len__(self):
+        return len(self.names)
+
+
+def load_zones(options, params=None):
+    """ZoneSet from options['zones'], or None when no zones are configured"""
+    zones = [zone for zone in options.get('zones', []) if zone.get('name')]
+    return ZoneSet(zones, params) if zones else None
+
+
+def zone_deficits(balance, zones):
+    """
+    Replay the shared daily balance (ET, rain, irrigation) for every zone at
+    once, with the zone's crop coefficient, soil capacity and available water
+    """
+    deficit = np.clip(np.full(len(zones), balance.anchor['deficit']), -zones.soil_capacity, zones.available_water)
+    for date in sorted(balance.days):
+        day = balance.days[date]
+        water = day['rain'] + day['irrigation']
+        deficit = np.clip(deficit - (water - zones.crop_coefficient * day['et']),
+                          -zones.soil_capacity, zones.available_water)
+    return deficit
+
+
+def evaluate_zones(zones, deficits, expected_loss, upcoming_rain, currently_raining,
+                   current_rain, rain_tomorrow, temp_tomorrow, humidity_now, month, params=None):
+    """
+    Decision rules (rules.py) for all zones in one pass.
+    expected_loss is the reference 3-day ET, scaled by each zone's Kc.
+    The weather arguments are scalars (one site), or arrays with one value
+    per zone (the backtest runs every season as a separate "zone").
+    params: rule thresholds (rule_params.DEFAULTS when missing)
+    Returns per-zone arrays: rule, recommendation, amount_mm, confidence, runtime_minutes
+    """
+    p = params or rule_params.DEFAULTS
+    loss = zones.crop_coefficient * expected_loss
+    values = {'deficit': deficits, 'expected_loss': loss, 'upcoming_rain': upcoming_rain,
+              'currently_raining': currently_raining, 'current_rain': current_rain,
+              'rain_tomorrow': rain_tomorrow, 'temp_tomorrow': temp_tomorrow, 'humidity_now': humidity_now}
+    conditions = rules.conditions(values, p)
+    rule = np.select([np.broadcast_to(condition, deficits.shape) for condition in conditions],
+                     range(len(conditions)), default=rules.RULE_WELL_WATERED)
+
+    amounts = rules.amounts(values, p)
+    amount = np.select([rule == rule_id for rule_id in amounts], list(amounts.values()), default=0.0)
+    recommendation = RECOMMENDATIONS[rule]
+    confidence = CONFIDENCE[rule]
+
+    seasonal = (recommendation == 'no') & np.broadcast_to(rules.seasonal(values, month, p), deficits.shape)
+    recommendation = np.where(seasonal, 'light', recommendation)
+    amount = np.where(seasonal, np.maximum(amount, p['light_amount_mm']), amount)
+    confidence = np.where(seasonal, np.maximum(60, confidence - 10), confidence)
+
+    amount = np.minimum(amount, zones.max_irrigation)
+    return {
+        'rule': rule,
+        'recommendation': recommendation,
+        'amount_mm': amount,
+        'confidence': confidence,
+        'runtime_minutes': amount / zones.sprinkler_rate * 60,
+        'seasonal': seasonal,
+        'expected_loss': loss
+    }
+
+
+def zone_results(zones, deficits, decisions, upcoming_rain, rain_tomorrow):
+    """Per-zone result dicts for the recommendation JSON and MQTT"""
+    results = []
+    for i, name in enumerate(zones.names):
+        reasons = [rules.reason(decisions['rule'][i], deficits[i], upcoming_rain,
+                                decisions['expected_loss'][i], rain_tomorrow)]
+        if decisions['seasonal'][i]:
+            reasons.append(rules.SEASONAL_REASON)
+        results.append({
+            'id': zones.ids[i],
+            'name': name,
+            'recommendation': str(decisions['recommendation'][i]),
+            'irrigation_amount_mm': round(float(decisions['amount_mm'][i]), 1),
+            'runtime_minutes': round(float(decisions['runtime_minutes'][i]), 1),
+            'confidence_percent': int(decisions['confidence'][i]),
+            'soil_moisture_deficit_mm': round(float(deficits[i]), 1),
+            'reasons': reasons
+        })
+    return results
@@ -132,6 +132,13 @@ import socketserver
 import json
 from datetime import datetime
 
+def next_check():
+    try:
+        with open('/data/scheduler_status.json') as f:
+            return json.load(f).get('next_run')
+    except (OSError, ValueError):
+        return None
+
 class HealthHandler(http.server.SimpleHTTPRequestHandler):
     def do_GET(self):
         if self.path == '/health':
@@ -143,7 +150,8 @@ class HealthHandler(http.server.SimpleHTTPRequestHandler):
                 'service': 'irrigation-advisor',
                 'timestamp': datetime.now().isoformat(),
                 'auto_checks': '$(bashio::config 'enable_auto_check' 'true')',
-                'interval_minutes': $(bashio::config 'check_interval_minutes' '30')
+                'interval_minutes': $(bashio::config 'check_interval_minutes' '30'),
+                'next_check': next_check()
             }
             self.wfile.write(json.dumps(health).encode())
 
@@ -166,60 +174,10 @@ cleanup() {
 
 
 # Function for automatic irrigation checks
+# Resident Python scheduler: imports, HTTP session and MQTT stay warm between checks,
+# next run time is written to /data/scheduler_status.json
 irrigation_scheduler() {
-    local CHECK_INTERVAL_MINUTES=$(bashio::config 'check_interval_minutes' '30')
-    local ENABLE_AUTO_CHECK=$(bashio::config 'enable_auto_check' 'true')
-    local next_check_time
-    local current_time
-    
-    bashio::log.info "🕒 Scheduler started: checks every $CHECK_INTERVAL_MINUTES minutes"
-    bashio::log.info "🤖 Auto checks enabled: $ENABLE_AUTO_CHECK"
-    bashio::log.info "[DEBUG] ENABLE_AUTO_CHECK értéke: $ENABLE_AUTO_CHECK"
-    
-    # Calculate and log next check time
-    next_check_time=$(date -d "+${CHECK_INTERVAL_MINUTES} minutes" '+%Y-%m-%d %H:%M:%S')
-    bashio::log.info "⏰ Next irrigation check scheduled for: $next_check_time"
-    
-    while true; do
-        if [[ "$ENABLE_AUTO_CHECK" == "true" ]]; then
-            current_time=$(date '+%Y-%m-%d %H:%M:%S')
-            bashio::log.info "🌱 [${current_time}] Starting automatic irrigation check (interval: ${CHECK_INTERVAL_MINUTES}min)..."
-            
-            # Run irrigation check with enhanced logging
-            if python3 /usr/bin/mqtt_simple.py > /tmp/irrigation_check.log 2>&1; then
-                current_time=$(date '+%Y-%m-%d %H:%M:%S')
-                bashio::log.info "✅ [${current_time}] Automatic irrigation check completed successfully"
-                
-                # Log basic results if available
-                if [ -f "/tmp/irrigation_check.log" ]; then
-                    if grep -q "watering_required" /tmp/irrigation_check.log; then
-                        local watering_status=$(grep "watering_required" /tmp/irrigation_check.log | tail -1)
-                        bashio::log.info "📊 Result: $watering_status"
-                    fi
-                fi
-            else
-                current_time=$(date '+%Y-%m-%d %H:%M:%S')
-                bashio::log.warning "⚠️  [${current_time}] Automatic irrigation check failed!"
-                bashio::log.warning "📋 Error log content:"
-                if [ -f "/tmp/irrigation_check.log" ]; then
-                    cat /tmp/irrigation_check.log | while IFS= read -r line; do
-                        bashio::log.warning "   $line"
-                    done
-                fi
-            fi
-            
-            # Calculate and log next check time
-            next_check_time=$(date -d "+${CHECK_INTERVAL_MINUTES} minutes" '+%Y-%m-%d %H:%M:%S')
-            bashio::log.info "⏰ Next irrigation check scheduled for: $next_check_time"
-            
-        else
-            current_time=$(date '+%Y-%m-%d %H:%M:%S')
-            bashio::log.debug "⏸️ [${current_time}] Auto checks disabled, skipping... (next check would be in ${CHECK_INTERVAL_MINUTES}min)"
-        fi
-        
-        # Wait for next check (convert minutes to seconds)
-        sleep $((CHECK_INTERVAL_MINUTES * 60))
-    done
+    exec python3 /usr/bin/irrigation_scheduler.py
 }
 
 # Set trap for clean shutdown
@@ -258,6 +216,13 @@ import socketserver
 import json
 from datetime import datetime
 
+def next_check():
+    try:
+        with open('/data/scheduler_status.json') as f:
+            return json.load(f).get('next_run')
+    except (OSError, ValueError):
+        return None
+
 class HealthHandler(http.server.SimpleHTTPRequestHandler):
     def do_GET(self):
         if self.path == '/health':
@@ -269,7 +234,8 @@ class HealthHandler(http.server.SimpleHTTPRequestHandler):
                 'service': 'irrigation-advisor',
                 'timestamp': datetime.now().isoformat(),
                 'auto_checks': '$(bashio::config 'enable_auto_check' 'true')',
-                'interval_minutes': $(bashio::config 'check_interval_minutes' '30')
+                'interval_minutes': $(bashio::config 'check_interval_minutes' '30'),
+                'next_check': next_check()
             }
             self.wfile.write(json.dumps(health).encode())
 
@@ -0,0 +1,399 @@
+#!/usr/bin/env python3
+"""
+SQLite állapot tár
+The irrigation log in an SQLite database (WAL mode) behind the same
+interface as the JSON state (irrigation_state.SimpleIrrigationState).
+"Last N hours" and "pending" are range scans on indexes instead of a pass
+over the whole log, and every change is a transaction, so the services can
+share the database.
+
+The raw log is kept without limit; the daily / weekly / monthly totals
+(rollups.py) are updated in the same transaction as each change.
+
+Opening it the first time imports the JSON state (snapshot + journal) and
+the irrigation_events table of the old mqtt_feedback database, once each.
+"""
+
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import rollups
+import state_journal
+import status_counters
+
+# Recent irrigation above this (L/m²) skips the next recommendation
+SKIP_ABOVE_LPM2 = 5
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS irrigation_log (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp TEXT NOT NULL,
+    amount_lpm2 REAL,
+    reason TEXT,
+    executed INTEGER NOT NULL DEFAULT 0,
+    execution_time TEXT,
+    execution_amount REAL,
+    notes TEXT,
+    type TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_log_timestamp ON irrigation_log (timestamp);
+CREATE INDEX IF NOT EXISTS idx_log_pending ON irrigation_log (timestamp) WHERE executed = 0;
+CREATE INDEX IF NOT EXISTS idx_log_execution_time ON irrigation_log (execution_time) WHERE executed = 1;
+CREATE TABLE IF NOT EXISTS rollups (
+    period TEXT NOT NULL,
+    bucket TEXT NOT NULL,
+    recommendations INTEGER NOT NULL DEFAULT 0,
+    recommended_lpm2 REAL NOT NULL DEFAULT 0,
+    executions INTEGER NOT NULL DEFAULT 0,
+    executed_lpm2 REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (period, bucket)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+ENTRY_COLUMNS = ("timestamp", "amount_lpm2", "reason", "executed", "execution_time",
+                 "execution_amount", "notes", "type")
+
+
+class IrrigationStateStore:
+    """
+    Interface of the state backends. A backend implements log_recommendation,
+    mark_executed, log_executions, last_recommendation, last_execution,
+    next_expiry, get_recent_irrigation, pending_recommendations,
+    pending_count, get_rollups, get_history and refresh (and may answer
+    recent_totals and mark_executed_many faster); the rest is shared.
+    """
+
+    def close(self):
+        """Release what the store holds (nothing for the JSON state)"""
+
+    def mark_executed_many(self, executions):
+        """Mark a pending recommendation for each (amount, notes); returns how many were marked"""
+        return sum(1 for amount, notes in executions if self.mark_executed(amount, notes))
+
+    def should_skip_recommendation(self, hours=6):
+        """Check if should skip due to recent irrigation"""
+        recent = self.get_recent_irrigation(hours)
+
+        if recent:
+            total_amount = sum(entry["execution_amount"] or 0 for entry in recent)
+            print(f"ℹ️ Recent irrigation in last {hours}h: {total_amount}L/m²")
+
+            # Skip if recently irrigated significantly
+            if total_amount > SKIP_ABOVE_LPM2:
+                return True, total_amount
+
+        return False, 0
+
+    def recent_totals(self, hours=24):
+        """(count, total L/m²) of the executed irrigation of the last hours"""
+        recent = self.get_recent_irrigation(hours)
+        return len(recent), sum(entry["execution_amount"] or 0 for entry in recent)
+
+    def get_status_summary(self):
+        """Get current status summary"""
+        last_rec = self.last_recommendation()
+        count, total_amount = self.recent_totals(24)
+
+        return {
+            "last_recommendation": {
+                "time": last_rec["timestamp"][:19] if last_rec else None,
+                "amount": last_rec["amount_lpm2"] if last_rec else 0,
+                "executed": last_rec["executed"] if last_rec else False
+            },
+            "recent_24h": {
+                "count": count,
+                "total_amount": total_amount
+            },
+            "pending_recommendations": self.pending_count()
+        }
+
+
+def entry_row(entry):
+    """Column values of a JSON log entry (manual entries are executions)"""
+    manual = entry.get("type") == "manual"
+    executed = entry.get("executed", manual)
+    return (
+        entry["timestamp"],
+        entry.get("amount_lpm2"),
+        entry.get("reason"),
+        1 if executed else 0,
+        entry.get("execution_time") or (entry["timestamp"] if manual else None),
+        entry.get("execution_amount") if not manual else entry.get("amount_lpm2"),
+        entry.get("notes"),
+        entry.get("type")
+    )
+
+
+def row_entry(row):
+    """Log entry dict of a row, shaped like the JSON state's entries"""
+    entry = {
+        "timestamp": row["timestamp"],
+        "amount_lpm2": row["amount_lpm2"],
+        "reason": row["reason"],
+        "executed": bool(row["executed"]),
+        "execution_time": row["execution_time"],
+        "execution_amount": row["execution_amount"]
+    }
+    if row["notes"] is not None:
+        entry["notes"] = row["notes"]
+    if row["type"] is not None:
+        entry["type"] = row["type"]
+    return entry
+
+
+class SQLiteIrrigationState(IrrigationStateStore):
+    def __init__(self, db_file, json_file=None, legacy_db_file=None):
+        self.db_file = db_file
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(db_file, timeout=30, isolation_level=None, check_same_thread=False)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+        self.data_version = self.db.execute("PRAGMA data_version").fetchone()[0]
+        self.build_rollups()
+        if json_file:
+            self.import_json(json_file)
+        if legacy_db_file:
+            self.import_legacy_db(legacy_db_file)
+
+    def close(self):
+        self.db.close()
+
+    @contextmanager
+    def transaction(self):
+        """Write transaction; other processes wait for it (busy timeout)"""
+        with self.lock:
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                yield self.db
+            except BaseException:
+                self.db.execute("ROLLBACK")
+                raise
+            self.db.execute("COMMIT")
+
+    def _query(self, sql, params=()):
+        with self.lock:
+            return self.db.execute(sql, params).fetchall()
+
+    @staticmethod
+    def _meta(db, key):
+        row = db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    @staticmethod
+    def _set_meta(db, key, value):
+        db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    @staticmethod
+    def _insert(db, row):
+        cursor = db.execute(
+            f"INSERT INTO irrigation_log ({', '.join(ENTRY_COLUMNS)}) VALUES ({', '.join('?' * len(ENTRY_COLUMNS))})",
+            row)
+        return cursor.lastrowid
+
+    @staticmethod
+    def _add_rollups(db, time_iso, recommended=None, executed=None):
+        for period, bucket in rollups.buckets(time_iso).items():
+            db.execute("INSERT INTO rollups (period, bucket, recommendations, recommended_lpm2, executions, executed_lpm2) "
+                       "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (period, bucket) DO UPDATE SET "
+                       "recommendations = recommendations + excluded.recommendations, "
+                       "recommended_lpm2 = recommended_lpm2 + excluded.recommended_lpm2, "
+                       "executions = executions + excluded.executions, "
+                       "executed_lpm2 = executed_lpm2 + excluded.executed_lpm2",
+                       (period, bucket, 0 if recommended is None else 1, recommended or 0,
+                        0 if executed is None else 1, executed or 0))
+
+    def _insert_entry(self, db, entry):
+        """Insert a JSON-shaped log entry and count it into the rollups"""
+        row_id = self._insert(db, entry_row(entry))
+        for time_iso, recommended, executed in rollups.entry_contributions(entry):
+            self._add_rollups(db, time_iso, recommended, executed)
+        return row_id
+
+    def build_rollups(self):
+        """Rollups of the rows written before rollups existed (once)"""
+        with self.transaction() as db:
+            if self._meta(db, "rollups_built"):
+                return
+            db.execute("DELETE FROM rollups")
+            for row in db.execute("SELECT * FROM irrigation_log").fetchall():
+                for time_iso, recommended, executed in rollups.entry_contributions(row_entry(row)):
+                    self._add_rollups(db, time_iso, recommended, executed)
+            self._set_meta(db, "rollups_built", datetime.now().isoformat())
+
+    def import_json(self, json_file):
+        """Copy the JSON state, archived history included, into the database (first open only)"""
+        if not (os.path.exists(json_file) or os.path.exists(json_file + state_journal.JOURNAL_SUFFIX)):
+            return 0
+        with self.transaction() as db:
+            if self._meta(db, "imported_json"):
+                return 0
+            journal = state_journal.StateJournal(json_file)
+            state = journal.load()
+            entries = journal.history(state)
+            last = state.get("last_recommendation")
+            for entry in entries:
+                row_id = self._insert_entry(db, entry)
+                if last and entry.get("timestamp") == last.get("timestamp"):
+                    self._set_meta(db, "last_recommendation_id", row_id)
+            self._set_meta(db, "imported_json", json_file)
+        print(f"📦 {len(entries)} log entries imported from {json_file}")
+        return len(entries)
+
+    def import_legacy_db(self, legacy_db_file):
+        """Copy the irrigation_events table of the old mqtt_feedback database (once)"""
+        if not os.path.exists(legacy_db_file) or os.path.abspath(legacy_db_file) == os.path.abspath(self.db_file):
+            return 0
+        legacy = sqlite3.connect(legacy_db_file)
+        try:
+            events = legacy.execute(
+                "SELECT timestamp, recommended_amount, reason, executed, execution_timestamp, actual_amount "
+                "FROM irrigation_events ORDER BY id").fetchall()
+        except sqlite3.OperationalError:
+            events = []
+        finally:
+            legacy.close()
+        with self.transaction() as db:
+            if self._meta(db, "imported_legacy_db"):
+                return 0
+            for timestamp, amount, reason, executed, execution_time, actual_amount in events:
+                self._insert_entry(db, {"timestamp": timestamp, "amount_lpm2": amount, "reason": reason,
+                                        "executed": bool(executed), "execution_time": execution_time,
+                                        "execution_amount": actual_amount})
+            self._set_meta(db, "imported_legacy_db", legacy_db_file)
+        return len(events)
+
+    def log_recommendation(self, amount, reason):
+        """Log irrigation recommendation"""
+        with self.transaction() as db:
+            timestamp = datetime.now().isoformat()
+            row_id = self._insert(db, (timestamp, amount, reason, 0, None, None, None, None))
+            self._add_rollups(db, timestamp, recommended=amount or 0)
+            self._set_meta(db, "last_recommendation_id", row_id)
+        print(f"📝 Recommendation logged: {amount}L/m² - {reason}")
+        return row_id
+
+    def _mark(self, db, execution_amount, notes):
+        """Mark the most recent pending recommendation as executed; False if there is none"""
+        row = db.execute("SELECT id, amount_lpm2 FROM irrigation_log WHERE executed = 0 "
+                         "ORDER BY timestamp DESC, id DESC LIMIT 1").fetchone()
+        if not row:
+            return False
+        execution_time = datetime.now().isoformat()
+        amount = execution_amount or row["amount_lpm2"]
+        db.execute("UPDATE irrigation_log SET executed = 1, execution_time = ?, execution_amount = ?, "
+                   "notes = COALESCE(?, notes) WHERE id = ?",
+                   (execution_time, amount, notes or None, row["id"]))
+        self._add_rollups(db, execution_time, executed=amount or 0)
+        self._set_meta(db, "last_recommendation_id", row["id"])
+        return True
+
+    def mark_executed(self, execution_amount=None, notes=""):
+        """Mark the most recent pending recommendation as executed"""
+        with self.transaction() as db:
+            marked = self._mark(db, execution_amount, notes)
+        if marked:
+            print(f"✅ Marked as executed: {execution_amount or 'recommended amount'}L/m²")
+        else:
+            print("⚠️ No pending recommendation to mark as executed")
+        return marked
+
+    def mark_executed_many(self, executions):
+        """Mark a pending recommendation for each (amount, notes), newest first, in one transaction"""
+        marked = 0
+        with self.transaction() as db:
+            for execution_amount, notes in executions:
+                if not self._mark(db, execution_amount, notes):
+                    break
+                marked += 1
+        print(f"✅ Marked as executed: {marked} of {len(executions)}")
+        return marked
+
+    def log_executions(self, executions):
+        """Log (amount, notes) irrigation done without a recommendation (manual entries), in one transaction"""
+        with self.transaction() as db:
+            for amount, notes in executions:
+                self._insert_entry(db, {"timestamp": datetime.now().isoformat(), "amount_lpm2": amount,
+                                        "notes": notes, "type": "manual"})
+        print(f"✅ Manual irrigation logged: {len(executions)}")
+        return len(executions)
+
+    def last_recommendation(self):
+        rows = self._query("SELECT * FROM irrigation_log WHERE id = "
+                           "(SELECT value FROM meta WHERE key = 'last_recommendation_id')")
+        return row_entry(rows[0]) if rows else None
+
+    def last_execution(self):
+        """Time and amount of the latest executed irrigation, or None"""
+        rows = self._query("SELECT execution_time, execution_amount FROM irrigation_log WHERE executed = 1 "
+                           "ORDER BY execution_time DESC LIMIT 1")
+        return {"time": rows[0][0], "amount": rows[0][1]} if rows else None
+
+    def next_expiry(self):
+        """When the oldest execution of the last 24 hours leaves the window (ISO time), or None (index lookup)"""
+        cutoff = (datetime.now() - timedelta(hours=status_counters.WINDOW_HOURS)).isoformat()
+        oldest = self._query("SELECT MIN(execution_time) FROM irrigation_log "
+                             "WHERE executed = 1 AND execution_time > ?", (cutoff,))[0][0]
+        if oldest is None:
+            return None
+        return (datetime.fromisoformat(oldest) + timedelta(hours=status_counters.WINDOW_HOURS)).isoformat()
+
+    def get_recent_irrigation(self, hours=24):
+        """Executed irrigation of the last hours, newest first (index range scan)"""
+        cutoff = (datetime.now() - timedelta(hours=hours)).isoformat()
+        rows = self._query("SELECT * FROM irrigation_log WHERE executed = 1 AND execution_time > ? "
+                           "ORDER BY execution_time DESC", (cutoff,))
+        return [row_entry(row) for row in rows]
+
+    def recent_totals(self, hours=24):
+        """(count, total L/m²) of the executed irrigation of the last hours (index range, no rows built)"""
+        cutoff = (datetime.now() - timedelta(hours=hours)).isoformat()
+        count, total = self._query("SELECT COUNT(*), COALESCE(SUM(execution_amount), 0) FROM irrigation_log "
+                                   "WHERE executed = 1 AND execution_time > ?", (cutoff,))[0]
+        return count, round(total, 3)
+
+    def pending_recommendations(self):
+        rows = self._query("SELECT * FROM irrigation_log WHERE executed = 0 ORDER BY timestamp DESC")
+        return [row_entry(row) for row in rows]
+
+    def pending_count(self):
+        return self._query("SELECT COUNT(*) FROM irrigation_log WHERE executed = 0")[0][0]
+
+    def get_rollups(self, period="day", start=None, end=None):
+        """Daily / weekly / monthly totals (kept up to date on every write)"""
+        if period not in rollups.PERIODS:
+            raise ValueError(f"Unknown period: {period}")
+        rows = self._query(f"SELECT bucket, {', '.join(rollups.FIELDS)} FROM rollups WHERE period = ? "
+                           "AND bucket >= ? AND bucket <= ? ORDER BY bucket",
+                           (period, start or "", end or "\uffff"))
+        return [dict(zip(rollups.FIELDS, row[1:]), period=period, bucket=row["bucket"]) for row in rows]
+
+    def refresh(self):
+        """True if another connection committed since the last call"""
+        version = self._query("PRAGMA data_version")[0][0]
+        changed, self.data_version = version != self.data_version, version
+        return changed
+
+    def get_history(self, since=None):
+        """Every logged entry, oldest first (timestamp index)"""
+        rows = self._query("SELECT * FROM irrigation_log WHERE timestamp >= ? ORDER BY timestamp, id",
+                           (since or "",))
+        return [row_entry(row) for row in rows]
+
+
+def remove_database(db_file):
+    """Delete the database with its WAL files"""
+    removed = False
+    for path in (db_file, db_file + "-wal", db_file + "-shm"):
+        if os.path.exists(path):
+            os.remove(path)
+            removed = True
+    return removed
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Backtest teszt
+Synthetic multi-year weather, replayed day by day through evaluate_snapshot
+"""
+
+import csv
+import os
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+import backtest
+import irrigation_advisor
+import rule_params
+import zones
+from irrigation_advisor import calculate_evapotranspiration
+
+
+def synthetic_site(path, years, seed, latitude=47.5):
+    """Daily weather CSV: seasonal temperature, random showers"""
+    rng = np.random.default_rng(seed)
+    day = date(2030 - years, 1, 1)
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(('date', 'latitude') + backtest.WEATHER_FIELDS)
+        while day.year < 2030:
+            season = np.sin((day.timetuple().tm_yday - 100) / 365 * 2 * np.pi)
+            temp_max = 17 + 13 * season + rng.normal(0, 3)
+            rain = rng.exponential(9) if rng.random() < 0.3 else 0.0
+            writer.writerow((day.isoformat(), latitude, round(temp_max, 1), round(temp_max - 10, 1),
+                             round(rng.uniform(30, 90)), round(rng.uniform(0, 8), 1),
+                             round(rng.uniform(0, 100)), round(rain, 1)))
+            day += timedelta(days=1)
+
+
+def snapshot(deficit, days):
+    """The advisor's input on one backtest day: today's weather as the first forecast day"""
+    return irrigation_advisor.WeatherSnapshot(
+        history=(),
+        current={'is_raining': False, 'rain_amount': 0.0, 'humidity': days[0]['humidity'],
+                 'temperature': days[0]['temp_max'], 'wind_speed': days[0]['wind_speed'], 'description': ''},
+        forecast=tuple({'date': day['date'], 'temp_max': day['temp_max'], 'temp_min': day['temp_min'],
+                        'humidity_avg': day['humidity'], 'wind_max': day['wind_speed'],
+                        'cloud_avg': day['cloud_cover'], 'total_rain': day['precipitation']} for day in days[:3]),
+        now=datetime.fromisoformat(days[0]['date']),
+        state={'soil_deficit_mm': deficit, 'zone_deficits': None}
+    )
+
+
+def scalar_replay(run, params):
+    """One season, day by day, through the advisor's own evaluate_snapshot"""
+    low, high = -zones.ZONE_DEFAULTS['soil_capacity_mm'], params['available_water_mm']
+    deficit = 0.0
+    water = 0.0
+    decisions = {}
+    for i, day in enumerate(run['days']):
+        result = irrigation_advisor.evaluate_snapshot(snapshot(deficit, run['days'][i:]), params)
+        decisions[result['recommendation']] = decisions.get(result['recommendation'], 0) + 1
+        amount = result['irrigation_amount_mm']
+        water += amount
+        et = calculate_evapotranspiration(day['temp_max'], day['humidity'], day['wind_speed'],
+                                          day['cloud_cover'], model='heuristic')
+        deficit = min(high, max(low, deficit - (day['precipitation'] + amount - et)))
+    return water, decisions, deficit
+
+
+def make_sites(years, count):
+    directory = tempfile.mkdtemp(prefix="backtest_")
+    paths = []
+    for i in range(count):
+        paths.append(os.path.join(directory, f"site{i}.csv"))
+        synthetic_site(paths[-1], years, seed=i)
+    return paths
+
+
+def test_matches_the_advisor():
+    """Every season of the array simulation equals a day-by-day replay through the advisor"""
+    print("🧪 BACKTEST")
+    runs = backtest.load_runs(make_sites(years=3, count=1))
+    assert [run['season'] for run in runs] == ['2027', '2028', '2029']
+    assert len(runs[1]['days']) == 214  # April - October
+
+    et_model = irrigation_advisor.ET_MODEL
+    irrigation_advisor.ET_MODEL = 'heuristic'
+    try:
+        replays = [scalar_replay(run, rule_params.DEFAULTS) for run in runs]
+    finally:
+        irrigation_advisor.ET_MODEL = et_model
+
+    for (water, decisions, deficit), result in zip(replays, backtest.simulate(runs, model='heuristic',
+                                                                               params=rule_params.DEFAULTS)):
+        print(f"   {result['season']}: {result['water_applied_mm']}mm, {result['decisions']}")
+        assert abs(result['water_applied_mm'] - round(water, 1)) < 0.05
+        assert abs(result['final_deficit_mm'] - round(deficit, 1)) < 0.05
+        assert result['decisions'] == {key: decisions.get(key, 0) for key in backtest.DECISIONS}
+        assert sum(result['rules'].values()) == result['days']
+
+
+def test_ten_years_in_seconds():
+    """10 years x 3 sites over a process pool, same results as in-process"""
+    runs = backtest.load_runs(make_sites(years=10, count=3))
+    assert len(runs) == 30
+
+    start = time.perf_counter()
+    pooled = backtest.run_backtest(runs, model='heuristic', workers=2)
+    elapsed = time.perf_counter() - start
+    summary = backtest.summarize(pooled)
+    print(f"   {summary['seasons']} szezon {elapsed:.2f}s alatt: "
+          f"{summary['water_applied_mm_per_season']}mm/szezon, {summary['stress_days_per_season']} stressz nap")
+
+    assert elapsed < 10
+    assert pooled == backtest.run_backtest(runs, model='heuristic', workers=1)
+    assert summary['days'] == 30 * 214
+
+
+def test_fao56_and_zone_settings():
+    runs = backtest.load_runs(make_sites(years=1, count=1))
+    lawn = backtest.simulate(runs, model='fao56')[0]
+    shade = backtest.simulate(runs, model='fao56', zone={'crop_coefficient': 0.6})[0]
+    assert lawn['et_mm'] > 0
+    assert shade['water_applied_mm'] < lawn['water_applied_mm']
+
+
+if __name__ == "__main__":
+    test_matches_the_advisor()
+    test_ten_years_in_seconds()
+    test_fao56_and_zone_settings()
+    print("✅ Tesztek rendben")
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Kalibráció teszt
+Threshold search on synthetic seasons, pruning, the held out seasons and
+the tuned params file (used only when asked for)
+"""
+
+import json
+import os
+import tempfile
+
+import calibrate
+import rule_params
+import backtest
+from test_backtest import make_sites
+
+
+def test_search_beats_defaults_and_prunes():
+    print("🧪 KALIBRÁCIÓ")
+    runs = backtest.load_runs(make_sites(years=6, count=2))
+    result = calibrate.calibrate(runs, candidates=24, workers=2, model='heuristic')
+    print(f"   {result['baseline_objective']} -> {result['objective']} ({result['evaluations']} kiértékelés), "
+          f"kihagyott évek: {result['baseline_holdout_objective']} -> {result['holdout_objective']}")
+
+    assert result['objective'] <= result['baseline_objective']
+    # 24 + 9 + 4 instead of 24 x 3 full evaluations
+    assert result['evaluations'] < result['candidates'] * calibrate.ROUNDS
+    assert set(result['params']) == set(rule_params.DEFAULTS)
+
+    # The latest quarter of the years, of both sites, is not searched
+    searched, held_out = calibrate.split_holdout(runs)
+    assert result['holdout_seasons'] == ['2028', '2029']
+    assert (result['seasons'], len(held_out)) == (8, 4)
+    assert not {run['season'] for run in searched} & set(result['holdout_seasons'])
+
+    # Scores are reproducible: the winner re-evaluated in process gives the same objectives
+    summary = backtest.summarize(backtest.simulate(searched, 'heuristic', params=result['params']))
+    assert abs(calibrate.objective(summary) - result['objective']) < 0.1
+    for params, score in ((result['params'], result['holdout_objective']),
+                          (rule_params.DEFAULTS, result['baseline_holdout_objective'])):
+        summary = backtest.summarize(backtest.simulate(held_out, 'heuristic', params=params))
+        assert abs(calibrate.objective(summary) - score) < 0.1
+
+
+def test_one_year_has_no_holdout():
+    runs = backtest.load_runs(make_sites(years=1, count=2))
+    assert calibrate.split_holdout(runs) == (runs, [])
+    result = calibrate.calibrate(runs, candidates=3, workers=1, model='heuristic')
+    assert result['holdout_objective'] is None and result['holdout_seasons'] == []
+
+
+def test_tuned_file_overrides_defaults():
+    path = os.path.join(tempfile.mkdtemp(prefix="tuned_"), "tuned_params.json")
+    assert rule_params.load(path, enabled=True) == rule_params.DEFAULTS
+
+    tuned = dict(rule_params.DEFAULTS, high_deficit_mm=12.5, irrigation_factor=0.8)
+    rule_params.save(tuned, path, objective=1.0)
+    loaded = rule_params.load(path, enabled=True)
+    assert loaded['high_deficit_mm'] == 12.5 and loaded['irrigation_factor'] == 0.8
+    assert loaded['hot_temp'] == rule_params.DEFAULTS['hot_temp']
+
+
+def test_tuned_file_needs_opt_in():
+    """Without use_tuned_params the file is ignored"""
+    tmp_dir = tempfile.mkdtemp(prefix="tuned_")
+    path = os.path.join(tmp_dir, "tuned_params.json")
+    rule_params.save(dict(rule_params.DEFAULTS, high_deficit_mm=12.5), path, objective=1.0)
+    config_file = rule_params.CONFIG_FILE
+    rule_params.CONFIG_FILE = os.path.join(tmp_dir, "options.json")
+    try:
+        assert rule_params.tuned_params_enabled() is False
+        with open(rule_params.CONFIG_FILE, 'w') as f:
+            json.dump({"use_tuned_params": True}, f)
+        assert rule_params.tuned_params_enabled() is True
+    finally:
+        rule_params.CONFIG_FILE = config_file
+    assert rule_params.load(path, enabled=False) == rule_params.DEFAULTS
+    enabled = rule_params.USE_TUNED_PARAMS
+    try:
+        rule_params.USE_TUNED_PARAMS = False
+        assert rule_params.load(path) == rule_params.DEFAULTS
+        rule_params.USE_TUNED_PARAMS = True
+        assert rule_params.load(path)['high_deficit_mm'] == 12.5
+    finally:
+        rule_params.USE_TUNED_PARAMS = enabled
+
+
+if __name__ == "__main__":
+    test_search_beats_defaults_and_prunes()
+    test_one_year_has_no_holdout()
+    test_tuned_file_overrides_defaults()
+    test_tuned_file_needs_opt_in()
+    print("✅ Tesztek rendben")
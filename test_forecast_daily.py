@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Napi előrejelzés összesítés teszt
+One pass gives the statistics of the old per-script groupings, once per document
+"""
+
+import os
+import tempfile
+
+import forecast_daily
+import irrigation_advisor
+import weather_cache
+
+
+def forecast_document(days=5):
+    """5 day / 3 hour document with rain, snow and missing fields"""
+    items = []
+    for day in range(days):
+        for hour in range(0, 24, 3):
+            item = {
+                'dt_txt': f"2030-06-{day + 10:02d} {hour:02d}:00:00",
+                'main': {'temp': 15 + day + abs(12 - hour) * -0.5 + 6, 'humidity': 40 + hour},
+                'wind': {'speed': (day * 7 + hour) % 9},
+                'clouds': {'all': (hour * 10) % 100},
+                'weather': [{'description': 'eső' if hour % 6 == 0 else 'felhős'}]
+            }
+            if (day + hour) % 4 == 0:
+                item['rain'] = {'3h': 0.3 * (hour + 1)}
+            if day == 4 and hour == 21:
+                item['snow'] = {'3h': 0.5}
+                del item['main']
+            items.append(item)
+    items.append({'main': {'temp': 99}})  # no dt_txt: skipped
+    return {'list': items, 'city': {'name': 'Teszt'}}
+
+
+def reference_grouping(data):
+    """The grouping get_forecast_data did before"""
+    daily = {}
+    for item in data.get('list', []):
+        dt_txt = item.get('dt_txt', '')
+        if not dt_txt:
+            continue
+        date = dt_txt.split(' ')[0]
+        day = daily.setdefault(date, {'date': date, 'temp_max': float('-inf'), 'temp_min': float('inf'),
+                                      'total_rain': 0, 'humidity_avg': 0, 'wind_max': 0, 'cloud_avg': 0,
+                                      'readings': 0})
+        temp = item.get('main', {}).get('temp', 0)
+        day['temp_max'] = max(day['temp_max'], temp)
+        day['temp_min'] = min(day['temp_min'], temp)
+        day['total_rain'] += item.get('rain', {}).get('3h', 0) + item.get('snow', {}).get('3h', 0)
+        day['humidity_avg'] += item.get('main', {}).get('humidity', 50)
+        day['wind_max'] = max(day['wind_max'], item.get('wind', {}).get('speed', 0))
+        day['cloud_avg'] += item.get('clouds', {}).get('all', 0)
+        day['readings'] += 1
+    for day in daily.values():
+        day['humidity_avg'] /= day['readings']
+        day['cloud_avg'] /= day['readings']
+        del day['readings']
+    return [daily[date] for date in sorted(daily)]
+
+
+def test_one_pass_matches_old_grouping():
+    print("🧪 NAPI ELŐREJELZÉS ÖSSZESÍTÉS")
+    data = forecast_document()
+    days = forecast_daily.aggregate(data).days()
+    reference = reference_grouping(data)
+    assert len(days) == 5
+    for day, expected in zip(days, reference):
+        assert {key: day[key] for key in expected} == expected
+    assert days[0]['descriptions'] == 'eső, felhős'
+    assert days[4]['rain_periods'] == sum(1 for item in data['list'][32:40] if 'rain' in item or 'snow' in item)
+    assert forecast_daily.aggregate(data).rain_by_day()['2030-06-14'] == days[4]['total_rain']
+
+
+def test_memoized_per_document():
+    data = forecast_document()
+    first = forecast_daily.daily_forecast(data)
+    assert forecast_daily.daily_forecast(data) is first
+    assert forecast_daily.daily_forecast(forecast_document()) is not first
+
+
+def test_cache_hands_out_one_document_per_file():
+    """The advisor groups a cached forecast once, however often it asks"""
+    tmp_dir = tempfile.mkdtemp(prefix="forecast_daily_")
+    weather_cache.FORECAST_DIR = os.path.join(tmp_dir, "forecast")
+    weather_cache.STATS_FILE = os.path.join(tmp_dir, "stats.json")
+    weather_cache.get_forecast(1, 2, 'metric', forecast_document)
+
+    first = weather_cache.get_forecast(1, 2, 'metric', forecast_document)
+    assert weather_cache.get_forecast(1, 2, 'metric', forecast_document) is first
+
+    calls = [0]
+    aggregate = forecast_daily.aggregate
+
+    def counting_aggregate(data):
+        calls[0] += 1
+        return aggregate(data)
+
+    location = irrigation_advisor.lat, irrigation_advisor.lon
+    forecast_daily.aggregate = counting_aggregate
+    irrigation_advisor.lat, irrigation_advisor.lon = 1, 2
+    try:
+        for _ in range(3):
+            assert len(irrigation_advisor.get_forecast_data()) == 5
+    finally:
+        forecast_daily.aggregate = aggregate
+        irrigation_advisor.lat, irrigation_advisor.lon = location
+    print(f"   3 lekérdezés, {calls[0]} összesítés")
+    assert calls[0] == 1
+
+
+if __name__ == "__main__":
+    test_one_pass_matches_old_grouping()
+    test_memoized_per_document()
+    test_cache_hands_out_one_document_per_file()
+    print("✅ Tesztek rendben")
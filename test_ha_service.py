@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+REST API teszt - /recommendation párhuzamos hívásokkal
+The weather pipeline is replaced by a slow fake that counts its calls
+"""
+
+import json
+import os
+import tempfile
+import threading
+import time
+
+import ha_service
+from irrigation_state import open_state
+
+CALLS = [0]
+
+
+def slow_recommendation():
+    CALLS[0] += 1
+    time.sleep(0.3)
+    return {
+        'recommendation': 'yes',
+        'irrigation_amount_liters_per_m2': 12.0,
+        'reasons': ['Nagy talajnedvesség hiány (20.0mm)'],
+        'zones': [
+            {'id': 'gyep', 'recommendation': 'yes', 'irrigation_amount_mm': 12.0, 'runtime_minutes': 48.0,
+             'reasons': ['Nagy talajnedvesség hiány (20.0mm)']},
+            {'id': 'agyas', 'recommendation': 'no', 'irrigation_amount_mm': 0.0, 'runtime_minutes': 0.0,
+             'reasons': ['Megfelelő talajnedvesség']}
+        ]
+    }
+
+
+def setup_service(soft_ttl=60, cache_file=None):
+    CALLS[0] = 0
+    tmp_dir = tempfile.mkdtemp(prefix="ha_service_")
+    ha_service.get_irrigation_recommendation = slow_recommendation
+    ha_service.STATE_FILE = os.path.join(tmp_dir, "irrigation_state.json")
+    ha_service.recommendation_cache = ha_service.RecommendationCache(
+        ha_service.compute_recommendation, soft_ttl, 3600,
+        cache_file or os.path.join(tmp_dir, "recommendation_cache.json")
+    )
+    return ha_service.recommendation_cache.cache_file
+
+
+def call_recommendation(results):
+    client = ha_service.app.test_client()
+    results.append(client.get('/recommendation').get_json())
+
+
+def test_concurrent_requests_share_one_computation():
+    """10 simultaneous callers, one pipeline run, one logged recommendation"""
+    print("🧪 /recommendation SINGLE-FLIGHT")
+    setup_service()
+    results = []
+    threads = [threading.Thread(target=call_recommendation, args=(results,)) for _ in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    print(f"   Pipeline futások: {CALLS[0]}, statisztika: {ha_service.recommendation_cache.flight.stats}")
+    assert CALLS[0] == 1
+    assert len(results) == 10
+    assert all(result['recommendation'] == results[0]['recommendation'] for result in results)
+    assert results[0]['recommendation']['water_amount_lpm2'] == 12.0
+
+    state = open_state(ha_service.STATE_FILE)
+    assert len(state.state['irrigation_log']) == 1
+
+
+def test_stale_result_is_served_and_refreshed_in_background():
+    """After the soft TTL the old answer comes back at once, flagged, and is refreshed"""
+    print("🧪 STALE-WHILE-REVALIDATE")
+    setup_service(soft_ttl=0.5)
+    client = ha_service.app.test_client()
+    first = client.get('/recommendation').get_json()
+    second = client.get('/recommendation').get_json()
+    assert CALLS[0] == 1
+    assert first['fresh'] and second['fresh']
+
+    time.sleep(0.6)
+    start = time.monotonic()
+    stale = client.get('/recommendation').get_json()
+    elapsed = time.monotonic() - start
+    print(f"   Elavult válasz ideje: {elapsed * 1000:.1f}ms, kor: {stale['age_seconds']}s")
+    assert stale['fresh'] is False
+    assert stale['age_seconds'] >= 0.5
+    assert elapsed < 0.2
+
+    time.sleep(0.5)
+    assert CALLS[0] == 2
+    refreshed = client.get('/recommendation').get_json()
+    assert refreshed['fresh'] is True
+    assert refreshed['age_seconds'] < stale['age_seconds']
+
+
+def test_cached_recommendation_survives_restart():
+    """A new service instance answers from the disk copy without computing"""
+    cache_file = setup_service()
+    ha_service.app.test_client().get('/recommendation')
+    assert CALLS[0] == 1
+
+    setup_service(cache_file=cache_file)
+    body = ha_service.app.test_client().get('/recommendation').get_json()
+    assert CALLS[0] == 0
+    assert body['recommendation']['water_amount_lpm2'] == 12.0
+
+
+def test_executed_irrigation_turns_the_cached_recommendation_off():
+    """/mark_executed, then /recommendation and /publish_mqtt no longer say water, for the zones neither"""
+    setup_service()
+    client = ha_service.app.test_client()
+    assert client.get('/recommendation').get_json()['recommendation']['watering_required'] is True
+    published = []
+    publish = ha_service.publish_simple_message
+    ha_service.publish_simple_message = lambda simple, zones=None: published.append((simple, zones)) or True
+    try:
+        assert client.post('/mark_executed', json={"amount": 12, "notes": "teszt"}).get_json()['success']
+        body = client.get('/recommendation').get_json()
+        print(f"   Öntözés után: {body['recommendation']}")
+        assert body['recommendation']['watering_required'] is False
+        assert body['recent_irrigation'] == 12
+        assert [zone['watering_required'] for zone in body['zones']] == [False, False]
+        assert body['zones'][0]['runtime_minutes'] == 0
+        assert body['zones'][1]['reason'] == 'Megfelelő talajnedvesség'
+        client.post('/publish_mqtt')
+        simple, zones = published[-1]
+        assert simple['watering_required'] is False
+        assert not any(zone['watering_required'] for zone in zones)
+    finally:
+        ha_service.publish_simple_message = publish
+
+    # ...and the refresh started by /mark_executed agrees
+    time.sleep(0.5)
+    assert CALLS[0] == 2
+    result = ha_service.recommendation_cache.entry['result']
+    assert result['recommendation']['watering_required'] is False
+    assert not any(zone['watering_required'] for zone in result['zones'])
+
+
+def test_cache_ttls_come_from_options():
+    tmp_dir = tempfile.mkdtemp(prefix="ha_service_")
+    ha_service.CONFIG_FILE = os.path.join(tmp_dir, "options.json")
+    assert ha_service.load_addon_options() == {}
+    with open(ha_service.CONFIG_FILE, 'w') as f:
+        json.dump({"recommendation_freshness_seconds": 120, "recommendation_max_age_seconds": 7200}, f)
+    options = ha_service.load_addon_options()
+    assert (options['recommendation_freshness_seconds'], options['recommendation_max_age_seconds']) == (120, 7200)
+
+
+if __name__ == "__main__":
+    test_concurrent_requests_share_one_computation()
+    test_stale_result_is_served_and_refreshed_in_background()
+    test_cached_recommendation_survives_restart()
+    test_executed_irrigation_turns_the_cached_recommendation_off()
+    test_cache_ttls_come_from_options()
+    print("✅ Tesztek rendben")
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Múltbéli adatok párhuzamos lekérdezésének tesztje
+Local stub server instead of OpenWeatherMap, with an artificial delay
+"""
+
+import itertools
+import json
+import os
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+import pytest
+
+import irrigation_advisor
+import weather_cache
+
+STUB_DELAY = 0.3  # seconds per request, like a slow uplink
+FAILING_DATES = set()
+REQUEST_COUNT = [0]
+
+
+class DaySummaryStub(BaseHTTPRequestHandler):
+    def do_GET(self):
+        REQUEST_COUNT[0] += 1
+        time.sleep(STUB_DELAY)
+        date = parse_qs(urlparse(self.path).query).get('date', [''])[0]
+        if date in FAILING_DATES:
+            self.send_response(500)
+            self.end_headers()
+            return
+        body = json.dumps({
+            'date': date,
+            'temperature': {'max': 30, 'min': 15, 'afternoon': 28},
+            'humidity': {'afternoon': 40},
+            'precipitation': {'total': 0},
+            'wind': {'max': {'speed': 3}},
+            'cloud_cover': {'afternoon': 20}
+        }).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def use_empty_cache(monkeypatch, tmp_path):
+    """Point the disk cache and its counters at a fresh directory (call again for another one)"""
+    caches = itertools.count()
+
+    def use_empty_cache():
+        cache_dir = tmp_path / f"weather_cache_{next(caches)}"
+        monkeypatch.setattr(weather_cache, "DAY_SUMMARY_DIR", str(cache_dir / "day_summary"))
+        monkeypatch.setattr(weather_cache, "STATS_FILE", str(cache_dir / "stats.json"))
+        monkeypatch.setattr(weather_cache, "_stats", dict.fromkeys(weather_cache._stats, 0))
+        monkeypatch.setattr(weather_cache, "_saved_stats", dict.fromkeys(weather_cache._stats, 0))
+        return cache_dir
+
+    use_empty_cache()
+    return use_empty_cache
+
+
+@pytest.fixture
+def stub(monkeypatch, use_empty_cache):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), DaySummaryStub)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setattr(irrigation_advisor, "OWM_BASE_URL", f"http://127.0.0.1:{server.server_address[1]}")
+    REQUEST_COUNT[0] = 0
+    yield server
+    FAILING_DATES.clear()
+    server.shutdown()
+    server.server_close()
+
+
+def test_history_is_parallel_and_ordered(stub, use_empty_cache, monkeypatch):
+    """7 days should take about as long as one request, in date order"""
+    print("🧪 PÁRHUZAMOS ELŐZMÉNY LEKÉRDEZÉS")
+    monkeypatch.setattr(irrigation_advisor, "HISTORY_MAX_WORKERS", 1)
+    start = time.perf_counter()
+    sequential = irrigation_advisor.get_historical_data(7)
+    sequential_time = time.perf_counter() - start
+
+    monkeypatch.setattr(irrigation_advisor, "HISTORY_MAX_WORKERS", 7)
+    use_empty_cache()
+    start = time.perf_counter()
+    parallel = irrigation_advisor.get_historical_data(7)
+    parallel_time = time.perf_counter() - start
+
+    print(f"   Szekvenciális: {sequential_time:.2f}s, párhuzamos: {parallel_time:.2f}s")
+
+    assert parallel == sequential
+    assert [day['date'] for day in parallel] == sorted((day['date'] for day in parallel), reverse=True)
+    assert parallel_time < STUB_DELAY * 2.5
+    assert sequential_time > STUB_DELAY * 6
+
+
+def test_failed_day_is_skipped(stub, use_empty_cache):
+    """A failing day is reported and left out, the rest is kept"""
+    dates = [day['date'] for day in irrigation_advisor.get_historical_data(3)]
+    use_empty_cache()
+    FAILING_DATES.add(dates[1])
+    history = irrigation_advisor.get_historical_data(3)
+
+    assert [day['date'] for day in history] == [dates[0], dates[2]]
+
+
+def test_past_days_come_from_disk_cache(stub):
+    """A second run only fetches what is not cached yet"""
+    print("🧪 DAY_SUMMARY LEMEZ CACHE")
+    first = irrigation_advisor.get_historical_data(7)
+    requests_after_first = REQUEST_COUNT[0]
+    second = irrigation_advisor.get_historical_data(7)
+    requests_after_second = REQUEST_COUNT[0]
+
+    stats = weather_cache.get_cache_stats()
+    print(f"   Kérések: {requests_after_first} + {requests_after_second - requests_after_first}, cache: {stats['total']}")
+
+    assert first == second
+    assert requests_after_first == 7
+    assert requests_after_second == 7
+    assert stats["total"]["day_summary_hits"] >= 7
+    assert stats["day_summary_entries"] == 7
+
+
+def test_cache_eviction_is_size_bounded(use_empty_cache, monkeypatch):
+    """Above the limit the oldest entries are dropped"""
+    monkeypatch.setattr(weather_cache, "DAY_SUMMARY_MAX_ENTRIES", 5)
+    for day in range(1, 11):
+        weather_cache.put_day_summary(46.65, 20.14, f"2024-01-{day:02d}", "metric", {"day": day})
+    assert len(os.listdir(weather_cache.DAY_SUMMARY_DIR)) == 5
+    assert weather_cache.get_day_summary(46.65, 20.14, "2024-01-10", "metric") == {"day": 10}
+    # Today is never cached, it may still change
+    assert not weather_cache.put_day_summary(46.65, 20.14, "2999-01-01", "metric", {})
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q", "-s"]))
@@ -5,7 +5,7 @@
 
 import json
 from datetime import datetime
-from irrigation_advisor import calculate_evapotranspiration, analyze_soil_moisture_history
+from irrigation_advisor import calculate_evapotranspiration, calculate_evapotranspiration_array, analyze_soil_moisture_history
 
 
 def test_evapotranspiration():
@@ -30,6 +30,39 @@ def test_evapotranspiration():
         print()
 
 
+def test_evapotranspiration_array():
+    """The array version must give exactly the scalar results, clamping included"""
+    print("🧪 VEKTORIZÁLT EVAPOTRANSZPIRÁCIÓ TESZT")
+    print("=" * 30)
+    
+    temps = [-10, 0, 15, 20, 25, 30, 35, 42]
+    humidities = [0, 20, 50, 80, 100]
+    winds = [0, 1, 5, 15, 25]
+    clouds = [0, 50, 100]
+    cases = [(t, h, w, c) for t in temps for h in humidities for w in winds for c in clouds]
+    
+    expected = [calculate_evapotranspiration(*case) for case in cases]
+    result = calculate_evapotranspiration_array(*zip(*cases))
+    
+    assert len(result) == len(cases)
+    assert all(float(et) == exp for et, exp in zip(result, expected))
+    print(f"   {len(cases)} eset, mind azonos a skalár eredménnyel")
+    print(f"   Tartomány: {min(expected):.2f} - {max(expected):.2f} mm/nap")
+
+
+def test_evapotranspiration_array_without_numpy():
+    """The no-NumPy fallback: scalars broadcast like NumPy would, same results"""
+    import irrigation_advisor
+    with_numpy = calculate_evapotranspiration_array([20, 30, 35], 40, [1, 3, 6], 20, model="heuristic")
+    available, irrigation_advisor.NUMPY_AVAILABLE = irrigation_advisor.NUMPY_AVAILABLE, False
+    try:
+        assert calculate_evapotranspiration_array(30, 40, 3, 20) == calculate_evapotranspiration(30, 40, 3, 20)
+        fallback = calculate_evapotranspiration_array([20, 30, 35], 40, (w for w in [1, 3, 6]), 20)
+    finally:
+        irrigation_advisor.NUMPY_AVAILABLE = available
+    assert fallback == [float(et) for et in with_numpy]
+
+
 def test_soil_moisture_scenarios():
     """Test different soil moisture scenarios"""
     print("🌱 TALAJNEDVESSÉG SZCENÁRIÓK")
@@ -186,6 +219,12 @@ def main():
     test_evapotranspiration()
     print("\n" + "="*50 + "\n")
     
+    test_evapotranspiration_array()
+    print("\n" + "="*50 + "\n")
+    
+    test_evapotranspiration_array_without_numpy()
+    print("\n" + "="*50 + "\n")
+    
     test_soil_moisture_scenarios()
     print("\n" + "="*50 + "\n")
     
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Ütemező teszt
+The check is replaced by a counter, time is passed to tick() by hand
+"""
+
+import json
+import os
+import tempfile
+import threading
+import time
+
+import irrigation_scheduler
+from irrigation_scheduler import IrrigationScheduler
+
+
+def make_scheduler(check, status_file=None, interval_minutes=30):
+    status_file = status_file or os.path.join(tempfile.mkdtemp(prefix="scheduler_"), "status.json")
+    return IrrigationScheduler(interval_minutes=interval_minutes, jitter_seconds=0,
+                               check=check, status_file=status_file)
+
+
+def test_first_run_immediately_then_on_interval():
+    """No previous run: check at once, next one an interval later"""
+    print("🧪 ÜTEMEZŐ")
+    runs = []
+    scheduler = make_scheduler(lambda: runs.append(1) or {"watering_required": False})
+    now = time.time()
+    assert scheduler.tick(now)
+    assert len(runs) == 1
+    assert scheduler.next_run >= now + 30 * 60 - 1
+
+    assert not scheduler.tick(now + 60)
+    assert len(runs) == 1
+
+    with open(scheduler.status_file) as f:
+        status = json.load(f)
+    print(f"   Következő futás: {status['next_run']}")
+    assert status['runs'] == 1
+    assert status['last_result'] == {"watering_required": False}
+
+
+def test_missed_runs_coalesce_into_one_catch_up():
+    """A run due 1.5h ago covers the missed slots in one go"""
+    runs = []
+    scheduler = make_scheduler(lambda: runs.append(1))
+    start = time.time()
+    scheduler.tick(start)
+    scheduler.next_run = start - 90 * 60 - 1  # due 1.5h ago
+
+    assert scheduler.tick(time.time())
+    assert len(runs) == 2
+    assert scheduler.status['missed_runs'] == 3
+    assert scheduler.next_run > time.time()
+    assert not scheduler.tick(time.time())
+    assert len(runs) == 2
+
+
+def test_restart_keeps_schedule():
+    """A restart within the interval waits for the planned time"""
+    runs = []
+    scheduler = make_scheduler(lambda: runs.append(1))
+    scheduler.tick(time.time())
+    restarted = make_scheduler(lambda: runs.append(1), status_file=scheduler.status_file)
+    assert restarted.next_run > time.time() + 29 * 60
+    assert not restarted.tick(time.time())
+    assert len(runs) == 1
+
+
+def test_failed_check_keeps_running():
+    """An exception in the check is counted, the loop continues"""
+    def broken():
+        raise RuntimeError("OWM down")
+
+    scheduler = make_scheduler(broken, interval_minutes=0.01)
+    scheduler.stop_event.clear()
+    irrigation_scheduler.MAX_SLEEP_SECONDS = 0.1
+    thread = threading.Thread(target=scheduler.run_forever)
+    thread.start()
+    time.sleep(1.5)
+    scheduler.stop()
+    thread.join(timeout=2)
+
+    assert not thread.is_alive()
+    assert scheduler.status['failures'] >= 2
+    assert scheduler.status['last_error'] == "OWM down"
+
+
+if __name__ == "__main__":
+    test_first_run_immediately_then_on_interval()
+    test_missed_runs_coalesce_into_one_catch_up()
+    test_restart_keeps_schedule()
+    test_failed_check_keeps_running()
+    print("✅ Tesztek rendben")
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Tartós MQTT kapcsolat teszt
+A minimal MQTT 3.1.1 broker stub counts connections and acks QoS1 publishes
+"""
+
+import json
+import os
+import socket
+import struct
+import tempfile
+import threading
+import time
+
+import mqtt_client
+import mqtt_simple
+
+CONNECTIONS = []
+PUBLISHES = []
+BROKER = {"ack": True}
+
+
+def read_packet(conn):
+    header = conn.recv(1)
+    if not header:
+        return None, None
+    length, shift = 0, 0
+    while True:
+        byte = conn.recv(1)[0]
+        length += (byte & 0x7F) << shift
+        shift += 7
+        if not byte & 0x80:
+            break
+    body = b""
+    while len(body) < length:
+        chunk = conn.recv(length - len(body))
+        if not chunk:
+            return None, None
+        body += chunk
+    return header[0], body
+
+
+def serve_client(conn):
+    CONNECTIONS.append(conn)
+    try:
+        while True:
+            header, body = read_packet(conn)
+            if header is None:
+                return
+            packet_type = header >> 4
+            if packet_type == 1:  # CONNECT
+                conn.sendall(b"\x20\x02\x00\x00")
+            elif packet_type == 3:  # PUBLISH
+                qos = (header >> 1) & 0x03
+                topic_len = struct.unpack("!H", body[:2])[0]
+                topic = body[2:2 + topic_len].decode()
+                rest = body[2 + topic_len:]
+                packet_id = b""
+                if qos:
+                    packet_id, rest = rest[:2], rest[2:]
+                PUBLISHES.append((topic, rest.decode()))
+                if qos and BROKER["ack"]:
+                    conn.sendall(b"\x40\x02" + packet_id)
+            elif packet_type == 12:  # PINGREQ
+                conn.sendall(b"\xd0\x00")
+            elif packet_type == 14:  # DISCONNECT
+                return
+    except OSError:
+        pass
+    finally:
+        conn.close()
+
+
+def start_broker():
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    server.bind(("127.0.0.1", 0))
+    server.listen(5)
+
+    def accept_loop():
+        while True:
+            try:
+                conn, _ = server.accept()
+            except OSError:
+                return
+            threading.Thread(target=serve_client, args=(conn,), daemon=True).start()
+
+    threading.Thread(target=accept_loop, daemon=True).start()
+    return server
+
+
+def broker_config(server):
+    return {
+        'MQTT_BROKER': '127.0.0.1',
+        'MQTT_PORT': server.getsockname()[1],
+        'MQTT_USERNAME': None,
+        'MQTT_PASSWORD': None,
+        'MQTT_CLIENT_ID': 'irrigation_advisor_publisher',
+        'MQTT_TOPIC_BASE': 'irrigation/scheduler'
+    }
+
+
+def reset():
+    mqtt_client.close()
+    mqtt_client.LAST_PUBLISHED_FILE = os.path.join(tempfile.mkdtemp(prefix="mqtt_client_"), "last.json")
+    CONNECTIONS.clear()
+    PUBLISHES.clear()
+    BROKER["ack"] = True
+
+
+def test_repeated_publishes_share_one_connection():
+    """3 checks through publish_simple_message: 1 connection, 12 acked messages"""
+    print("🧪 TARTÓS MQTT KAPCSOLAT")
+    reset()
+    server = start_broker()
+    tmp_dir = tempfile.mkdtemp(prefix="mqtt_client_")
+    mqtt_simple.CONFIG_FILE = os.path.join(tmp_dir, "options.json")
+    with open(mqtt_simple.CONFIG_FILE, "w") as f:
+        json.dump({'mqtt_broker': '127.0.0.1', 'mqtt_port': server.getsockname()[1]}, f)
+
+    try:
+        for amount in (1, 2, 3):
+            message = {'watering_required': False, 'water_amount_lpm2': amount, 'reason': 'Elegendő talajnedvesség'}
+            assert mqtt_simple.publish_simple_message(message)
+        stats = dict(mqtt_client._publisher.stats)
+        received = list(PUBLISHES)
+    finally:
+        reset()
+        server.close()
+
+    print(f"   Kapcsolatok: {stats['connects']}, kézbesítve: {stats['delivered']}")
+    assert stats['connects'] == 1
+    assert stats['failed'] == 0
+    # watering_required and reason are the same each time, only sent once
+    assert stats['delivered'] == 8
+    assert stats['suppressed'] == 4
+    assert len(received) == 8
+    assert received[-1] == ('irrigation/scheduler/water_amount', '3')
+
+
+def test_unchanged_payloads_are_suppressed_until_refresh():
+    """Same message again: nothing sent; after the refresh interval: everything"""
+    print("🧪 CSAK VÁLTOZÁS PUBLIKÁLÁSA")
+    reset()
+    server = start_broker()
+    messages = [("irrigation/scheduler/raw", '{"a": 1}'), ("irrigation/scheduler/reason", "eső")]
+    try:
+        publisher = mqtt_client.get_publisher(broker_config(server))
+        assert publisher.publish_changed(messages) == {topic: "delivered" for topic, _ in messages}
+        for _ in range(9):
+            assert publisher.publish_changed(messages) == {topic: "unchanged" for topic, _ in messages}
+        changed = [messages[0], ("irrigation/scheduler/reason", "szárazság")]
+        assert publisher.publish_changed(changed)["irrigation/scheduler/reason"] == "delivered"
+        assert publisher.publish_changed(changed, refresh_minutes=0) == {topic: "delivered" for topic, _ in changed}
+        stats = dict(publisher.stats)
+        received = list(PUBLISHES)
+    finally:
+        reset()
+        server.close()
+
+    print(f"   Elküldve: {stats['sent']}, elnyomva: {stats['suppressed']}")
+    assert len(received) == 5
+    assert stats['sent'] == 5
+    assert stats['suppressed'] == 19
+
+
+def test_missing_acks_are_reported_per_topic():
+    """A broker that never acks gives 'timeout', not a silent success"""
+    reset()
+    server = start_broker()
+    BROKER["ack"] = False
+    try:
+        publisher = mqtt_client.get_publisher(broker_config(server))
+        status = publisher.publish_many([("a/1", "x"), ("a/2", "y")], timeout=0.5)
+    finally:
+        reset()
+        server.close()
+    assert status == {"a/1": "timeout", "a/2": "timeout"}
+
+
+def test_reconnects_after_connection_loss():
+    """The broker drops the link; the next batch goes out on a new one"""
+    reset()
+    server = start_broker()
+    try:
+        publisher = mqtt_client.get_publisher(broker_config(server))
+        assert publisher.publish_many([("a/1", "x")]) == {"a/1": "delivered"}
+        CONNECTIONS[0].shutdown(socket.SHUT_RDWR)
+        time.sleep(0.2)
+        assert publisher.publish_many([("a/1", "y")]) == {"a/1": "delivered"}
+        assert publisher.stats['connects'] == 2
+        # A reconnect forces the next delta publish to resend everything
+        assert publisher.force_refresh
+        assert publisher.publish_changed([("a/1", "y")]) == {"a/1": "delivered"}
+        assert not publisher.force_refresh
+    finally:
+        reset()
+        server.close()
+
+
+if __name__ == "__main__":
+    test_repeated_publishes_share_one_connection()
+    test_unchanged_payloads_are_suppressed_until_refresh()
+    test_missing_acks_are_reported_per_topic()
+    test_reconnects_after_connection_loss()
+    print("✅ Tesztek rendben")
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+MQTT szolgáltatás teszt
+/execute messages are only queued on the network thread; the worker
+writes consecutive ones in one journal update and reports backpressure;
+the state goes through the configured backend (state_backend)
+"""
+
+import json
+import os
+import time
+
+import pytest
+
+import irrigation_state
+import mqtt_service
+from irrigation_state import open_state
+
+
+class FakeClient:
+    def __init__(self):
+        self.published = []
+
+    def publish(self, topic, payload, qos=0, retain=False):
+        self.published.append((topic, json.loads(payload)))
+
+
+class Message:
+    def __init__(self, payload):
+        self.topic = "irrigation/scheduler/execute"
+        self.payload = payload.encode("utf-8")
+
+
+@pytest.fixture
+def new_service(state_file, monkeypatch):
+    """Returns a function giving the service on a new state with pending recommendations"""
+    monkeypatch.setattr(mqtt_service, "STATE_FILE", state_file)
+
+    def new_service(recommendations=1, backend="json"):
+        state = open_state(state_file, backend=backend)
+        for i in range(recommendations):
+            state.log_recommendation(5, f"teszt {i}")
+        state.close()
+        monkeypatch.setattr(irrigation_state, "STATE_BACKEND", backend)
+        service = mqtt_service.MQTTIrrigationService()
+        service.client = FakeClient()
+        return service
+
+    return new_service
+
+
+def test_burst_does_not_block_the_network_thread(new_service):
+    print("🧪 MQTT VÉGREHAJTÁSI SOR")
+    service = new_service()
+    mark = service.store.mark_executed_many
+    updates = []
+
+    def slow_mark(executions):
+        time.sleep(0.2)  # Slow SD card
+        updates.append(executions)
+        return mark(executions)
+
+    service.store.mark_executed_many = slow_mark
+    service.start_worker()
+    slowest = 0
+    for i in range(300):
+        start = time.perf_counter()
+        service.on_message(None, None, Message(json.dumps({"amount": 4, "notes": f"sorozat {i}"})))
+        slowest = max(slowest, time.perf_counter() - start)
+    service.stop_worker()
+
+    metrics = service.queue_metrics()
+    print(f"   Leglassabb on_message: {slowest * 1000:.1f}ms, {metrics}")
+    assert slowest < 0.1
+    assert metrics["received"] == 300 and metrics["dropped"] > 0
+    assert metrics["applied"] + metrics["dropped"] == 300
+    assert metrics["depth"] == 0 and metrics["max_depth"] == mqtt_service.EXECUTION_QUEUE_SIZE
+    assert len(updates) == metrics["batches"] < metrics["applied"]
+    # The one pending recommendation is marked once, the status published with the metrics
+    assert service.get_status_summary()["recent_24h"]["count"] == 1
+    assert service.client.published[-1][1]["queue"]["received"] == 300
+
+
+def test_consecutive_executions_are_one_write(new_service):
+    service = new_service()
+    for amount in ("3", "3.5", "bad", json.dumps({"amount": 2})):
+        service.on_message(None, None, Message(amount))
+    journal_file = service.store.journal.journal_file
+    journal_size = os.path.getsize(journal_file)
+    service.start_worker()
+    service.stop_worker()
+
+    assert service.metrics["batches"] == 1 and service.metrics["applied"] == 3
+    assert len(service.client.published) == 1
+    with open(journal_file, encoding="utf-8") as f:
+        f.seek(journal_size)
+        assert [json.loads(line)["op"] for line in f] == ["update", "set"]  # One append, one fsync
+    assert service.store.last_recommendation()["execution_amount"] == 3.0
+
+
+def test_failed_write_is_retried_not_dropped(new_service, monkeypatch):
+    """A store error keeps the batch: it is retried with a backoff, and counted applied only once written"""
+    service = new_service()
+    mark = service.store.mark_executed_many
+    calls = []
+
+    def flaky_mark(executions):
+        calls.append(executions)
+        if len(calls) < 3:
+            raise OSError("SD card busy")
+        return mark(executions)
+
+    service.store.mark_executed_many = flaky_mark
+    monkeypatch.setattr(mqtt_service, "RETRY_BACKOFF", (0.01, 0.02))
+    service.on_message(None, None, Message("4"))
+    service.start_worker()
+    deadline = time.time() + 5
+    while service.metrics["batches"] < 1 and time.time() < deadline:
+        time.sleep(0.01)
+    service.stop_worker()
+
+    assert len(calls) == 3 and calls[0] == calls[-1]  # The same batch, not a new one
+    assert service.metrics["retries"] == 2
+    assert service.metrics["applied"] == 1 and service.metrics["failed"] == 0
+    assert service.store.last_recommendation()["execution_amount"] == 4.0
+
+
+def test_failed_write_given_up_at_stop(new_service):
+    """A store that keeps failing holds the batch until stop, then it is counted failed"""
+    service = new_service()
+
+    def broken_mark(executions):
+        raise OSError("read-only file system")
+
+    service.store.mark_executed_many = broken_mark
+    service.on_message(None, None, Message("4"))
+    service.on_message(None, None, Message("5"))
+    service.start_worker()
+    time.sleep(0.2)
+    assert service.metrics["retries"] >= 1 and service.metrics["batches"] == 0
+    start = time.perf_counter()
+    service.stop_worker()
+
+    assert time.perf_counter() - start < 2  # Stop cuts the backoff short
+    assert service.metrics["applied"] == 0 and service.metrics["failed"] == 2
+    assert service.queue_metrics()["depth"] == 0
+
+
+def test_sqlite_backend(new_service):
+    """With state_backend: sqlite the executions reach the database, not the JSON journal"""
+    service = new_service(recommendations=2, backend="sqlite")
+    assert service.apply_executions([(10, "ha")]) == 1
+    assert service.apply_executions([(4, "ha"), (6, "ha"), (7, "ha")]) == 1  # One pending left
+
+    state = open_state(mqtt_service.STATE_FILE, backend="sqlite")
+    summary = state.get_status_summary()
+    print(f"   SQLite: {summary}")
+    assert summary["pending_recommendations"] == 0
+    assert summary["recent_24h"] == {"count": 2, "total_amount": 14}
+    assert service.get_status_summary() == summary
+    assert service.client.published[-1][1]["pending_count"] == 0
+    assert not os.path.exists(mqtt_service.STATE_FILE + ".journal")
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q", "-s"]))
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Határidős javaslat teszt
+A stalled OWM endpoint must not make get_irrigation_recommendation hang
+"""
+
+import json
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse
+
+import pytest
+
+import irrigation_advisor
+import soil_balance
+import weather_cache
+
+STALLED_PATHS = set()
+
+
+def forecast_document():
+    items = []
+    for day in range(1, 4):
+        for hour in (0, 12):
+            items.append({
+                'dt_txt': f"2030-01-0{day} {hour:02d}:00:00",
+                'main': {'temp': 31, 'humidity': 30},
+                'wind': {'speed': 2},
+                'clouds': {'all': 10}
+            })
+    return {'list': items, 'city': {'name': 'Stub'}}
+
+
+class OWMStub(BaseHTTPRequestHandler):
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path in STALLED_PATHS:
+            time.sleep(3)
+        if path.endswith('/day_summary'):
+            body = {'temperature': {'max': 32}, 'humidity': {'afternoon': 30},
+                    'precipitation': {'total': 0}, 'wind': {'max': {'speed': 3}},
+                    'cloud_cover': {'afternoon': 10}}
+        elif path.endswith('/weather'):
+            body = {'main': {'temp': 30, 'humidity': 30}, 'wind': {'speed': 2},
+                    'clouds': {'all': 10}, 'weather': [{'description': 'derült'}]}
+        else:
+            body = forecast_document()
+        data = json.dumps(body).encode()
+        try:
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        except OSError:
+            pass  # client gave up
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def owm_stub(monkeypatch, tmp_path):
+    """OWM stub server; every path the advisor reads or writes points into tmp_path"""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), OWMStub)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setattr(irrigation_advisor, "OWM_BASE_URL", f"http://127.0.0.1:{server.server_address[1]}")
+
+    monkeypatch.setattr(weather_cache, "DAY_SUMMARY_DIR", str(tmp_path / "day_summary"))
+    monkeypatch.setattr(weather_cache, "FORECAST_DIR", str(tmp_path / "forecast"))
+    monkeypatch.setattr(weather_cache, "STATS_FILE", str(tmp_path / "stats.json"))
+    monkeypatch.setattr(weather_cache, "_stats", dict.fromkeys(weather_cache._stats, 0))
+    monkeypatch.setattr(weather_cache, "_saved_stats", dict.fromkeys(weather_cache._stats, 0))
+    monkeypatch.setattr(weather_cache, "_forecast_memo", {})
+    monkeypatch.setattr(soil_balance, "BALANCE_FILE", str(tmp_path / "soil_balance.json"))
+    monkeypatch.setattr(irrigation_advisor, "LAST_RECOMMENDATION_FILE", str(tmp_path / "last_recommendation.json"))
+    monkeypatch.setattr(irrigation_advisor, "IRRIGATION_STATE_FILE", str(tmp_path / "irrigation_state.json"))
+    monkeypatch.setattr(irrigation_advisor, "RECOMMENDATION_DEADLINE", 1.0)
+    monkeypatch.setattr(irrigation_advisor, "STAGE_BUDGETS", {'history': 0.8, 'current': 0.4, 'forecast': 0.6})
+    yield server
+    STALLED_PATHS.clear()
+    server.shutdown()
+    server.server_close()
+
+
+def test_stalled_endpoint_returns_degraded_answer(owm_stub):
+    """Fresh run, then a stalled /weather: cached answer marked degraded"""
+    print("🧪 HATÁRIDŐS JAVASLAT")
+    fresh = irrigation_advisor.get_irrigation_recommendation()
+    assert fresh['degraded'] is False
+    assert 'error' not in fresh
+
+    STALLED_PATHS.add('/data/2.5/weather')
+    start = time.monotonic()
+    degraded = irrigation_advisor.get_irrigation_recommendation()
+    elapsed = time.monotonic() - start
+
+    print(f"   Futásidő elakadt API mellett: {elapsed:.2f}s, jelölés: {degraded['degraded_reason']}")
+    assert elapsed < irrigation_advisor.RECOMMENDATION_DEADLINE + 0.5
+    assert degraded['degraded'] is True
+    assert 'current' in degraded['degraded_reason']
+    assert degraded['recommendation'] == fresh['recommendation']
+    assert degraded['cached_at'] == fresh['timestamp']
+
+
+def test_no_cached_answer_gives_marked_error(owm_stub):
+    """Without a previous answer the no_data error is returned, marked"""
+    STALLED_PATHS.add('/data/2.5/forecast')
+    result = irrigation_advisor.get_irrigation_recommendation()
+
+    assert result['recommendation'] == 'no_data'
+    assert result['degraded'] is True
+    assert 'forecast' in result['degraded_reason']
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q", "-s"]))
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Öntözési összesítők teszt
+Nothing is dropped from the history, and the rollups kept on write equal
+the ones recomputed from the raw log, in both backends
+"""
+
+import os
+
+import pytest
+
+import ha_service
+import rollups
+from irrigation_state import open_state
+
+
+def test_buckets():
+    print("🧪 ÖSSZESÍTŐK")
+    assert rollups.buckets("2030-12-30T06:00:00") == {"day": "2030-12-30", "week": "2031-W01", "month": "2030-12"}
+    totals = {}
+    rollups.add(totals, "2030-06-01T06:00:00", recommended=8)
+    rollups.add(totals, "2030-06-02T18:00:00", executed=6.5)
+    assert rollups.select(totals, "month") == [
+        {"period": "month", "bucket": "2030-06", "recommendations": 1, "recommended_lpm2": 8,
+         "executions": 1, "executed_lpm2": 6.5}]
+    assert [row["bucket"] for row in rollups.select(totals, "day", start="2030-06-02")] == ["2030-06-02"]
+
+
+def test_json_history_is_kept_and_rolled_up(state_file, workflow):
+    state = workflow(open_state(state_file, backend="json"), 240, every=3)
+
+    # The state holds the newest entries only, the rest is in the history file
+    assert len(state.state["irrigation_log"]) < 240
+    assert os.path.exists(state.journal.history_file)
+    history = state.get_history()
+    assert [entry["reason"] for entry in history] == [f"teszt {i}" for i in range(240)]
+
+    expected = rollups.from_entries(history)
+    reloaded = open_state(state_file, backend="json")
+    for period in rollups.PERIODS:
+        assert reloaded.get_rollups(period) == rollups.select(expected, period)
+    days = reloaded.get_rollups("day")
+    print(f"   {len(history)} bejegyzés, havi összesítő: {reloaded.get_rollups('month')}")
+    assert sum(day["recommendations"] for day in days) == 240
+    assert sum(day["executions"] for day in days) == 80
+
+
+def test_sqlite_matches_json(new_state_file, workflow):
+    json_state = workflow(open_state(new_state_file(), backend="json"), 60, every=3)
+    sqlite_state = workflow(open_state(new_state_file(), backend="sqlite"), 60, every=3)
+    for period in rollups.PERIODS:
+        assert sqlite_state.get_rollups(period) == json_state.get_rollups(period)
+    assert len(sqlite_state.get_history()) == 60
+
+    # Imported JSON state, archived entries included
+    state_file = new_state_file()
+    workflow(open_state(state_file, backend="json"), 150, every=3)
+    migrated = open_state(state_file, backend="sqlite")
+    assert len(migrated.get_history()) == 150
+    assert migrated.get_rollups("week") == open_state(state_file, backend="json").get_rollups("week")
+
+
+def test_old_state_without_rollups(state_file, workflow):
+    state = workflow(open_state(state_file, backend="json"), 10, every=3)
+    expected = state.get_rollups("day")
+    del state.state["rollups"]
+    state.journal.compact(state.state)
+    assert open_state(state_file, backend="json").get_rollups("day") == expected
+
+
+def test_rest_history(state_file, workflow, monkeypatch):
+    monkeypatch.setattr(ha_service, "STATE_FILE", state_file)
+    workflow(open_state(state_file, backend="json"), 5, every=3)
+    client = ha_service.app.test_client()
+    totals = client.get('/history?period=week').get_json()['totals']
+    assert len(totals) == 1 and totals[0]['recommendations'] == 5
+    assert client.get('/history?period=year').status_code == 400
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q", "-s"]))
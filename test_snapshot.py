@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Döntési mag teszt
+evaluate_snapshot decides from a WeatherSnapshot alone: no network, no files, no clock
+"""
+
+import dataclasses
+import time
+from datetime import datetime
+
+import numpy as np
+
+import ha_service
+from irrigation_advisor import WeatherSnapshot, evaluate_snapshot
+from rule_params import DEFAULTS
+
+
+def forecast_day(date, temp_max=27.0, rain=0.0):
+    return {'date': date, 'temp_max': temp_max, 'temp_min': temp_max - 10, 'total_rain': rain,
+            'humidity_avg': 55, 'wind_max': 3.0, 'cloud_avg': 30}
+
+
+CURRENT = {'temperature': 24.0, 'humidity': 50, 'wind_speed': 2.0, 'description': 'derült',
+           'is_raining': False, 'rain_amount': 0}
+
+
+def snapshot(deficit, now, forecast=None):
+    date = now.strftime('%Y-%m-%d')
+    return WeatherSnapshot(history=(), current=CURRENT, now=now,
+                           forecast=tuple(forecast or [forecast_day(date)] * 3),
+                           state={'soil_deficit_mm': deficit, 'zone_deficits': None})
+
+
+def test_decision_comes_from_the_snapshot_only():
+    print("🧪 DÖNTÉSI MAG")
+    may = snapshot(20.0, datetime(2030, 5, 10, 7, 0))
+    result = evaluate_snapshot(may)
+    assert result['recommendation'] == 'yes'
+    assert result['irrigation_amount_mm'] == 14.0
+    assert result['timestamp'] == '2030-05-10T07:00:00'
+    assert evaluate_snapshot(may) == result
+
+    # Late summer adjustment follows the snapshot's date, not today's
+    rainy = [forecast_day('2030-08-10', rain=6.0)] * 3
+    assert evaluate_snapshot(snapshot(10.0, datetime(2030, 8, 10), rainy))['recommendation'] == 'light'
+    assert evaluate_snapshot(snapshot(10.0, datetime(2030, 5, 10), rainy))['recommendation'] == 'no'
+
+    # Tuned thresholds go in as an argument
+    strict = dict(DEFAULTS, high_deficit_mm=25.0, hot_deficit_mm=25.0)
+    assert evaluate_snapshot(may, strict)['recommendation'] == 'no'
+
+
+def test_snapshot_is_immutable():
+    snap = snapshot(5.0, datetime(2030, 6, 1))
+    assert not hasattr(snap, '__dict__')
+    try:
+        snap.now = datetime(2031, 1, 1)
+        assert False, "frozen snapshot changed"
+    except dataclasses.FrozenInstanceError:
+        pass
+
+
+def test_snapshot_inputs_are_copied_read_only():
+    """Neither the caller's later changes nor the decision can change a snapshot"""
+    current = dict(CURRENT)
+    forecast = [forecast_day('2030-05-10')] * 3
+    deficits = np.array([20.0, 5.0])
+    snap = WeatherSnapshot(history=[{'date': '2030-05-09', 'precipitation': 0.0}], current=current,
+                           forecast=forecast, now=datetime(2030, 5, 10, 7, 0),
+                           state={'soil_deficit_mm': 20.0, 'zone_deficits': deficits})
+    before = evaluate_snapshot(snap)
+    current['is_raining'], current['rain_amount'] = True, 10
+    forecast[0]['total_rain'] = 30.0
+    deficits[0] = -10.0
+    assert evaluate_snapshot(snap) == before
+    assert snap.forecast[0]['total_rain'] == 0.0 and snap.state['zone_deficits'][0] == 20.0
+
+    for change in (lambda: snap.current.update(is_raining=True),
+                   lambda: snap.forecast[0].__setitem__('total_rain', 30.0),
+                   lambda: snap.history[0].__setitem__('precipitation', 5.0),
+                   lambda: snap.state.__setitem__('soil_deficit_mm', 0.0),
+                   lambda: snap.state['zone_deficits'].__setitem__(0, 0.0)):
+        try:
+            change()
+            assert False, "snapshot input changed"
+        except (TypeError, ValueError, AttributeError):
+            pass
+    assert isinstance(snap.history, tuple) and isinstance(snap.forecast, tuple)
+    assert dict(snap.current) == CURRENT
+
+
+def test_bulk_evaluation():
+    """10 000 snapshots without any I/O"""
+    snapshots = [snapshot(deficit / 100, datetime(2030, 7, 1)) for deficit in range(-1000, 9000)]
+    start = time.perf_counter()
+    results = [evaluate_snapshot(snap) for snap in snapshots]
+    elapsed = time.perf_counter() - start
+    print(f"   {len(results)} snapshot {elapsed:.2f}s alatt")
+    assert {result['recommendation'] for result in results} == {'no', 'light', 'yes'}
+    assert elapsed < 10
+
+
+def test_rest_evaluate():
+    client = ha_service.app.test_client()
+    body = {'current': CURRENT, 'forecast': [forecast_day('2030-05-10')] * 3,
+            'soil_deficit_mm': 20.0, 'now': '2030-05-10T07:00:00'}
+    response = client.post('/evaluate', json={'snapshots': [body, dict(body, soil_deficit_mm=-10)]})
+    results = response.get_json()['results']
+    assert [result['recommendation'] for result in results] == ['yes', 'no']
+
+    assert client.post('/evaluate', json={'current': CURRENT}).status_code == 400
+
+
+if __name__ == "__main__":
+    test_decision_comes_from_the_snapshot_only()
+    test_snapshot_is_immutable()
+    test_snapshot_inputs_are_copied_read_only()
+    test_bulk_evaluation()
+    test_rest_evaluate()
+    print("✅ Tesztek rendben")
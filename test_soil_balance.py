@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Talajvíz-mérleg teszt
+Incremental advance, idempotent replay and the days left to download
+"""
+
+import os
+import tempfile
+from datetime import datetime, timedelta
+
+import irrigation_advisor
+import soil_balance
+from irrigation_state import open_state
+from soil_balance import SoilWaterBalance
+
+WEEK = [
+    ("2030-06-01", 5.0, 0.0),
+    ("2030-06-02", 6.0, 0.0),
+    ("2030-06-03", 3.0, 12.0),
+    ("2030-06-04", 4.5, 0.0),
+    ("2030-06-05", 5.5, 0.0),
+    ("2030-06-06", 2.0, 50.0),
+    ("2030-06-07", 5.0, 0.0),
+]
+
+
+def full_replay(days):
+    deficit = 0.0
+    for _, et, rain in days:
+        deficit = min(soil_balance.MAX_DEFICIT, max(soil_balance.MIN_DEFICIT, deficit - (rain - et)))
+    return deficit
+
+
+def test_incremental_equals_full_replay():
+    """Day-by-day advance over saves gives the from-scratch result"""
+    print("🧪 TALAJVÍZ-MÉRLEG")
+    soil_balance.BALANCE_FILE = os.path.join(tempfile.mkdtemp(prefix="soil_balance_"), "balance.json")
+    for date, et, rain in WEEK:
+        with soil_balance.locked() as balance:
+            balance.record_day(date, et=et, rain=rain)
+
+    balance = soil_balance.load()
+    print(f"   Hiány: {balance.deficit():.1f}mm")
+    assert abs(balance.deficit() - full_replay(WEEK)) < 1e-9
+    # The 50mm rain is capped by the runoff limit
+    assert balance.deficit("2030-06-06") == soil_balance.MIN_DEFICIT
+
+
+def test_same_day_again_is_a_no_op_and_correction_replays():
+    balance = SoilWaterBalance()
+    for date, et, rain in WEEK:
+        balance.record_day(date, et=et, rain=rain)
+    before = balance.deficit()
+
+    assert not balance.record_day("2030-06-02", et=6.0, rain=0.0)
+    assert balance.deficit() == before
+
+    # Corrected rain on day 2 and a late irrigation entry on day 4
+    assert balance.record_day("2030-06-02", rain=3.0)
+    assert balance.record_day("2030-06-04", irrigation=10.0)
+    corrected = list(WEEK)
+    corrected[1] = ("2030-06-02", 6.0, 3.0)
+    corrected[3] = ("2030-06-04", 4.5, 10.0)
+    assert abs(balance.deficit() - full_replay(corrected)) < 1e-9
+
+
+def test_only_new_days_are_fetched():
+    """Bootstrap needs a week, a check the next day only that day"""
+    balance = SoilWaterBalance()
+    assert balance.dates_to_fetch("2030-06-08") == [date for date, _, _ in WEEK]
+
+    for date, et, rain in WEEK:
+        balance.record_day(date, et=et, rain=rain)
+    assert balance.dates_to_fetch("2030-06-08") == []
+    assert balance.dates_to_fetch("2030-06-09") == ["2030-06-08"]
+
+    # A day that failed to download is retried
+    del balance.days["2030-06-05"]
+    assert balance.dates_to_fetch("2030-06-09") == ["2030-06-05", "2030-06-08"]
+
+
+def test_compaction_keeps_the_deficit():
+    balance = SoilWaterBalance()
+    for date, et, rain in WEEK:
+        balance.record_day(date, et=et, rain=rain)
+    before = balance.deficit()
+    balance.compact(today="2030-08-04")  # KEEP_DAYS later: days 1-4 folded
+    assert balance.anchor["date"] == "2030-06-04"
+    assert balance.deficit() == before
+    assert not balance.record_day("2030-06-02", rain=50.0)
+    assert balance.dates_to_fetch("2030-06-08") == []
+
+
+def test_dry_month_then_irrigation():
+    """30 dry days empty the root zone but no more, and logged irrigation is credited"""
+    tmp_dir = tempfile.mkdtemp(prefix="soil_balance_")
+    soil_balance.BALANCE_FILE = os.path.join(tmp_dir, "balance.json")
+    irrigation_advisor.IRRIGATION_STATE_FILE = os.path.join(tmp_dir, "irrigation_state.json")
+    today = datetime.now().date()
+    days = [{'date': (today - timedelta(days=30 - i)).isoformat(), 'temp_max': 33, 'temp_min': 18,
+             'humidity': 25, 'wind_speed': 4, 'cloud_cover': 5, 'precipitation': 0} for i in range(31)]
+
+    dry = irrigation_advisor.update_soil_balance(days[:30], irrigation_advisor.load_irrigation_by_day())
+    print(f"   30 száraz nap után: {dry:.1f}mm hiány")
+    assert dry == soil_balance.MAX_DEFICIT
+
+    state = open_state(irrigation_advisor.IRRIGATION_STATE_FILE, backend="json")
+    state.log_recommendation(25, "száraz hónap")
+    state.mark_executed(25, "teszt")
+    et = float(irrigation_advisor.daily_evapotranspiration(days[30:])[0])
+    watered = irrigation_advisor.update_soil_balance(days[30:], irrigation_advisor.load_irrigation_by_day())
+    print(f"   25mm öntözés után: {watered:.1f}mm hiány")
+    assert abs(watered - (soil_balance.MAX_DEFICIT - 25 + et)) < 1e-3
+
+
+if __name__ == "__main__":
+    test_incremental_equals_full_replay()
+    test_same_day_again_is_a_no_op_and_correction_replays()
+    test_only_new_days_are_fetched()
+    test_compaction_keeps_the_deficit()
+    test_dry_month_then_irrigation()
+    print("✅ Tesztek rendben")
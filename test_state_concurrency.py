@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Párhuzamos állapot írás teszt
+Several processes log and mark recommendations in the same state file at once:
+no update may be lost, compaction included
+"""
+
+import multiprocessing
+import os
+import time
+
+import pytest
+
+import state_journal
+from irrigation_state import SimpleIrrigationState, open_state
+
+WRITERS = 8
+ROUNDS = 40
+
+
+def writer(state_file, rounds, start, backend):
+    long_lived = open_state(state_file, backend)
+    start.wait()
+    for i in range(rounds):
+        # A fresh object per call, like ha_service / irrigation_cli, or one long-lived one
+        state = open_state(state_file, backend) if i % 2 else long_lived
+        state.log_recommendation(1, f"{os.getpid()} {i}")
+        state.mark_executed(1.0)
+
+
+def run_writers(state_file, backend="json", writers=WRITERS, rounds=ROUNDS):
+    context = multiprocessing.get_context("fork")
+    start = context.Barrier(writers + 1)
+    processes = [context.Process(target=writer, args=(state_file, rounds, start, backend)) for _ in range(writers)]
+    for process in processes:
+        process.start()
+    start.wait()
+    began = time.perf_counter()
+    for process in processes:
+        process.join()
+    assert all(process.exitcode == 0 for process in processes)
+    return time.perf_counter() - began
+
+
+def test_no_lost_updates_under_load(state_file, monkeypatch):
+    print("🧪 PÁRHUZAMOS ÁLLAPOT ÍRÁS")
+    # Keep every entry, and compact often so writers race with compactions too
+    monkeypatch.setattr(state_journal, "MAX_LOG_ENTRIES", 10 ** 6)
+    monkeypatch.setattr(state_journal, "COMPACT_AFTER_EVENTS", 25)
+    elapsed = run_writers(state_file)
+    state = SimpleIrrigationState(state_file).state
+
+    changes = WRITERS * ROUNDS * 2
+    print(f"   {changes} változás {elapsed:.2f}s alatt ({changes / elapsed:.0f}/s)")
+    log = state["irrigation_log"]
+    assert len(log) == WRITERS * ROUNDS
+    assert len({entry["reason"] for entry in log}) == WRITERS * ROUNDS
+    # Every mark_executed found its own pending entry
+    assert all(entry["executed"] and entry["execution_amount"] == 1.0 for entry in log)
+    assert state["journal_seq"] == WRITERS * ROUNDS * 4
+    assert changes / elapsed > 50
+
+
+def test_no_lost_updates_sqlite(state_file):
+    elapsed = run_writers(state_file, "sqlite")
+    state = open_state(state_file, "sqlite")
+
+    changes = WRITERS * ROUNDS * 2
+    print(f"   SQLite: {changes} változás {elapsed:.2f}s alatt ({changes / elapsed:.0f}/s)")
+    assert tuple(state.db.execute("SELECT COUNT(*), SUM(executed), SUM(execution_amount) FROM irrigation_log").fetchone()) == \
+        (WRITERS * ROUNDS, WRITERS * ROUNDS, WRITERS * ROUNDS * 1.0)
+    assert changes / elapsed > 50
+
+
+def test_optimistic_version_check(state_file):
+    first, second = SimpleIrrigationState(state_file), SimpleIrrigationState(state_file)
+    first.log_recommendation(5, "első")
+
+    # second read the state before first wrote: its change is refused, its state refreshed
+    event = {"op": "set", "key": "last_execution", "value": "kézi"}
+    try:
+        second.journal.record(second.state, event)
+        assert False, "stale write accepted"
+    except state_journal.StateConflict:
+        pass
+    assert second.state["last_recommendation"]["reason"] == "első"
+    second.journal.record(second.state, event)
+    assert SimpleIrrigationState(state_file).state["last_execution"] == "kézi"
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q", "-s"]))
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Állapot napló teszt
+Changes are appended to the journal, replayed on load and compacted into the snapshot
+"""
+
+import json
+import os
+import shutil
+
+import pytest
+
+import state_journal
+from irrigation_state import SimpleIrrigationState
+
+
+def test_events_append_and_replay(state_file):
+    print("🧪 ÁLLAPOT NAPLÓ")
+    state = SimpleIrrigationState(state_file)
+    sizes = []
+    for i in range(30):
+        state.log_recommendation(10 + i, f"teszt {i}")
+        if i % 3 == 0:
+            state.mark_executed(8.0, "kézi")
+        sizes.append(os.path.getsize(state.journal.journal_file))
+
+    # No full rewrite yet, and the journal grows by about the same per event
+    assert not os.path.exists(state_file)
+    growth = [b - a for a, b in zip(sizes, sizes[1:])]
+    print(f"   Napló növekedés eseményenként: {min(growth)}-{max(growth)} bájt")
+    assert max(growth) < 3 * min(growth)
+
+    reloaded = SimpleIrrigationState(state_file)
+    assert reloaded.state == state.state
+    assert reloaded.get_status_summary() == state.get_status_summary()
+    assert len(reloaded.state["irrigation_log"]) == 30
+
+
+def test_compaction_keeps_state_and_resets_journal(state_file):
+    state = SimpleIrrigationState(state_file)
+    for i in range(state_journal.COMPACT_AFTER_EVENTS):
+        state.log_recommendation(5, f"teszt {i}")
+
+    assert os.path.exists(state_file)
+    assert state.journal.journal_events < state_journal.COMPACT_AFTER_EVENTS
+    assert len(state.state["irrigation_log"]) == state_journal.MAX_LOG_ENTRIES
+    assert SimpleIrrigationState(state_file).state == state.state
+
+
+def test_crash_during_compaction_and_torn_line(state_file):
+    state = SimpleIrrigationState(state_file)
+    for i in range(5):
+        state.log_recommendation(5, f"teszt {i}")
+    state.mark_executed(5.0)
+    expected = json.loads(json.dumps(state.state))
+
+    # Snapshot written but the process died before emptying the journal
+    saved_journal = state.journal.journal_file + ".saved"
+    shutil.copy(state.journal.journal_file, saved_journal)
+    state.save_state()
+    shutil.copy(saved_journal, state.journal.journal_file)
+    assert SimpleIrrigationState(state_file).state == expected
+
+    # Half-written last line
+    with open(state.journal.journal_file, 'a', encoding='utf-8') as f:
+        f.write('{"op": "append", "entry": {"timest')
+    assert SimpleIrrigationState(state_file).state == expected
+
+
+def test_old_snapshot_without_journal(state_file):
+    old = state_journal.default_state()
+    old["irrigation_log"].append({"timestamp": "2030-06-01T06:00:00", "amount_lpm2": 10, "reason": "régi",
+                                  "executed": False, "execution_time": None, "execution_amount": None})
+    old["last_recommendation"] = dict(old["irrigation_log"][0])
+    with open(state_file, 'w', encoding='utf-8') as f:
+        json.dump(old, f)
+
+    state = SimpleIrrigationState(state_file)
+    state.mark_executed(7.0)
+    reloaded = SimpleIrrigationState(state_file)
+    assert reloaded.state["irrigation_log"][0]["execution_amount"] == 7.0
+    assert reloaded.state["last_recommendation"]["executed"]
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q", "-s"]))
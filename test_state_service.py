@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Rezidens állapot szolgáltatás teszt
+One process owns the state in memory, the others go through its socket,
+and changes are pushed to waiting clients instead of reloads
+"""
+
+import json
+import multiprocessing
+import os
+import threading
+import time
+
+import pytest
+
+import ha_service
+import state_journal
+import state_service
+
+
+def other_process(state_file, results):
+    """Another process of the addon (CLI, mqtt_simple)"""
+    state = state_service.attach(state_file)
+    results.put(type(state).__name__)
+    state.log_recommendation(6, "másik folyamat")
+    state.mark_executed(6.0, "kézi")
+    results.put(state.get_status_summary())
+
+
+def test_other_processes_use_the_owner(state_file):
+    print("🧪 REZIDENS ÁLLAPOT")
+    owner = state_service.attach(state_file)
+    assert isinstance(owner, state_service.ResidentState)
+    try:
+        context = multiprocessing.get_context("fork")
+        results = context.Queue()
+        process = context.Process(target=other_process, args=(state_file, results))
+        process.start()
+        process.join(30)
+        assert results.get(timeout=5) == "StateClient"
+        remote_summary = results.get(timeout=5)
+
+        assert owner.version == 2
+        assert owner.get_status_summary() == remote_summary
+        assert remote_summary["recent_24h"] == {"count": 1, "total_amount": 6.0}
+        # ...and the journal on disk has it too
+        assert state_journal.load_state(state_file)["last_recommendation"]["notes"] == "kézi"
+    finally:
+        state_service.detach(state_file)
+
+
+def test_change_notifications(state_file):
+    owner = state_service.attach(state_file)
+    try:
+        client = state_service.StateClient(state_service.socket_file(state_file))
+        woke = {}
+
+        def waiter():
+            start = time.monotonic()
+            woke["version"] = client.wait_for_change(owner.version, 10)
+            woke["after"] = time.monotonic() - start
+
+        thread = threading.Thread(target=waiter)
+        thread.start()
+        time.sleep(0.2)
+        owner.log_recommendation(4, "értesítés")
+        thread.join()
+        print(f"   Értesítés {woke['after'] * 1000:.0f}ms után")
+        assert woke["version"] == 1
+        assert woke["after"] < 2
+
+        # A process writing the files directly is noticed too
+        direct = state_journal.StateJournal(state_file)
+        state = direct.load()
+        direct.update(state, lambda state: [{"op": "set", "key": "last_execution", "value": "közvetlen"}])
+        assert client.wait_for_change(1, 5) == 2
+        assert client.get_status_summary()["pending_recommendations"] == 1
+        client.close()
+    finally:
+        state_service.detach(state_file)
+
+
+def test_status_does_not_read_the_file(state_file, monkeypatch):
+    """/status is answered from memory, whatever the size of the state file"""
+    big = state_journal.default_state()
+    big["irrigation_log"] = [{"timestamp": f"2030-06-01T06:{i // 60 % 60:02d}:{i % 60:02d}.{i:06d}",
+                              "amount_lpm2": 5, "reason": "x" * 200, "executed": True,
+                              "execution_time": "2030-06-01T07:00:00", "execution_amount": 5}
+                             for i in range(20000)]
+    with open(state_file, 'w', encoding='utf-8') as f:
+        json.dump(big, f)
+
+    monkeypatch.setattr(ha_service, "STATE_FILE", state_file)
+    client = ha_service.app.test_client()
+    try:
+        assert client.get('/status').get_json()['success']
+        journal = state_service.attach(state_file).store.journal
+        reads = [0]
+        read = journal._read
+
+        def counting_read():
+            reads[0] += 1
+            return read()
+
+        journal._read = counting_read
+        start = time.perf_counter()
+        for _ in range(20):
+            assert client.get('/status').get_json()['success']
+        elapsed = time.perf_counter() - start
+        print(f"   {os.path.getsize(state_file) // 1024} kB állapot, /status: {elapsed / 20 * 1000:.1f}ms")
+        assert reads[0] == 0
+    finally:
+        state_service.detach(state_file)
+
+
+def short_lived_owner(state_file, ready, done):
+    """An owner that exits while others still hold a client"""
+    state = state_service.attach(state_file)
+    state.log_recommendation(5, "első tulajdonos")
+    ready.set()
+    done.wait(30)
+
+
+def test_client_takes_over_when_the_owner_exits(state_file):
+    """A cached client whose owner exited does not keep failing: it becomes the owner"""
+    context = multiprocessing.get_context("fork")
+    ready, done = context.Event(), context.Event()
+    process = context.Process(target=short_lived_owner, args=(state_file, ready, done))
+    process.start()
+    try:
+        assert ready.wait(30)
+        client = state_service.attach(state_file)
+        assert isinstance(client, state_service.StateClient)
+        assert client.get_status_summary()["pending_recommendations"] == 1
+        done.set()
+        process.join(30)
+
+        client.mark_executed(5.0, "átvéve")
+        assert isinstance(state_service.attach(state_file), state_service.ResidentState)
+        assert client.get_status_summary()["recent_24h"] == {"count": 1, "total_amount": 5.0}
+        # The other addon processes reach the new owner
+        other = state_service.connect(state_file)
+        assert isinstance(other, state_service.StateClient)
+        assert other.last_recommendation()["notes"] == "átvéve"
+        other.close()
+    finally:
+        done.set()
+        process.join(30)
+        state_service.detach(state_file)
+
+
+def test_connected_client_falls_back_to_the_file(state_file):
+    """connect(): with the owner gone the state file is used directly"""
+    owner = state_service.attach(state_file)
+    client = state_service.connect(state_file)
+    assert isinstance(client, state_service.StateClient)
+    owner.log_recommendation(3, "tulajdonos")
+    state_service.detach(state_file)
+
+    client.mark_executed(3.0, "tulajdonos nélkül")
+    assert client.get_status_summary()["recent_24h"] == {"count": 1, "total_amount": 3.0}
+    client.close()
+    assert state_journal.load_state(state_file)["last_recommendation"]["notes"] == "tulajdonos nélkül"
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q", "-s"]))
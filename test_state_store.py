@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+SQLite állapot tár teszt
+The JSON and SQLite backends answer the same, the queries use the indexes
+and the JSON state is imported once
+"""
+
+import os
+import sqlite3
+
+import pytest
+
+import irrigation_state
+import state_store
+from irrigation_state import open_state
+
+
+def comparable(entries):
+    return [{key: entry[key] for key in ("amount_lpm2", "reason", "executed", "execution_amount")}
+            for entry in entries]
+
+
+def test_backends_answer_the_same(new_state_file, workflow):
+    print("🧪 SQLITE ÁLLAPOT TÁR")
+    json_state = workflow(open_state(new_state_file(), backend="json"), 6, every=2)
+    sqlite_state = workflow(open_state(new_state_file(), backend="sqlite"), 6, every=2)
+
+    assert isinstance(sqlite_state, state_store.SQLiteIrrigationState)
+    summary = json_state.get_status_summary()
+    assert summary["pending_recommendations"] == 3
+    assert summary["recent_24h"] == {"count": 3, "total_amount": 1.5 + 5 + 1.5}
+    assert sqlite_state.get_status_summary()["recent_24h"] == summary["recent_24h"]
+    assert sqlite_state.get_status_summary()["pending_recommendations"] == 3
+    assert sqlite_state.last_recommendation()["amount_lpm2"] == json_state.last_recommendation()["amount_lpm2"]
+    assert comparable(sqlite_state.get_recent_irrigation(6)) == comparable(json_state.get_recent_irrigation(6))
+    assert comparable(sqlite_state.pending_recommendations()) == comparable(json_state.pending_recommendations())
+    assert sqlite_state.should_skip_recommendation(6) == json_state.should_skip_recommendation(6) == (True, 8.0)
+    assert sqlite_state.get_recent_irrigation(6)[1]["notes"] == "végrehajtás 3"
+
+
+def test_queries_use_the_indexes(state_file):
+    state = open_state(state_file, backend="sqlite")
+    assert state.db.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    queries = {
+        "idx_log_execution_time": "SELECT * FROM irrigation_log WHERE executed = 1 AND execution_time > ? "
+                                  "ORDER BY execution_time DESC",
+        "idx_log_pending": "SELECT * FROM irrigation_log WHERE executed = 0 ORDER BY timestamp DESC",
+    }
+    for index, sql in queries.items():
+        plan = " ".join(row[3] for row in state.db.execute("EXPLAIN QUERY PLAN " + sql, ("2030-01-01",) * sql.count("?")))
+        print(f"   {plan}")
+        assert index in plan
+
+
+def test_json_state_is_imported_once(state_file, workflow):
+    workflow(open_state(state_file, backend="json"), 6, every=2)
+
+    # An old mqtt_feedback database next to it
+    legacy = sqlite3.connect(os.path.join(os.path.dirname(state_file), irrigation_state.LEGACY_DB_FILE))
+    legacy.execute("CREATE TABLE irrigation_events (id INTEGER PRIMARY KEY AUTOINCREMENT, timestamp TEXT NOT NULL, "
+                   "recommended_amount REAL, actual_amount REAL, reason TEXT, executed BOOLEAN DEFAULT 0, "
+                   "execution_timestamp TEXT)")
+    legacy.execute("INSERT INTO irrigation_events (timestamp, recommended_amount, reason, executed) "
+                   "VALUES ('2020-06-01T06:00:00', 9, 'régi', 0)")
+    legacy.commit()
+    legacy.close()
+
+    expected = open_state(state_file, backend="json")
+    migrated = open_state(state_file, backend="sqlite")
+    assert migrated.get_status_summary()["recent_24h"] == expected.get_status_summary()["recent_24h"]
+    assert migrated.last_recommendation() == expected.last_recommendation()
+    assert migrated.pending_count() == expected.pending_count() + 1
+
+    reopened = open_state(state_file, backend="sqlite")
+    assert reopened.db.execute("SELECT COUNT(*) FROM irrigation_log").fetchone()[0] == 7
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q", "-s"]))
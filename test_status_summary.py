@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Állapot összesítő teszt
+The counters kept on write give the same summary as a pass over the log,
+through compaction, reloads and the end of the 24 hour window
+"""
+
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+import mqtt_service
+import state_journal
+import status_counters
+from irrigation_state import open_state
+
+
+def scanned(state):
+    """The summary computed by passes over the log (and the history file, for archived executions)"""
+    log = state.state["irrigation_log"]
+    recent = [entry for entry in state.get_history() if entry.get("executed")]
+    return (sum(1 for entry in log if not entry.get("executed", True)),
+            (len(recent), sum(entry["execution_amount"] for entry in recent)))
+
+
+def test_counters_match_the_log(new_state_file, workflow):
+    print("🧪 ÁLLAPOT ÖSSZESÍTŐ")
+    state_file = new_state_file()
+    state = workflow(open_state(state_file, backend="json"))
+    pending, (count, total) = scanned(state)
+    summary = state.get_status_summary()
+    print(f"   {summary}")
+    assert summary["pending_recommendations"] == pending
+    assert summary["recent_24h"] == {"count": count, "total_amount": total}
+
+    # Replayed from the journal by another process, and from an old snapshot without counters
+    assert open_state(state_file, backend="json").get_status_summary() == summary
+    del state.state["status"]
+    state.journal.compact(state.state)
+    assert open_state(state_file, backend="json").get_status_summary() == summary
+
+    # Same as the SQLite backend
+    assert workflow(open_state(new_state_file(), backend="sqlite")).get_status_summary()["recent_24h"] == \
+        summary["recent_24h"]
+
+
+def test_window_expires():
+    status = status_counters.empty()
+    now = datetime(2030, 6, 2, 12, 0)
+    status_counters.add_recommendation(status)
+    status_counters.add_execution(status, (now - timedelta(hours=30)).isoformat(), 4, was_pending=True)
+    status_counters.add_execution(status, (now - timedelta(hours=2)).isoformat(), 6.5)
+    status_counters.add_execution(status, (now - timedelta(minutes=5)).isoformat(), 0.1)
+    assert status["pending"] == 0
+    assert status_counters.recent(status, now) == (2, 6.6)
+    assert status_counters.recent(status, now + timedelta(hours=23)) == (1, 0.1)
+    assert status_counters.recent(status, now + timedelta(days=2)) == (0, 0)
+    assert status_counters.next_expiry(status) == now - timedelta(hours=6)  # Reads do not change it
+    assert status_counters.next_expiry(status, now) == now + timedelta(hours=22)  # The expired one is skipped
+    assert status_counters.next_expiry(status, now + timedelta(days=2)) is None
+    status_counters.expire(status, now)
+    assert status["recent"][0][1] == 6.5 and status["last_execution"]["amount"] == 0.1
+
+
+def test_summary_does_not_scan_the_log(state_file, workflow):
+    state = workflow(open_state(state_file, backend="json"), 40)
+    state.state["irrigation_log"] = state.state["irrigation_log"] * 500
+    start = time.perf_counter()
+    for _ in range(1000):
+        state.get_status_summary()
+    elapsed = time.perf_counter() - start
+    print(f"   {len(state.state['irrigation_log'])} bejegyzés, összesítő: {elapsed * 1000:.1f}µs")
+    assert elapsed < 0.5
+
+
+def test_mqtt_service_summary(state_file, workflow, monkeypatch):
+    monkeypatch.setattr(mqtt_service, "STATE_FILE", state_file)
+    workflow(open_state(state_file, backend="json"), 12)
+    service = mqtt_service.MQTTIrrigationService()
+    service.mark_executed(3.5, "mqtt")
+    summary = service.get_status_summary()
+    assert summary["pending_recommendations"] == 8
+    assert summary["recent_24h"]["count"] == 4
+    assert state_journal.load_state(state_file)["status"] == service.store.state["status"]
+
+
+def test_expiry_timer_from_the_counters(new_state_file, workflow, monkeypatch):
+    """The status timer is set from the counters (JSON) / an index lookup (SQLite), not a pass over the log"""
+    for backend in ("json", "sqlite"):
+        state = workflow(open_state(new_state_file(), backend=backend), 8)
+        expiry = datetime.fromisoformat(state.next_expiry())
+        oldest = min(entry["execution_time"] for entry in state.get_history() if entry.get("executed"))
+        assert expiry == datetime.fromisoformat(oldest) + timedelta(hours=status_counters.WINDOW_HOURS)
+
+    monkeypatch.setattr(mqtt_service, "STATE_FILE", new_state_file())
+    workflow(open_state(mqtt_service.STATE_FILE, backend="json"), 4)
+    service = mqtt_service.MQTTIrrigationService()
+    service.store.get_recent_irrigation = None  # Not called on the publish path
+    service.schedule_expiry()
+    assert service.expiry_timer.interval > 23 * 3600
+    service.expiry_timer.cancel()
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q", "-s"]))
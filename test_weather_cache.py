@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Közös előrejelzés cache teszt
+Several processes ask for the forecast at once, only one goes upstream
+"""
+
+import fcntl
+import json
+import multiprocessing
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import pytest
+import requests
+
+import weather_cache
+
+REQUEST_COUNT = [0]
+
+
+class ForecastStub(BaseHTTPRequestHandler):
+    def do_GET(self):
+        REQUEST_COUNT[0] += 1
+        time.sleep(0.3)
+        body = json.dumps({'list': [], 'city': {'name': 'Stub'}, 'n': REQUEST_COUNT[0]}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def fetch_in_child(url, results):
+    def fetch():
+        response = requests.get(url)
+        response.raise_for_status()
+        return response.json()
+    results.put(weather_cache.get_forecast(46.65, 20.14, "metric", fetch)['n'])
+
+
+@pytest.fixture
+def forecast_cache(monkeypatch, tmp_path):
+    """Empty forecast cache and counters for the test"""
+    monkeypatch.setattr(weather_cache, "FORECAST_DIR", str(tmp_path / "forecast"))
+    monkeypatch.setattr(weather_cache, "STATS_FILE", str(tmp_path / "stats.json"))
+    monkeypatch.setattr(weather_cache, "_stats", dict.fromkeys(weather_cache._stats, 0))
+    monkeypatch.setattr(weather_cache, "_saved_stats", dict.fromkeys(weather_cache._stats, 0))
+    monkeypatch.setattr(weather_cache, "_forecast_memo", {})
+
+
+def fetching_elsewhere(expired_ago):
+    """Another process is fetching (holds the lock); the cached document expired expired_ago seconds ago"""
+    path = weather_cache._forecast_path(46.65, 20.14, "metric")
+    expires_at = time.time() - expired_ago
+    weather_cache._write_json_atomic(path, {"fetched_at": expires_at - weather_cache.FORECAST_UPDATE_INTERVAL,
+                                            "expires_at": expires_at, "data": {"n": "régi"}})
+    lock_file = open(f"{path}.lock", 'w')
+    fcntl.flock(lock_file, fcntl.LOCK_EX)
+    return lock_file
+
+
+def must_not_fetch():
+    raise AssertionError("the other process is fetching")
+
+
+def test_forecast_burst_makes_one_request(forecast_cache):
+    """A burst of 8 processes causes a single upstream request"""
+    print("🧪 ELŐREJELZÉS CACHE - PÁRHUZAMOS FOLYAMATOK")
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), ForecastStub)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/data/2.5/forecast"
+
+    context = multiprocessing.get_context("fork")
+    results = context.Queue()
+    try:
+        processes = [context.Process(target=fetch_in_child, args=(url, results)) for _ in range(8)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join(timeout=30)
+        answers = [results.get(timeout=5) for _ in processes]
+    finally:
+        server.shutdown()
+
+    print(f"   Upstream kérések: {REQUEST_COUNT[0]}, válaszok: {answers}")
+    assert REQUEST_COUNT[0] == 1
+    assert answers == [1] * 8
+    assert weather_cache.load_stats()["forecast_misses"] == 1
+    assert weather_cache.load_stats()["forecast_hits"] == 7
+
+
+def test_expired_forecast_served_while_another_process_fetches(forecast_cache):
+    """The lock holder is fetching: the just-expired document comes back at once"""
+    lock_file = fetching_elsewhere(expired_ago=60)
+    try:
+        start = time.monotonic()
+        data = weather_cache.get_forecast(46.65, 20.14, "metric", must_not_fetch)
+        elapsed = time.monotonic() - start
+    finally:
+        lock_file.close()
+
+    assert data == {"n": "régi"}
+    assert elapsed < 0.5
+    assert weather_cache.get_cache_stats()["process"]["forecast_stale"] == 1
+
+
+def test_lock_wait_is_bounded(forecast_cache):
+    """Nothing to serve meanwhile: the caller waits at most wait seconds for the lock"""
+    lock_file = fetching_elsewhere(expired_ago=weather_cache.FORECAST_MAX_STALE + 60)
+    try:
+        start = time.monotonic()
+        with pytest.raises(TimeoutError):
+            weather_cache.get_forecast(46.65, 20.14, "metric", must_not_fetch, wait=0.3)
+        elapsed = time.monotonic() - start
+    finally:
+        lock_file.close()
+
+    print(f"   Várakozás a zárra: {elapsed:.2f}s")
+    assert 0.3 <= elapsed < 1.0
+    # Released: this caller fetches
+    assert weather_cache.get_forecast(46.65, 20.14, "metric", lambda: {"n": "új"}, wait=0.3) == {"n": "új"}
+
+
+def test_forecast_expires_with_provider_cadence():
+    """Expiry lands on the next 3-hourly OWM update"""
+    slot = 1767225600  # 2026-01-01 00:00 UTC
+    delay = weather_cache.FORECAST_PUBLISH_DELAY
+    assert weather_cache.forecast_expires_at(slot + 2 * 3600) == slot + 3 * 3600 + delay
+    assert weather_cache.forecast_expires_at(slot + 3 * 3600 + 60) == slot + 3 * 3600 + delay
+    assert weather_cache.forecast_expires_at(slot + 3 * 3600 + delay) == slot + 6 * 3600 + delay
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q", "-s"]))
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Közös HTTP kliens teszt
+Repeated calls must reuse one keep-alive connection
+"""
+
+import json
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import pytest
+import requests
+
+import weather_client
+
+CONNECTIONS = []
+
+
+class KeepAliveStub(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        CONNECTIONS.append(self.client_address)
+
+    def do_GET(self):
+        if self.path.startswith('/slow'):
+            time.sleep(2)
+        body = json.dumps({'path': self.path}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), KeepAliveStub)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def test_calls_reuse_one_connection():
+    """9 sequential calls, one TCP connection"""
+    print("🧪 KEEP-ALIVE KAPCSOLAT ÚJRAHASZNOSÍTÁS")
+    server, base_url = start_stub()
+    CONNECTIONS.clear()
+    weather_client.close()
+    try:
+        for i in range(9):
+            assert weather_client.get_json(f"{base_url}/data/{i}") == {'path': f"/data/{i}"}
+    finally:
+        weather_client.close()
+        server.shutdown()
+
+    print(f"   Kapcsolatok száma: {len(CONNECTIONS)}")
+    assert len(CONNECTIONS) == 1
+
+
+def test_default_timeout_applies(monkeypatch):
+    """A stalled server raises after DEFAULT_TIMEOUT instead of hanging (no timeout passed)"""
+    monkeypatch.setattr(weather_client, "DEFAULT_TIMEOUT", (1, 0.5))
+    server, base_url = start_stub()
+    start = time.monotonic()
+    try:
+        with pytest.raises(requests.Timeout):
+            weather_client.get_json(f"{base_url}/slow")
+    finally:
+        weather_client.close()
+        server.shutdown()
+    assert time.monotonic() - start < 1.5  # The stub answers after 2s
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q", "-s"]))
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Többzónás javaslat teszt
+Zone balances and decisions are evaluated together from one weather data set
+"""
+
+import time
+from datetime import datetime
+
+import numpy as np
+
+import irrigation_advisor
+import rule_params
+import rules
+import zones
+from soil_balance import SoilWaterBalance
+
+ZONE_CONFIG = [
+    {'name': 'Gyep'},
+    {'name': 'Árnyékos gyep', 'crop_coefficient': 0.6},
+    {'name': 'Homokos ágyás', 'crop_coefficient': 1.2, 'soil_capacity_mm': 10, 'sprinkler_rate_mm_per_hour': 20}
+]
+
+
+def dry_week():
+    balance = SoilWaterBalance()
+    for day, (et, rain) in enumerate([(5, 0), (6, 0), (3, 12), (4.5, 0), (5.5, 0), (5, 0), (5, 0)], start=1):
+        balance.record_day(f"2030-06-0{day}", et=et, rain=rain)
+    return balance
+
+
+def evaluate(zone_set, deficits, **weather):
+    conditions = dict(expected_loss=15.0, upcoming_rain=0.0, currently_raining=False, current_rain=0.0,
+                      rain_tomorrow=0.0, temp_tomorrow=27.0, humidity_now=50, month=5)
+    conditions.update(weather)
+    return zones.evaluate_zones(zone_set, deficits, **conditions)
+
+
+def test_default_zone_follows_the_main_balance():
+    """Kc 1, 30mm capacity: the zone deficit is the advisor's deficit"""
+    print("🧪 TÖBBZÓNÁS JAVASLAT")
+    balance = dry_week()
+    deficits = zones.zone_deficits(balance, zones.ZoneSet([{'name': 'Gyep'}]))
+    assert abs(deficits[0] - balance.deficit()) < 1e-9
+
+
+def test_zones_get_their_own_decision():
+    zone_set = zones.ZoneSet(ZONE_CONFIG)
+    deficits = zones.zone_deficits(dry_week(), zone_set)
+    decisions = evaluate(zone_set, deficits)
+    results = zones.zone_results(zone_set, deficits, decisions, 0.0, 0.0)
+    for zone in results:
+        print(f"   {zone['name']}: {zone['recommendation']} {zone['irrigation_amount_mm']}mm, "
+              f"{zone['runtime_minutes']}perc ({zone['reasons'][0]})")
+
+    assert [zone['id'] for zone in results] == ['gyep', 'árnyékos_gyep', 'homokos_ágyás']
+    assert deficits[1] < deficits[0] < deficits[2]
+    # Lawn: 22mm deficit -> 70%, capped at 25mm, 10mm/h sprinklers
+    assert results[0]['recommendation'] == 'yes'
+    assert results[0]['irrigation_amount_mm'] == round(min(25, deficits[0] * 0.7), 1)
+    assert abs(results[0]['runtime_minutes'] - results[0]['irrigation_amount_mm'] / 10 * 60) < 0.5
+    # Shaded lawn loses less water
+    assert results[1]['irrigation_amount_mm'] < results[0]['irrigation_amount_mm']
+    # Faster sprinklers on the bed: shorter runtime for the same depth
+    assert abs(results[2]['runtime_minutes'] - results[2]['irrigation_amount_mm'] / 20 * 60) < 0.5
+
+
+def test_shared_weather_rules_apply_to_every_zone():
+    zone_set = zones.ZoneSet(ZONE_CONFIG)
+    deficits = np.array([20.0, 12.0, -8.0])
+    raining = evaluate(zone_set, deficits, currently_raining=True, current_rain=5.0)
+    assert list(raining['recommendation']) == ['no', 'no', 'no']
+    assert list(raining['rule']) == [rules.RULE_SURPLUS if d < -5 else rules.RULE_RAINING for d in deficits]
+
+    tomorrow = evaluate(zone_set, deficits, rain_tomorrow=12.0)
+    assert list(tomorrow['recommendation']) == ['wait', 'wait', 'no']
+
+    # Late summer: a 'no' with more than 8mm deficit becomes light watering
+    summer = evaluate(zone_set, np.array([9.0, 9.0, 9.0]), upcoming_rain=20.0, month=8)
+    assert list(summer['recommendation']) == ['light'] * 3
+    assert list(summer['amount_mm']) == [8.0] * 3
+
+
+def test_many_zones_cost_little():
+    """1000 zones: one array pass, not 1000 rule evaluations"""
+    zone_set = zones.ZoneSet([{'name': f'Zóna {i}', 'crop_coefficient': 0.5 + i / 1000} for i in range(1000)])
+    balance = dry_week()
+    start = time.perf_counter()
+    deficits = zones.zone_deficits(balance, zone_set)
+    decisions = evaluate(zone_set, deficits)
+    elapsed = time.perf_counter() - start
+    print(f"   1000 zóna kiértékelése: {elapsed * 1000:.2f}ms")
+    assert len(decisions['recommendation']) == 1000
+    assert elapsed < 0.1
+
+
+def random_snapshot(rng):
+    forecast = tuple({
+        'date': f'2030-06-0{day + 1}',
+        'temp_max': rng.uniform(15, 38),
+        'temp_min': rng.uniform(5, 15),
+        'humidity_avg': rng.uniform(15, 90),
+        'wind_max': rng.uniform(0, 8),
+        'cloud_avg': rng.uniform(0, 100),
+        'total_rain': rng.exponential(6) if rng.random() < 0.4 else 0.0
+    } for day in range(3))
+    raining = bool(rng.random() < 0.2)
+    return irrigation_advisor.WeatherSnapshot(
+        history=(),
+        current={'is_raining': raining, 'rain_amount': rng.uniform(0, 5) if raining else 0.0,
+                 'humidity': rng.uniform(15, 90), 'temperature': 25.0, 'wind_speed': 2.0, 'description': ''},
+        forecast=forecast,
+        now=datetime(2030, int(rng.integers(4, 11)), 1, 12),
+        state={'soil_deficit_mm': rng.uniform(-15, 30), 'zone_deficits': None}
+    )
+
+
+def test_advisor_and_zones_agree():
+    """evaluate_snapshot (scalar) and evaluate_zones (arrays) decide alike on random snapshots"""
+    rng = np.random.default_rng(7)
+    snapshots = [random_snapshot(rng) for _ in range(2000)]
+    params = rule_params.DEFAULTS
+    expected_loss = np.array([float(sum(irrigation_advisor.calculate_evapotranspiration_array(
+        [day['temp_max'] for day in s.forecast], [day['humidity_avg'] for day in s.forecast],
+        [day['wind_max'] for day in s.forecast], [day['cloud_avg'] for day in s.forecast],
+        temp_min=[day['temp_min'] for day in s.forecast],
+        doy=[irrigation_advisor.day_of_year(day['date']) for day in s.forecast]))) for s in snapshots])
+
+    # Every snapshot as one default zone, weather per zone
+    zone_set = zones.ZoneSet([{'name': 'Gyep'}] * len(snapshots), params)
+    deficits = np.array([s.state['soil_deficit_mm'] for s in snapshots])
+    rain_tomorrow = np.array([s.forecast[0]['total_rain'] for s in snapshots])
+    upcoming_rain = np.array([sum(day['total_rain'] for day in s.forecast) for s in snapshots])
+    decisions = zones.evaluate_zones(
+        zone_set, deficits, expected_loss, upcoming_rain,
+        np.array([s.current['is_raining'] for s in snapshots]),
+        np.array([s.current['rain_amount'] for s in snapshots]),
+        rain_tomorrow, np.array([s.forecast[0]['temp_max'] for s in snapshots]),
+        np.array([s.current['humidity'] for s in snapshots]),
+        np.array([s.now.month for s in snapshots]), params
+    )
+    results = zones.zone_results(zone_set, deficits, decisions, 0.0, 0.0)
+
+    for i, snapshot in enumerate(snapshots):
+        advisor = irrigation_advisor.evaluate_snapshot(snapshot, params)
+        zone = results[i]
+        assert (advisor['recommendation'], advisor['irrigation_amount_mm'], advisor['confidence_percent']) == \
+            (zone['recommendation'], zone['irrigation_amount_mm'], zone['confidence_percent']), i
+        assert advisor['reasons'][0] == rules.reason(decisions['rule'][i], deficits[i], upcoming_rain[i],
+                                                     expected_loss[i], rain_tomorrow[i])
+        assert len(advisor['reasons']) == len(zone['reasons'])
+    assert set(decisions['rule']) == set(range(len(rules.RULE_NAMES)))  # Every rule was reached
+
+
+if __name__ == "__main__":
+    test_default_zone_follows_the_main_balance()
+    test_zones_get_their_own_decision()
+    test_shared_weather_rules_apply_to_every_zone()
+    test_many_zones_cost_little()
+    test_advisor_and_zones_agree()
+    print("✅ Tesztek rendben")
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+Perzisztens lemez cache az időjárás API válaszokhoz
+A past day's day_summary never changes, so it is stored once and reused.
+The /forecast document is shared by every script until OWM publishes the next one.
+"""
+
+import fcntl
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+# Addon data directory
+DATA_DIR = "/data" if os.path.exists("/data") else "."
+CACHE_DIR = os.path.join(DATA_DIR, "weather_cache")
+DAY_SUMMARY_DIR = os.path.join(CACHE_DIR, "day_summary")
+FORECAST_DIR = os.path.join(CACHE_DIR, "forecast")
+STATS_FILE = os.path.join(CACHE_DIR, "stats.json")
+
+# Size bound: oldest entries are evicted above this count
+DAY_SUMMARY_MAX_ENTRIES = 400
+
+# OWM recomputes the 5 day / 3 hour forecast every 3 hours (UTC slots),
+# and the new run shows up a few minutes after the slot
+FORECAST_UPDATE_INTERVAL = 3 * 3600
+FORECAST_PUBLISH_DELAY = 10 * 60
+
+# While another process fetches the new forecast: the expired one is served
+# if it expired at most this long ago, otherwise the caller polls the lock
+# for at most FORECAST_LOCK_WAIT seconds (or the wait it passes)
+FORECAST_MAX_STALE = FORECAST_UPDATE_INTERVAL
+FORECAST_LOCK_WAIT = 30
+FORECAST_LOCK_POLL = 0.05
+
+_lock = threading.Lock()
+_stats = {"day_summary_hits": 0, "day_summary_misses": 0, "forecast_hits": 0, "forecast_misses": 0,
+          "forecast_stale": 0}
+_saved_stats = dict(_stats)
+
+# Forecast cache path -> (file mtime, parsed entry)
+_forecast_memo = {}
+
+
+def _write_json_atomic(path, data):
+    """Write JSON via a temp file and rename, so readers never see half a file"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def _day_summary_path(lat, lon, date, units):
+    return os.path.join(DAY_SUMMARY_DIR, f"{float(lat):.4f}_{float(lon):.4f}_{units}_{date}.json")
+
+
+def is_final_date(date):
+    """Only days before today are complete and never change"""
+    return date < datetime.now().strftime("%Y-%m-%d")
+
+
+def get_day_summary(lat, lon, date, units):
+    """Return the cached day_summary response, or None on a miss"""
+    path = _day_summary_path(lat, lon, date, units)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        data = None
+
+    with _lock:
+        if data is None:
+            _stats["day_summary_misses"] += 1
+        else:
+            _stats["day_summary_hits"] += 1
+    return data
+
+
+def put_day_summary(lat, lon, date, units, data):
+    """Store a day_summary response if the day is already over"""
+    if not is_final_date(date):
+        return False
+    try:
+        _write_json_atomic(_day_summary_path(lat, lon, date, units), data)
+        _evict_day_summaries()
+        return True
+    except OSError as e:
+        print(f"⚠️ Cache írási hiba ({date}): {e}")
+        return False
+
+
+def _evict_day_summaries():
+    """Remove the least recently written entries above the size bound"""
+    try:
+        entries = [os.path.join(DAY_SUMMARY_DIR, name) for name in os.listdir(DAY_SUMMARY_DIR)
+                   if name.endswith(".json")]
+    except OSError:
+        return
+    if len(entries) <= DAY_SUMMARY_MAX_ENTRIES:
+        return
+    entries.sort(key=lambda path: os.path.getmtime(path))
+    for path in entries[:len(entries) - DAY_SUMMARY_MAX_ENTRIES]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def forecast_expires_at(fetched_at):
+    """Time of the first OWM forecast update after fetched_at"""
+    slot_start = fetched_at - FORECAST_PUBLISH_DELAY
+    next_slot = (int(slot_start) // FORECAST_UPDATE_INTERVAL + 1) * FORECAST_UPDATE_INTERVAL
+    return next_slot + FORECAST_PUBLISH_DELAY
+
+
+def _forecast_path(lat, lon, units):
+    return os.path.join(FORECAST_DIR, f"{float(lat):.4f}_{float(lon):.4f}_{units}.json")
+
+
+def _read_forecast_entry(path):
+    """
+    Parsed forecast cache file. The file is parsed again only when it changed,
+    so one document is the same object for every caller in this process.
+    """
+    try:
+        mtime = os.stat(path).st_mtime_ns
+        memo = _forecast_memo.get(path)
+        if memo is not None and memo[0] == mtime:
+            return memo[1]
+        with open(path, 'r', encoding='utf-8') as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+    _forecast_memo[path] = (mtime, entry)
+    return entry
+
+
+def _read_fresh_forecast(path, now, max_stale=0):
+    entry = _read_forecast_entry(path)
+    if entry is None or entry.get("expires_at", 0) + max_stale <= now:
+        return None
+    return entry["data"]
+
+
+def _wait_for_forecast_lock(lock_file, path, wait):
+    """
+    Take the forecast lock without blocking. While another process holds it
+    (it is fetching), return what can be served meanwhile, as (data, stat);
+    (None, None) once the lock is ours. TimeoutError after wait seconds.
+    """
+    deadline = time.monotonic() + wait
+    while True:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return None, None
+        except BlockingIOError:
+            pass
+        now = time.time()
+        data = _read_fresh_forecast(path, now)
+        if data is not None:
+            return data, "forecast_hits"  # The other process just finished
+        data = _read_fresh_forecast(path, now, FORECAST_MAX_STALE)
+        if data is not None:
+            return data, "forecast_stale"
+        if time.monotonic() >= deadline:
+            raise TimeoutError(f"Forecast is being fetched by another process, gave up after {wait:.1f}s")
+        time.sleep(FORECAST_LOCK_POLL)
+
+
+def get_forecast(lat, lon, units, fetch, wait=None):
+    """
+    Return the /forecast document, calling fetch() only when the cached one expired.
+    A lock file makes concurrent processes share one upstream request; meanwhile
+    the others get the just-expired document, or wait for the new one (at most
+    wait seconds, FORECAST_LOCK_WAIT by default, then TimeoutError).
+    Exceptions from fetch() are passed on to the caller.
+    """
+    path = _forecast_path(lat, lon, units)
+    data = _read_fresh_forecast(path, time.time())
+    stat = "forecast_hits"
+    if data is None:
+        os.makedirs(FORECAST_DIR, exist_ok=True)
+        with open(f"{path}.lock", 'w') as lock_file:
+            data, stat = _wait_for_forecast_lock(lock_file, path, FORECAST_LOCK_WAIT if wait is None else wait)
+            if data is None:
+                stat = "forecast_hits"
+                try:
+                    # Another process may have refreshed it while we waited
+                    data = _read_fresh_forecast(path, time.time())
+                    if data is None:
+                        data = fetch()
+                        fetched_at = time.time()
+                        entry = {
+                            "fetched_at": fetched_at,
+                            "expires_at": forecast_expires_at(fetched_at),
+                            "data": data
+                        }
+                        try:
+                            _write_json_atomic(path, entry)
+                            _forecast_memo[path] = (os.stat(path).st_mtime_ns, entry)
+                        except OSError as e:
+                            print(f"⚠️ Előrejelzés cache írási hiba: {e}")
+                        with _lock:
+                            _stats["forecast_misses"] += 1
+                        save_stats()
+                        return data
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    with _lock:
+        _stats[stat] += 1
+    save_stats()
+    return data
+
+
+def save_stats():
+    """Add this process's new hits/misses to the persisted totals"""
+    with _lock:
+        delta = {key: _stats[key] - _saved_stats.get(key, 0) for key in _stats}
+        if not any(delta.values()):
+            return
+        _saved_stats.update(_stats)
+    try:
+        os.makedirs(os.path.dirname(STATS_FILE), exist_ok=True)
+        # Several processes add to the same totals
+        with open(f"{STATS_FILE}.lock", 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            totals = load_stats()
+            for key, value in delta.items():
+                totals[key] = totals.get(key, 0) + value
+            _write_json_atomic(STATS_FILE, totals)
+    except OSError as e:
+        print(f"⚠️ Cache statisztika mentési hiba: {e}")
+
+
+def load_stats():
+    """Persisted hit/miss totals across all runs"""
+    try:
+        with open(STATS_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def get_cache_stats():
+    """Hit/miss counters for this process and in total, plus cache size"""
+    try:
+        entries = len([name for name in os.listdir(DAY_SUMMARY_DIR) if name.endswith(".json")])
+    except OSError:
+        entries = 0
+    with _lock:
+        process = dict(_stats)
+    totals = load_stats()
+    for key, value in process.items():
+        totals[key] = totals.get(key, 0) + value - _saved_stats.get(key, 0)
+    return {
+        "process": process,
+        "total": totals,
+        "day_summary_entries": entries,
+        "day_summary_max_entries": DAY_SUMMARY_MAX_ENTRIES
+    }
+
+
+if __name__ == "__main__":
+    print(json.dumps(get_cache_stats(), indent=2))
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Közös HTTP kliens az OpenWeatherMap hívásokhoz
+One pooled keep-alive session per process, so repeated calls reuse the TLS connection
+"""
+
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# (connect, read) timeout in seconds for every call
+DEFAULT_TIMEOUT = (5, 15)
+
+# Enough pooled connections for the parallel history fetch
+POOL_MAXSIZE = 10
+
+HEADERS = {
+    'Accept': 'application/json',
+    'Accept-Encoding': 'gzip, deflate',
+    'Connection': 'keep-alive',
+    'User-Agent': 'irrigation-advisor'
+}
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """Shared requests.Session, created on first use"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=2, pool_maxsize=POOL_MAXSIZE)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                session.headers.update(HEADERS)
+                _session = session
+    return _session
+
+
+def get(url, timeout=None, **kwargs):
+    """GET through the pooled session, always with a timeout"""
+    return get_session().get(url, timeout=timeout or DEFAULT_TIMEOUT, **kwargs)
+
+
+def get_json(url, timeout=None):
+    """GET, raise on HTTP errors, return the decoded JSON body"""
+    response = get(url, timeout=timeout)
+    response.raise_for_status()
+    return response.json()
+
+
+def close():
+    """Close the pooled connections (long-running services call this on exit)"""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None